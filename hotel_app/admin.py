@@ -1,32 +1,151 @@
 from django.contrib import admin
-from .models import User, MenuItem, Order, OrderItem, Receipt, SalesReport, Inventory
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+from .models import User, MenuItem, Order, OrderItem, Receipt, SalesReport, Inventory, PricingRule, CustomerStats, Table, Reservation
+
+
+def estimate_row_count(model, using="default"):
+    """Return the database's own row estimate for `model`'s table, or None if it has none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            elif connection.vendor == "sqlite":
+                # sqlite_stat1 only exists once ANALYZE has been run.
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    return None
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the table statistics instead of COUNT(*) on large unfiltered changelists."""
+    exact_count_below = 10000  # Small tables are cheap to count exactly
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, "query") and not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, using=queryset.db)
+            if estimate is not None and estimate >= self.exact_count_below:
+                return estimate
+        return super().count
+
+
+class PerformanceModelAdmin(admin.ModelAdmin):
+    """Changelist defaults that stay fast on large tables."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Skip the second, unfiltered COUNT(*)
+    list_per_page = 50
+
 
 # Register your models here.
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(PerformanceModelAdmin):
     list_display = ('username', 'is_staff', 'password', 'email', 'role',)
     search_fields = ('username', 'email')
 admin.site.register(User, UserAdmin)
 
-class MenuItemAdmin(admin.ModelAdmin):
+class MenuItemAdmin(PerformanceModelAdmin):
     list_display = ('name', 'price', 'category', 'availability', 'quantity')
     search_fields = ('name', 'category')
     list_filter = ('category', 'availability')
 admin.site.register(MenuItem, MenuItemAdmin)
 
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('customer',  'status',  'total_price', 'created_at',)
+class OrderAdmin(PerformanceModelAdmin):
+    list_display = ('customer',  'status', 'line_count', 'item_quantity', 'total_price', 'created_at',)
     search_fields = ('customer__username', 'status')
     list_filter = ('status',)
+    list_select_related = ('customer',)
+    autocomplete_fields = ('customer',)
+    raw_id_fields = ('receipt',)
+    date_hierarchy = 'created_at'
 admin.site.register(Order, OrderAdmin)
 
-class OrderItemAdmin(admin.ModelAdmin):
+class MenuCategoryFilter(admin.SimpleListFilter):
+    """Category choices come from the small MenuItem table, not a DISTINCT over every order line."""
+    title = 'category'
+    parameter_name = 'category'
+
+    def lookups(self, request, model_admin):
+        categories = MenuItem.objects.order_by('category').values_list('category', flat=True).distinct()
+        return [(category, category) for category in categories]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(menu_item__category=self.value())
+        return queryset
+
+class OrderItemAdmin(PerformanceModelAdmin):
     list_display = ('order', 'menu_item', 'quantity', 'price_at_time_of_order')
     search_fields = ('order__customer__username', 'menu_item__name')
-    list_filter = ('menu_item__category', 'menu_item__availability')
+    list_filter = (MenuCategoryFilter, 'menu_item__availability')
+    list_select_related = ('order', 'menu_item')
+    autocomplete_fields = ('menu_item',)
+    raw_id_fields = ('order',)
 admin.site.register(OrderItem, OrderItemAdmin)
 
+class ReceiptAdmin(PerformanceModelAdmin):
+    list_display = ('id', 'waiter', 'total_amount', 'printed', 'settled', 'printed_at')
+    search_fields = ('waiter__username',)
+    list_filter = ('printed', 'settled')
+    list_select_related = ('waiter',)
+    autocomplete_fields = ('waiter',)
+    raw_id_fields = ('orders',)
+    date_hierarchy = 'printed_at'
+admin.site.register(Receipt, ReceiptAdmin)
+
+class SalesReportAdmin(PerformanceModelAdmin):
+    list_display = ('waiter', 'date', 'printed_receipts_count', 'settled_receipts_count',
+                    'total_printed_amount', 'total_settled_amount')
+    search_fields = ('waiter__username',)
+    list_select_related = ('waiter',)
+    autocomplete_fields = ('waiter',)
+admin.site.register(SalesReport, SalesReportAdmin)
 
-admin.site.register(Receipt)
-admin.site.register(SalesReport)
-admin.site.register(Inventory)
+class InventoryAdmin(PerformanceModelAdmin):
+    list_display = ('item_name', 'quantity', 'threshold')
+    search_fields = ('item_name',)
+admin.site.register(Inventory, InventoryAdmin)
 
+class PricingRuleAdmin(PerformanceModelAdmin):
+    list_display = ('name', 'menu_item', 'category', 'kind', 'value', 'min_quantity', 'weekdays', 'start_time', 'end_time', 'active')
+    search_fields = ('name', 'category', 'menu_item__name')
+    list_filter = ('active', 'kind')
+    list_select_related = ('menu_item',)
+    raw_id_fields = ('menu_item',)
+admin.site.register(PricingRule, PricingRuleAdmin)
+
+class CustomerStatsAdmin(PerformanceModelAdmin):
+    list_display = ('user', 'order_count', 'lifetime_spend', 'last_visit')
+    search_fields = ('user__username',)
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('item_counts', 'favorite_items')
+admin.site.register(CustomerStats, CustomerStatsAdmin)
+
+class TableAdmin(PerformanceModelAdmin):
+    list_display = ('number', 'seats', 'active')
+    search_fields = ('number',)
+    list_filter = ('active',)
+admin.site.register(Table, TableAdmin)
+
+class ReservationAdmin(PerformanceModelAdmin):
+    list_display = ('name', 'table', 'party_size', 'start', 'end', 'status')
+    search_fields = ('name', 'customer__username')
+    list_filter = ('status',)
+    date_hierarchy = 'start'
+    list_select_related = ('table',)
+    raw_id_fields = ('customer',)
+admin.site.register(Reservation, ReservationAdmin)
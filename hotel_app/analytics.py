@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncHour
+from django.utils.timezone import now
+
+from hotel_app.branches import current_alias
+from hotel_app.models import (
+    ArchivedOrderItem, MenuItem, MenuItemHourlyRollup, Order, OrderItem, OrderStatusHistory, RollupWatermark,
+)
+
+HOURLY_ROLLUP = "menu_item_hourly"
+
+# Orders saved in the last few seconds may still sit in uncommitted transactions.
+SETTLE_LAG = timedelta(seconds=5)
+
+
+def refresh_hourly_rollups(until=None):
+    """
+    Fold orders completed since the last run into MenuItemHourlyRollup.
+
+    An order counts once, at the time of its "completed" status history row:
+    `updated_at` is no watermark, as later edits (a table change, an order-item
+    write) bump it again. The first run also takes completed orders from before
+    status history was kept. Returns the number of (menu item, hour) buckets
+    that were touched.
+    """
+    until = until or now() - SETTLE_LAG
+
+    with transaction.atomic(using=current_alias()):
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=HOURLY_ROLLUP)
+
+        completions = OrderStatusHistory.objects.filter(to_status="completed")
+        if watermark.position is None:
+            orders = Order.objects.filter(status="completed").exclude(
+                id__in=completions.filter(changed_at__gt=until).values("order_id")
+            )
+        else:
+            orders = Order.objects.filter(
+                status="completed",
+                id__in=completions.filter(changed_at__gt=watermark.position, changed_at__lte=until).values("order_id"),
+            )
+
+        deltas = (
+            OrderItem.objects.filter(order__in=orders)
+            .annotate(hour=TruncHour("order__created_at"))
+            .values("menu_item_id", "hour")
+            .annotate(
+                quantity_sold=Sum("quantity"),
+                revenue=Sum(F("price_at_time_of_order") * F("quantity")),
+            )
+        )
+        touched = fold(deltas)
+
+        watermark.position = until
+        watermark.save(update_fields=["position"])
+
+    return touched
+
+
+def fold(deltas):
+    """Add rows of (menu_item_id, hour, quantity_sold, revenue) to the rollup; returns the buckets touched."""
+    deltas = {(row["menu_item_id"], row["hour"]): row for row in deltas}
+    if not deltas:
+        return 0
+    existing = {
+        (rollup.menu_item_id, rollup.hour): rollup
+        for rollup in MenuItemHourlyRollup.objects.filter(
+            menu_item_id__in={menu_item_id for menu_item_id, _ in deltas},
+            hour__in={hour for _, hour in deltas},
+        )
+    }
+    to_create, to_update = [], []
+    for key, row in deltas.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            rollup = MenuItemHourlyRollup(menu_item_id=key[0], hour=key[1])
+            to_create.append(rollup)
+        else:
+            to_update.append(rollup)
+        rollup.quantity += row["quantity_sold"] or 0
+        rollup.revenue += row["revenue"] or 0
+
+    MenuItemHourlyRollup.objects.bulk_create(to_create, batch_size=500)
+    MenuItemHourlyRollup.objects.bulk_update(to_update, ["quantity", "revenue"], batch_size=500)
+    return len(deltas)
+
+
+def rebuild_hourly_rollups():
+    """Throw the rollup away and rebuild it from the full order history, archived orders included."""
+    with transaction.atomic(using=current_alias()):
+        MenuItemHourlyRollup.objects.all().delete()
+        RollupWatermark.objects.filter(name=HOURLY_ROLLUP).delete()
+        archived = (
+            ArchivedOrderItem.objects.filter(order__status="completed", menu_item_id__in=MenuItem.objects.values("id"))
+            .annotate(hour=TruncHour("order__created_at"))
+            .values("menu_item_id", "hour")
+            .annotate(
+                quantity_sold=Sum("quantity"),
+                revenue=Sum(F("price_at_time_of_order") * F("quantity")),
+            )
+        )
+        fold(archived)
+        refresh_hourly_rollups()
+        return MenuItemHourlyRollup.objects.count()
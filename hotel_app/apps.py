@@ -5,5 +5,10 @@ class HotelAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hotel_app'
 
-def ready(self):
-    import hotel_app.signals  # Import signals to ensure they are registered
\ No newline at end of file
+    def ready(self):
+        # Change feed, pricing and reservation receivers. hotel_app.signals is still not
+        # connected here; the sales report receiver in views.py is the live one, and
+        # hotel_app.stock takes order lines out of stock.
+        import hotel_app.changes
+        import hotel_app.pricing  # Drops the compiled price index when rules change
+        import hotel_app.reservations  # Keeps the table availability index current
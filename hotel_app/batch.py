@@ -0,0 +1,127 @@
+"""
+Helpers behind POST /api/batch/.
+
+Each operation is dispatched to the normal API view in-process, reusing the
+already authenticated user, so a batch of queued tablet writes costs one HTTP
+round trip and one JWT check. Menu items looked up by one operation are reused
+by the rest of the batch until a write to them (see
+hotel_app.changes.record_changes) or a rolled-back group drops them. Orders are
+not shared: each operation loads them through its view's permission-filtered
+queryset and most operations change them.
+"""
+import io
+import json
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from hotel_app.models import MenuItem
+
+# "$0.id" refers to the `id` field in the response body of operation 0.
+REFERENCE = re.compile(r"\$(\d+)\.(\w+)")
+
+_menu_items = ContextVar("batch_menu_items", default=None)
+
+
+class UnresolvedReference(Exception):
+    pass
+
+
+class GroupFailed(Exception):
+    pass
+
+
+@contextmanager
+def shared_lookups():
+    """Share menu item lookups between the operations run inside this block."""
+    token = _menu_items.set({})
+    try:
+        yield
+    finally:
+        _menu_items.reset(token)
+
+
+def forget_menu_items(pks=None):
+    """Drop these menu items (default: all) from the current batch's lookups, e.g. after they were written."""
+    cache = _menu_items.get()
+    if not cache:
+        return
+    if pks is None:
+        cache.clear()
+    for pk in pks or ():
+        cache.pop(pk, None)
+
+
+def get_menu_item(pk):
+    """MenuItem by primary key, fetched at most once per batch."""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        raise MenuItem.DoesNotExist(f"Invalid menu item id: {pk!r}")
+    cache = _menu_items.get()
+    if cache is None:
+        return MenuItem.objects.get(pk=pk)
+    if pk not in cache:
+        cache[pk] = MenuItem.objects.get(pk=pk)
+    return cache[pk]
+
+
+def _referenced_value(match, results):
+    index, field = int(match[1]), match[2]
+    result = results[index] if index < len(results) else None
+    if result is None or not isinstance(result.get("body"), dict) or field not in result["body"]:
+        raise UnresolvedReference(f"Cannot resolve ${index}.{field}")
+    return result["body"][field]
+
+
+def resolve_references(value, results):
+    """Replace "$<index>.<field>" references in a path or body with earlier results."""
+    if isinstance(value, str):
+        whole = REFERENCE.fullmatch(value)
+        if whole:
+            return _referenced_value(whole, results)  # Keep the type, e.g. integer ids
+        return REFERENCE.sub(lambda match: str(_referenced_value(match, results)), value)
+    if isinstance(value, list):
+        return [resolve_references(item, results) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve_references(item, results) for key, item in value.items()}
+    return value
+
+
+def run_operation(request, method, path, body=None):
+    """Dispatch one operation to its API view as `request.user`; returns (status code, response data)."""
+    url = urlsplit(path)
+    if not url.path.startswith("/api/") or url.path.startswith("/api/batch/"):
+        return 400, {"error": "Only /api/ endpoints can be batched."}
+    try:
+        match = resolve(url.path)
+    except Resolver404:
+        return 404, {"error": f"No endpoint at {url.path}"}
+
+    payload = json.dumps(body, cls=DjangoJSONEncoder).encode() if body is not None else b""
+
+    operation = HttpRequest()
+    operation.method = method
+    operation.path = operation.path_info = url.path
+    operation.META = {key: value for key, value in request.META.items() if key != "wsgi.input"}
+    operation.META.update({
+        "REQUEST_METHOD": method,
+        "QUERY_STRING": url.query,
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(payload)),
+    })
+    operation.GET = QueryDict(url.query)
+    operation.COOKIES = request.COOKIES
+    operation._stream = io.BytesIO(payload)
+    operation._read_started = False
+    # DRF honours these and skips authentication: the batch request was already authenticated.
+    operation._force_auth_user = request.user
+    operation._force_auth_token = request.auth
+
+    response = match.func(operation, *match.args, **match.kwargs)
+    return response.status_code, getattr(response, "data", None)
@@ -0,0 +1,86 @@
+"""
+Per-branch database routing.
+
+Every hotel outlet (branch) keeps its hotel_app data - users, menu, orders,
+receipts, inventory and sales reports - in its own database alias, so a busy
+branch never holds a write lock on another branch's tables. Branches are
+configured in settings.HOTEL_BRANCHES as {code: database alias}; the branch for
+a request is picked by BranchMiddleware and everything else just calls
+`current_alias()`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+DEFAULT_BRANCH = "main"
+
+_current_branch = ContextVar("hotel_branch", default=None)
+
+
+class UnknownBranch(Exception):
+    pass
+
+
+def branches():
+    return getattr(settings, "HOTEL_BRANCHES", {DEFAULT_BRANCH: "default"})
+
+
+def current_branch():
+    return _current_branch.get() or DEFAULT_BRANCH
+
+
+def current_alias():
+    """Database alias holding the current branch's data."""
+    return branches().get(current_branch(), "default")
+
+
+@contextmanager
+def use_branch(code):
+    if code not in branches():
+        raise UnknownBranch(code)
+    token = _current_branch.set(code)
+    try:
+        yield branches()[code]
+    finally:
+        _current_branch.reset(token)
+
+
+def for_each_branch(func, *args):
+    """
+    Run `func(code, *args)` for every branch concurrently, each in its own thread
+    and database connection, and return {code: result}.
+    """
+    def run(code):
+        with use_branch(code) as alias:
+            try:
+                return code, func(code, *args)
+            finally:
+                connections[alias].close()  # Worker threads must not leak connections
+
+    codes = list(branches())
+    if len(codes) == 1:  # Single-branch deployments: no thread, no extra connection
+        with use_branch(codes[0]):
+            return {codes[0]: func(codes[0], *args)}
+    with ThreadPoolExecutor(max_workers=len(codes)) as pool:
+        return dict(pool.map(run, codes))
+
+
+class BranchRouter:
+    """Send hotel_app models to the current branch's database; everything else stays on default."""
+    route_app_labels = {"hotel_app"}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.route_app_labels:
+            return current_alias()
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True  # Every branch database carries the full schema
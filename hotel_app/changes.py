@@ -0,0 +1,62 @@
+"""
+Change feed for offline tablets.
+
+Every create/update/delete of a menu item, order, order item or receipt appends
+a ChangeLog row. Saves and deletes are picked up by the receivers below; code
+that writes with queryset.update() must call `record_changes()` itself. Either
+way this worker's cached order and receipt details, and the running batch's
+menu item lookups, are dropped too.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from hotel_app import batch
+from hotel_app.detail_cache import cache as detail_cache
+from hotel_app.models import ChangeLog, MenuItem, Order, OrderItem, Receipt
+
+
+def record_changes(model, rows, deleted=False):
+    """Append one change per (object_id, owner_id) pair in `rows`."""
+    rows = list(rows)
+    if model in ("order", "receipt"):
+        detail_cache.invalidate(model, [object_id for object_id, _ in rows])
+    elif model == "menu_item":
+        batch.forget_menu_items([object_id for object_id, _ in rows])
+    ChangeLog.objects.bulk_create(
+        [ChangeLog(model=model, object_id=object_id, owner_id=owner_id, deleted=deleted) for object_id, owner_id in rows],
+        batch_size=500,
+    )
+
+
+def menu_version():
+    """Id of the latest menu change (0 if none); changes whenever any menu item is saved or deleted."""
+    return ChangeLog.objects.filter(model="menu_item").order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def _owner_id(model, instance):
+    if model == "order":
+        return instance.customer_id
+    if model == "order_item":
+        if OrderItem.order.is_cached(instance):
+            return instance.order.customer_id
+        return Order.objects.filter(pk=instance.order_id).values_list("customer_id", flat=True).first()
+    if model == "receipt":
+        return instance.waiter_id
+    return None  # Menu items are visible to everyone
+
+
+FEED_MODELS = {MenuItem: "menu_item", Order: "order", OrderItem: "order_item", Receipt: "receipt"}
+
+
+@receiver(post_save)
+def record_save(sender, instance, **kwargs):
+    model = FEED_MODELS.get(sender)
+    if model is not None and not kwargs.get("raw"):
+        record_changes(model, [(instance.pk, _owner_id(model, instance))])
+
+
+@receiver(post_delete)
+def record_delete(sender, instance, **kwargs):
+    model = FEED_MODELS.get(sender)
+    if model is not None:
+        record_changes(model, [(instance.pk, _owner_id(model, instance))], deleted=True)
@@ -0,0 +1,77 @@
+"""
+Delta updates for CustomerStats.
+
+Called inside the transaction that completes orders or (un)settles receipts, so a
+customer profile is a single primary-key read instead of an aggregate over the
+customer's whole order history.
+"""
+from collections import defaultdict
+
+from django.db.models import Sum
+from django.utils.timezone import now
+
+from hotel_app.models import CustomerStats, Order
+
+
+def _locked_stats(customer_ids):
+    """{customer_id: CustomerStats} locked for update, creating the missing rows."""
+    CustomerStats.objects.bulk_create(
+        [CustomerStats(user_id=customer_id) for customer_id in customer_ids], ignore_conflicts=True,
+    )
+    return {stats.user_id: stats for stats in CustomerStats.objects.select_for_update().filter(user_id__in=customer_ids)}
+
+
+def orders_completed(order_ids):
+    """Count these newly completed orders, and their items, towards their customers' stats."""
+    visits, items = defaultdict(list), defaultdict(dict)
+    for customer_id, created_at, summary in (
+        Order.objects.filter(id__in=order_ids).values_list("customer_id", "created_at", "item_summary")
+    ):
+        visits[customer_id].append(created_at)
+        for line in summary:  # The order's own summary column, no line join
+            name, quantity = items[customer_id].get(line["id"], (line["name"], 0))
+            items[customer_id][line["id"]] = (name, quantity + line["quantity"])
+    if not visits:
+        return
+
+    stats = _locked_stats(list(visits))
+    for customer_id, created in visits.items():
+        row = stats[customer_id]
+        row.order_count += len(created)
+        row.last_visit = max([*created, row.last_visit] if row.last_visit else created)
+        row.add_items(items[customer_id])
+        row.updated_at = now()  # bulk_update skips auto_now
+    CustomerStats.objects.bulk_update(
+        stats.values(), ["order_count", "last_visit", "item_counts", "favorite_items", "updated_at"],
+    )
+
+
+def receipts_settled(receipt_ids):
+    """Add the orders on these newly settled receipts to their customers' lifetime spend."""
+    _add_spend(Order.objects.filter(receipt_id__in=receipt_ids), 1)
+
+
+def receipts_unsettled(receipt_ids):
+    """Take the orders on these receipts, settled until now, back off their customers' lifetime spend."""
+    _add_spend(Order.objects.filter(receipt_id__in=receipt_ids), -1)
+
+
+def orders_settled(order_ids):
+    """Add these orders, just put on a settled receipt, to their customers' lifetime spend."""
+    _add_spend(Order.objects.filter(id__in=order_ids), 1)
+
+
+def orders_unsettled(order_ids):
+    """Take these orders, about to leave a settled receipt, back off their customers' lifetime spend."""
+    _add_spend(Order.objects.filter(id__in=order_ids), -1)
+
+
+def _add_spend(orders, sign):
+    spend = dict(orders.values_list("customer_id").annotate(spend=Sum("total_price")).order_by())
+    if not spend:
+        return
+    stats = _locked_stats(list(spend))
+    for customer_id, amount in spend.items():
+        stats[customer_id].lifetime_spend += sign * amount
+        stats[customer_id].updated_at = now()
+    CustomerStats.objects.bulk_update(stats.values(), ["lifetime_spend", "updated_at"])
@@ -0,0 +1,90 @@
+"""
+Read-through cache of order and receipt detail representations.
+
+GET /api/orders/{id}/ and /api/receipts/{id}/ first load the object's version
+(a couple of columns, through the viewset's own queryset so its permission
+filtering still applies) and serve the serialized representation cached under
+that version; only on a miss does the full serializer query tree run. Versions
+come from the database, so a write made by another worker is never served
+stale; writes made here also drop their entries at once (see
+hotel_app.changes.record_changes).
+
+The cache is per worker, bounded to DETAIL_CACHE_SIZE entries and evicts the
+least recently used one.
+"""
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from hotel_app.branches import current_alias
+
+
+class DetailCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # (alias, kind, pk) -> (version, data), least recently used first
+        self.hits, self.misses, self.evictions = Counter(), Counter(), Counter()
+
+    @staticmethod
+    def max_entries():
+        return getattr(settings, "DETAIL_CACHE_SIZE", 2000)
+
+    def get(self, kind, pk, version):
+        """The cached representation of `kind` `pk` at `version`, or None."""
+        key = (current_alias(), kind, pk)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses[kind] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits[kind] += 1
+            return entry[1]
+
+    def put(self, kind, pk, version, data):
+        key = (current_alias(), kind, pk)
+        with self.lock:
+            self.entries[key] = (version, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries():
+                (_, evicted_kind, _), _ = self.entries.popitem(last=False)
+                self.evictions[evicted_kind] += 1
+
+    def invalidate(self, kind, pks):
+        alias = current_alias()
+        with self.lock:
+            for pk in pks:
+                self.entries.pop((alias, kind, pk), None)
+
+    def stats(self):
+        with self.lock:
+            kinds = sorted(set(self.hits) | set(self.misses))
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries(),
+                **{
+                    kind: {
+                        "hits": self.hits[kind],
+                        "misses": self.misses[kind],
+                        "evictions": self.evictions[kind],
+                        "hit_ratio": round(self.hits[kind] / ((self.hits[kind] + self.misses[kind]) or 1), 3),
+                    }
+                    for kind in kinds
+                },
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits.clear()
+            self.misses.clear()
+            self.evictions.clear()
+
+
+cache = DetailCache()
+
+
+def reset():
+    """Drop every entry and zero the counters."""
+    cache.clear()
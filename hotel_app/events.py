@@ -0,0 +1,57 @@
+"""
+Buffered writes to the OrderEvent journal.
+
+Call `record()` wherever something happens to an order. Events only count once
+the surrounding transaction commits; inside a request (see
+`OrderEventMiddleware`) they are collected and written with one `bulk_create`
+when the response is ready, everywhere else they are written on commit.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from hotel_app.branches import current_alias
+from hotel_app.models import OrderEvent
+
+_buffer = ContextVar("order_event_buffer", default=None)
+
+
+def record(kind, order_id=None, receipt_id=None, actor=None, **payload):
+    """Journal one event once the current transaction commits (dropped on rollback)."""
+    event = OrderEvent(
+        kind=kind,
+        order_id=order_id,
+        receipt_id=receipt_id,
+        actor_id=getattr(actor, "pk", actor),
+        payload=payload,
+        created_at=now(),
+    )
+    transaction.on_commit(partial(_committed, event), using=current_alias())
+
+
+def _committed(event):
+    buffer = _buffer.get()
+    if buffer is None:
+        OrderEvent.objects.bulk_create([event])
+    else:
+        buffer.append(event)
+
+
+def flush(events):
+    if events:
+        OrderEvent.objects.bulk_create(events, batch_size=500)
+
+
+@contextmanager
+def buffered():
+    """Collect committed events and write them all at once on exit."""
+    token = _buffer.set([])
+    try:
+        yield
+    finally:
+        events = _buffer.get()
+        _buffer.reset(token)
+        flush(events)
@@ -0,0 +1,23 @@
+"""
+API exception handling.
+
+SQLite lets one writer in at a time; under load a request can give up waiting
+for the write lock with OperationalError("database is locked"). That is a
+temporary condition, not a server bug, so the API answers 503 with Retry-After
+and an error clients (and `manage.py loadtest`) can recognise, instead of a 500.
+"""
+from django.db import OperationalError
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler as drf_exception_handler, set_rollback
+
+DATABASE_LOCKED = "database is locked"
+
+
+def exception_handler(exc, context):
+    if isinstance(exc, OperationalError) and DATABASE_LOCKED in str(exc):
+        set_rollback()
+        return Response(
+            {"error": DATABASE_LOCKED}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"},
+        )
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,146 @@
+"""
+Streaming exports of orders and receipts, as CSV or JSON Lines.
+
+Rows are read in id order one chunk at a time, each chunk (and its prefetched
+children) by its own short `id > last id` query, so only one chunk is in memory
+however long the date range. No cursor stays open while the client downloads:
+under SQLite's rollback journal that would hold a read lock and lock every
+writer out until the export finished. Rows carry their id: pass the last id
+received as `since_id` to resume an interrupted export (CSV then comes without
+its header row).
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch
+from django.utils.timezone import make_aware
+
+from hotel_app.branches import current_alias
+from hotel_app.fastjson import dumps
+from hotel_app.models import Order, Receipt
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+CHUNK_SIZE = 2000  # Rows per database round trip
+FLUSH_BYTES = 64 * 1024  # Encoded rows are handed on in blocks of about this size
+
+COLUMNS = {
+    "orders": ("id", "created_at", "customer", "status", "total_price", "line_count", "item_quantity", "items"),
+    "receipts": ("id", "printed_at", "waiter", "printed", "settled", "total_amount", "orders"),
+}
+
+
+def day_range(queryset, field, start=None, end=None):
+    """Rows whose `field` falls on the inclusive dates `start`..`end` (either may be None)."""
+    if start:
+        queryset = queryset.filter(**{f"{field}__gte": make_aware(datetime.combine(start, time.min))})
+    if end:
+        queryset = queryset.filter(**{f"{field}__lt": make_aware(datetime.combine(end + timedelta(days=1), time.min))})
+    return queryset
+
+
+def order_row(order):
+    return {
+        "id": order.id,
+        "created_at": order.created_at,
+        "customer": order.customer.username,
+        "status": order.status,
+        "total_price": order.total_price,
+        "line_count": order.line_count,
+        "item_quantity": order.item_quantity,
+        "items": order.item_summary,
+    }
+
+
+def receipt_row(receipt):
+    return {
+        "id": receipt.id,
+        "printed_at": receipt.printed_at,
+        "waiter": receipt.waiter.username,
+        "printed": receipt.printed,
+        "settled": receipt.settled,
+        "total_amount": receipt.total_amount,
+        "orders": [{"id": order.id, "total_price": order.total_price} for order in receipt.orders.all()],
+    }
+
+
+def pages(queryset, since_id, chunk_size):
+    """The objects of `queryset` after `since_id` in id order, read by one short keyset query per chunk."""
+    last_id = since_id
+    while True:
+        page = list(queryset.order_by("id").filter(id__gt=last_id)[:chunk_size])  # Done before any row is yielded
+        if not page:
+            return
+        yield from page
+        last_id = page[-1].id
+
+
+def order_rows(start=None, end=None, since_id=0, chunk_size=CHUNK_SIZE):
+    # The item_summary column already holds each order's lines, so no child rows are read.
+    orders = (
+        Order.objects.using(current_alias()).select_related("customer")
+        .only(
+            "customer__username", "created_at", "status", "total_price", "line_count", "item_quantity", "item_summary",
+        )
+    )
+    return map(order_row, pages(day_range(orders, "created_at", start, end), since_id, chunk_size))
+
+
+def receipt_rows(start=None, end=None, since_id=0, chunk_size=CHUNK_SIZE):
+    alias = current_alias()
+    receipts = (
+        Receipt.objects.using(alias).select_related("waiter")
+        .prefetch_related(Prefetch("orders", queryset=Order.objects.using(alias).only("id", "total_price").order_by("id")))
+    )
+    return map(receipt_row, pages(day_range(receipts, "printed_at", start, end), since_id, chunk_size))
+
+
+ROWS = {"orders": order_rows, "receipts": receipt_rows}
+
+
+def csv_value(value):
+    """Flatten a row value into one CSV cell."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):  # Order lines or a receipt's orders
+        return "; ".join(
+            f"{entry['quantity']}x {entry['name']}" if "quantity" in entry else str(entry["id"]) for entry in value
+        )
+    return value
+
+
+class Echo:
+    """A file-like object that hands back what csv.writer writes instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def encode(rows, kind, output, header=True):
+    """Encode rows as CSV (with a header row unless `header` is False) or JSON Lines, in FLUSH_BYTES blocks."""
+    if output == "csv":
+        writer = csv.writer(Echo())
+        lines = (writer.writerow([csv_value(row[column]) for column in COLUMNS[kind]]).encode() for row in rows)
+        if header:
+            yield writer.writerow(COLUMNS[kind]).encode()
+    else:
+        lines = (dumps(row) + b"\n" for row in rows)
+    block, size = [], 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield b"".join(block)
+            block, size = [], 0
+    if block:
+        yield b"".join(block)
+
+
+def stream(kind, output, start=None, end=None, since_id=0, chunk_size=CHUNK_SIZE):
+    """
+    The encoded export. The branch database is picked now, but nothing is queried
+    until the first block is requested - after the view (and BranchMiddleware) returned.
+    A resumed export (`since_id` set) continues a file that already has its CSV header.
+    """
+    return encode(ROWS[kind](start, end, since_id, chunk_size), kind, output, header=not since_id)
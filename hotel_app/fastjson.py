@@ -0,0 +1,51 @@
+"""
+Faster JSON for the API.
+
+FastJSONRenderer and FastJSONParser use orjson when it is installed and fall
+back to DRF's stdlib-based JSONRenderer/JSONParser otherwise. Anything orjson
+cannot encode natively (Decimal, lazy translation strings, querysets, ...) goes
+through DRF's own JSONEncoder.default, and so do dates and times: orjson's own
+formatting rounds sub-minute UTC offsets and encodes aware times DRF rejects,
+so handing them to DRF keeps both paths returning the same JSON.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional: pip install orjson
+    orjson = None
+
+_drf_default = JSONEncoder().default
+
+
+def dumps(data):
+    """Encode `data` to UTF-8 JSON bytes."""
+    if orjson is None:
+        return JSONRenderer().render(data)
+    try:
+        return orjson.dumps(data, default=_drf_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+    except orjson.JSONEncodeError:
+        return JSONRenderer().render(data)  # Raises (or encodes) exactly as DRF would
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)  # Pretty-printed on request
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", "utf-8")
+        if orjson is None or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
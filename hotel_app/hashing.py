@@ -0,0 +1,41 @@
+"""
+Password hashing in a pool of worker processes.
+
+PBKDF2 is deliberately slow and holds the GIL, so hashing hundreds of passwords
+on a request thread stalls every other request its worker serves. This module
+spreads the work over separate processes instead. It imports no models: spawned
+workers import it before Django is set up.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+INLINE_LIMIT = 4  # Fewer passwords than this are not worth starting processes for
+
+
+def init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def default_workers():
+    # Leave half the cores to the web workers.
+    return getattr(settings, "PASSWORD_HASH_WORKERS", None) or max(1, (os.cpu_count() or 2) // 2)
+
+
+def hash_passwords(passwords, workers=None):
+    """make_password() for each password, in order, computed in `workers` processes."""
+    passwords = list(passwords)
+    if len(passwords) < INLINE_LIMIT:
+        return [make_password(password) for password in passwords]
+    workers = min(workers or default_workers(), len(passwords))
+    # "spawn": forked children would inherit the parent's open database connections and threads.
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=get_context("spawn"),
+        initializer=init_worker, initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "hotel_management_system.settings"),),
+    ) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
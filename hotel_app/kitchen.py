@@ -0,0 +1,311 @@
+"""
+In-memory kitchen prep queue behind /api/kitchen/queue/ and /api/orders/{id}/eta/.
+
+Each worker keeps, per branch, the pending and preparing orders in one priority
+queue per station (menu category): orders already being prepared first, then
+oldest first. The queue follows the OrderEvent journal - every read applies only
+the events written since the last one - so it never rescans the Order table and
+every worker converges on the same state. It is rebuilt from the database the
+first time a worker needs it: open orders from the Order table, their items by
+replaying their journal entries up to the cursor. Events are written after the
+data commits, so reading items from the OrderItem table instead could count a
+line twice - once from the table, once from its event arriving later. Only
+orders older than the journal itself are read from the table.
+
+Prep times are learned per menu item: when an order is served, the estimate of
+each of its items is nudged by how far the whole order was off.
+"""
+import heapq
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from time import time
+
+from django.conf import settings
+from django.db.models import Max
+
+from hotel_app.branches import current_alias
+from hotel_app.models import MenuItem, Order, OrderEvent, OrderItem, OrderStatusHistory
+
+QUEUE_STATUSES = ("pending", "preparing")
+QUEUE_EVENTS = {"order_created", "item_added", "item_removed", "status_changed", "order_cancelled"}
+LEARNING_RATE = 0.2  # Weight of the newest observation in the prep-time average
+HISTORY_SIZE = 500  # Served orders to learn prep times from when rebuilding
+
+
+def default_prep_seconds():
+    return getattr(settings, "KITCHEN_DEFAULT_PREP_SECONDS", 600)
+
+
+class OpenOrder:
+    __slots__ = ("id", "status", "created_at", "started_at", "items", "keys")
+
+    def __init__(self, order_id, created_at, status="pending", started_at=None):
+        self.id = order_id
+        self.status = status
+        self.created_at = created_at
+        self.started_at = started_at
+        self.items = defaultdict(int)  # menu_item_id -> quantity
+        self.keys = {}  # station -> priority key of this order's current queue entry
+
+    def priority(self):
+        return (0 if self.status == "preparing" else 1, self.created_at, self.id)
+
+    def add_item(self, menu_item_id, quantity):
+        self.items[menu_item_id] += quantity
+
+    def remove_item(self, menu_item_id, quantity):
+        remaining = self.items.get(menu_item_id, 0) - quantity
+        if remaining > 0:
+            self.items[menu_item_id] = remaining
+        else:
+            self.items.pop(menu_item_id, None)
+
+
+class KitchenQueue:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cursor = None  # Id of the last OrderEvent applied; None until built
+        self.orders = {}  # order_id -> OpenOrder
+        self.heaps = defaultdict(list)  # station -> heap of (priority, order_id), with stale entries
+        self.work = defaultdict(dict)  # station -> {order_id: (priority, seconds)}, the live entries
+        self.ordered = {}  # station -> order ids in cooking order, taken from its heap; dropped on change
+        self.prep_seconds = {}  # menu_item_id -> learned seconds per portion
+        self.stations = {}  # menu_item_id -> category
+
+    # Building
+
+    def rebuild(self):
+        """Load open orders and recent prep times from the database."""
+        self.orders.clear()
+        self.heaps.clear()
+        self.work.clear()
+        self.ordered.clear()
+        self.prep_seconds.clear()
+        self.stations = dict(MenuItem.objects.values_list("id", "category"))
+        self.learn_history()
+
+        cursor = OrderEvent.objects.aggregate(last=Max("id"))["last"] or 0
+        open_orders = Order.objects.filter(status__in=QUEUE_STATUSES)
+        for order_id, status, created_at in open_orders.values_list("id", "status", "created_at"):
+            self.orders[order_id] = OpenOrder(order_id, created_at.timestamp(), status)
+        started = (
+            OrderStatusHistory.objects.filter(order__status="preparing", to_status="preparing")
+            .values_list("order_id").annotate(at=Max("changed_at"))
+        )
+        for order_id, started_at in started:
+            if order_id in self.orders:
+                self.orders[order_id].started_at = started_at.timestamp()
+        item_events = OrderEvent.objects.filter(
+            id__lte=cursor, kind__in=("item_added", "item_removed"), order_id__in=list(self.orders),
+        )
+        journaled = set()
+        for kind, order_id, payload in item_events.order_by("id").values_list("kind", "order_id", "payload"):
+            change = self.orders[order_id].add_item if kind == "item_added" else self.orders[order_id].remove_item
+            change(payload["menu_item_id"], payload.get("quantity", 1))
+            journaled.add(order_id)
+        journal_start = OrderEvent.objects.order_by("id").values_list("created_at", flat=True).first()
+        legacy = [
+            order.id for order in self.orders.values()
+            if order.id not in journaled and (journal_start is None or order.created_at < journal_start.timestamp())
+        ]
+        items = OrderItem.objects.filter(order_id__in=legacy)
+        for order_id, menu_item_id, quantity in items.values_list("order_id", "menu_item_id", "quantity"):
+            self.orders[order_id].add_item(menu_item_id, quantity)
+        for order in self.orders.values():
+            self.requeue(order)
+        self.cursor = cursor
+
+    def learn_history(self):
+        """Seed prep-time estimates from the most recently served orders."""
+        served = list(
+            OrderStatusHistory.objects.filter(to_status="served")
+            .order_by("-changed_at").values_list("order_id", "changed_at")[:HISTORY_SIZE]
+        )
+        if not served:
+            return
+        order_ids = [order_id for order_id, _ in served]
+        started = dict(
+            OrderStatusHistory.objects.filter(order_id__in=order_ids, to_status="preparing")
+            .values_list("order_id").annotate(at=Max("changed_at"))
+        )
+        items = defaultdict(lambda: defaultdict(int))
+        for order_id, menu_item_id, quantity in (
+            OrderItem.objects.filter(order_id__in=order_ids).values_list("order_id", "menu_item_id", "quantity")
+        ):
+            items[order_id][menu_item_id] += quantity
+        for order_id, served_at in reversed(served):  # Oldest first, so recent orders weigh most
+            if order_id in started and items[order_id]:
+                self.learn(items[order_id], (served_at - started[order_id]).total_seconds())
+
+    # Incremental updates
+
+    def sync(self):
+        """Apply the journal entries written since the last sync (or build the queue first)."""
+        if self.cursor is None:
+            self.rebuild()
+            return
+        new_events = OrderEvent.objects.filter(id__gt=self.cursor).order_by("id").values_list(
+            "id", "kind", "order_id", "payload", "created_at",
+        )
+        for event_id, kind, order_id, payload, created_at in new_events:
+            if kind in QUEUE_EVENTS:
+                self.apply(kind, order_id, payload, created_at.timestamp())
+            self.cursor = event_id
+
+    def apply(self, kind, order_id, payload, at):
+        if kind == "order_created":
+            self.orders.setdefault(order_id, OpenOrder(order_id, at))
+            return
+        order = self.orders.get(order_id)
+        if order is None:
+            return
+        if kind == "item_added":
+            order.add_item(payload["menu_item_id"], payload.get("quantity", 1))
+        elif kind == "item_removed":
+            order.remove_item(payload["menu_item_id"], payload.get("quantity", 1))
+        elif kind == "status_changed" and payload.get("to") == "preparing":
+            order.status, order.started_at = "preparing", at
+        elif kind in ("status_changed", "order_cancelled"):
+            if payload.get("to") == "served" and order.started_at is not None and order.items:
+                self.learn(order.items, at - order.started_at)
+            self.drop(order)
+            return
+        self.requeue(order)
+
+    def requeue(self, order):
+        """(Re)insert an order's entries in every station it needs, after its items or status changed."""
+        for station in order.keys:
+            self.work[station].pop(order.id, None)
+            self.ordered.pop(station, None)
+        order.keys = {}
+        priority = order.priority()
+        for station, seconds in self.station_work(order.items).items():
+            self.ordered.pop(station, None)
+            order.keys[station] = priority
+            self.work[station][order.id] = (priority, seconds)
+            heap = self.heaps[station]
+            heapq.heappush(heap, (priority, order.id))
+            if len(heap) > 2 * len(self.work[station]) + 64:  # Too many stale entries: compact
+                self.heaps[station] = [(key, oid) for oid, (key, _) in self.work[station].items()]
+                heapq.heapify(self.heaps[station])
+
+    def drop(self, order):
+        for station in order.keys:
+            self.work[station].pop(order.id, None)
+            self.ordered.pop(station, None)
+        del self.orders[order.id]
+
+    # Prep times
+
+    def station_of(self, menu_item_id):
+        if menu_item_id not in self.stations:
+            self.stations[menu_item_id] = (
+                MenuItem.objects.filter(id=menu_item_id).values_list("category", flat=True).first() or "Other"
+            )
+        return self.stations[menu_item_id]
+
+    def station_work(self, items):
+        """Seconds of work each station has for these items, cooking one portion after another."""
+        work = defaultdict(float)
+        for menu_item_id, quantity in items.items():
+            work[self.station_of(menu_item_id)] += quantity * self.prep_seconds.get(menu_item_id, default_prep_seconds())
+        return work
+
+    def learn(self, items, seconds):
+        """Scale the estimates of an order's items towards its observed prep time."""
+        predicted = max(self.station_work(items).values(), default=0)
+        if predicted <= 0 or seconds <= 0:
+            return
+        ratio = seconds / predicted
+        for menu_item_id in items:
+            estimate = self.prep_seconds.get(menu_item_id, default_prep_seconds())
+            self.prep_seconds[menu_item_id] = estimate + LEARNING_RATE * (estimate * ratio - estimate)
+
+    # Reading
+
+    def remaining(self, order_id, seconds, at):
+        order = self.orders[order_id]
+        if order.status == "preparing" and order.started_at is not None:
+            return max(seconds - (at - order.started_at), 0)
+        return seconds
+
+    def next_up(self, station):
+        """The order the station should work on next, or None."""
+        heap, live = self.heaps[station], self.work[station]
+        while heap and live.get(heap[0][1], (None,))[0] != heap[0][0]:
+            heapq.heappop(heap)  # Stale: the order moved or left the queue
+        return heap[0][1] if heap else None
+
+    def cooking_order(self, station):
+        """The station's order ids, next up first. Worked out from its heap once per change, then reused."""
+        if station not in self.ordered:
+            live = self.work[station]
+            # A heap is already mostly in order, which sorting takes advantage of; stale entries are
+            # dropped on the way, and the sorted list is a valid heap to keep.
+            entries = sorted(entry for entry in self.heaps[station] if live.get(entry[1], (None,))[0] == entry[0])
+            self.heaps[station] = entries
+            self.ordered[station] = [order_id for _, order_id in entries]
+        return self.ordered[station]
+
+    def snapshot(self):
+        """{station: [order rows in the order the station will cook them]}, with wait estimates."""
+        at = time()
+        stations = {}
+        for station, live in self.work.items():
+            if not live:
+                continue
+            waited, rows = 0.0, []
+            for order_id in self.cooking_order(station):
+                order = self.orders[order_id]
+                left = self.remaining(order_id, live[order_id][1], at)
+                waited += left
+                rows.append({
+                    "order_id": order_id,
+                    "status": order.status,
+                    "items": [
+                        {"menu_item_id": menu_item_id, "quantity": quantity}
+                        for menu_item_id, quantity in order.items.items()
+                        if self.stations.get(menu_item_id) == station
+                    ],
+                    "prep_seconds": round(left),
+                    "eta_seconds": round(waited),
+                })
+            stations[station] = rows
+        return stations
+
+    def eta(self, order_id):
+        """Seconds until every station has finished the order, or None if it is not queued."""
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        at, slowest = time(), 0.0
+        for station in order.keys:
+            live, waited = self.work[station], 0.0
+            for other_id in self.cooking_order(station):
+                waited += self.remaining(other_id, live[other_id][1], at)
+                if other_id == order_id:
+                    break
+            slowest = max(slowest, waited)
+        return slowest
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+@contextmanager
+def kitchen_queue():
+    """The current branch's queue, brought up to date with the journal and locked while in use."""
+    alias = current_alias()
+    with _queues_lock:
+        queue = _queues.setdefault(alias, KitchenQueue())
+    with queue.lock:
+        queue.sync()
+        yield queue
+
+
+def reset():
+    """Forget every queue; each is rebuilt from the database on next use."""
+    with _queues_lock:
+        _queues.clear()
@@ -0,0 +1,302 @@
+"""
+Lunch-rush load generator behind `manage.py loadtest`.
+
+Each virtual user is a thread with its own JWT (from /api/token/) playing one
+persona against a running server, pausing a random think time between actions:
+
+    waiter   places orders, adds and removes items, bills its orders
+    kitchen  polls the kitchen queue and moves orders along
+    cashier  prints and settles the receipts waiters created, reads sales reports
+    kiosk    polls the menu and places orders
+
+Every request is timed and recorded per endpoint (ids in paths collapse to
+{id}), with its status; a 503 "database is locked" answer (hotel_app.exceptions)
+is counted separately, so lock contention shows up per endpoint.
+"""
+import json
+import math
+import random
+import re
+import threading
+from collections import Counter, deque
+from time import monotonic, perf_counter, sleep
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.utils.timezone import localdate
+
+from hotel_app.exceptions import DATABASE_LOCKED
+
+PERSONAS = ("waiter", "kitchen", "cashier", "kiosk")
+DEFAULT_MIX = {"waiter": 5, "kitchen": 2, "cashier": 1, "kiosk": 4}
+IDS_IN_PATH = re.compile(r"/\d+(?=/)")
+
+
+def percentile(ordered, share):
+    """Nearest-rank percentile of the sorted list `ordered` (share in 0..100)."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(share / 100 * len(ordered)) - 1))]
+
+
+class Recorder:
+    """Latencies and outcomes per endpoint, shared by every virtual user."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}  # endpoint -> [seconds]
+        self.outcomes = {}  # endpoint -> Counter of "ok", "error", "locked", "throttled"
+
+    def record(self, endpoint, seconds, status_code, locked=False):
+        if locked:
+            outcome = "locked"
+        elif status_code == 429:
+            outcome = "throttled"
+        elif status_code == 0 or status_code >= 400:
+            outcome = "error"
+        else:
+            outcome = "ok"
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            self.outcomes.setdefault(endpoint, Counter())[outcome] += 1
+
+    def rows(self, elapsed):
+        """One summary dict per endpoint, busiest first, then the total."""
+        with self.lock:
+            groups = [(endpoint, sorted(times), self.outcomes[endpoint]) for endpoint, times in self.latencies.items()]
+        everything = sorted(t for _, times, _ in groups for t in times)
+        total = sum((outcomes for _, _, outcomes in groups), Counter())
+        rows = []
+        for endpoint, times, outcomes in sorted(groups, key=lambda group: -len(group[1])) + [("TOTAL", everything, total)]:
+            count = len(times)
+            rows.append({
+                "endpoint": endpoint,
+                "requests": count,
+                "rps": count / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(times, 50) * 1000,
+                "p95_ms": percentile(times, 95) * 1000,
+                "p99_ms": percentile(times, 99) * 1000,
+                "error_rate": (count - outcomes["ok"]) / count if count else 0.0,
+                "locked": outcomes["locked"],
+                "throttled": outcomes["throttled"],
+            })
+        return rows
+
+
+class Client:
+    def __init__(self, base_url, recorder, branch=None):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.branch = branch
+        self.token = None
+
+    def request(self, method, path, body=None, record=True):
+        """(status, parsed JSON or None); status 0 when the server could not be reached."""
+        headers = {"Accept": "application/json"}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if self.branch:
+            headers["X-Branch"] = self.branch
+        data = None if body is None else json.dumps(body).encode()
+        request = Request(self.base_url + path, data=data, method=method, headers=headers)
+
+        start = perf_counter()
+        try:
+            with urlopen(request, timeout=30) as response:
+                status_code, raw = response.status, response.read()
+        except HTTPError as error:
+            status_code, raw = error.code, error.read()
+        except (URLError, OSError):
+            status_code, raw = 0, b""
+        elapsed = perf_counter() - start
+
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            payload = None
+        locked = status_code == 503 and isinstance(payload, dict) and payload.get("error") == DATABASE_LOCKED
+        if record:
+            endpoint = f"{method} {IDS_IN_PATH.sub('/{id}', path.split('?')[0])}"
+            self.recorder.record(endpoint, elapsed, status_code, locked)
+        return status_code, payload
+
+    def login(self, username, password, deadline):
+        """Get an access token through /api/token/, waiting out the token throttle if needed."""
+        while monotonic() < deadline:
+            status_code, payload = self.request("POST", "/api/token/", {"username": username, "password": password})
+            if status_code == 200:
+                self.token = payload["access"]
+                return True
+            if status_code not in (429, 503):
+                return False
+            sleep(random.uniform(1, 3))
+        return False
+
+
+class Shared:
+    """What the virtual users know about each other: the menu, the waiters and receipts waiting to be printed."""
+
+    def __init__(self, menu_item_ids, waiter_ids):
+        self.menu_item_ids = menu_item_ids
+        self.waiter_ids = waiter_ids
+        self.lock = threading.Lock()
+        self.unprinted = deque(maxlen=1000)
+        self.printed = deque(maxlen=1000)
+
+
+class Persona:
+    actions = ()  # (weight, method name)
+
+    def __init__(self, client, shared, rng):
+        self.client = client
+        self.shared = shared
+        self.rng = rng
+
+    def step(self):
+        names = [name for _, name in self.actions]
+        weights = [weight for weight, _ in self.actions]
+        getattr(self, self.rng.choices(names, weights)[0])()
+
+    def browse_menu(self):
+        self.client.request("GET", "/api/menu-items/")
+
+    def place_order(self):
+        items = self.rng.sample(self.shared.menu_item_ids, k=min(len(self.shared.menu_item_ids), self.rng.randint(1, 3)))
+        status_code, payload = self.client.request("POST", "/api/orders/", {"items": items})
+        if status_code == 201:
+            return payload["id"], len(items)
+        return None
+
+
+class Waiter(Persona):
+    actions = ((4, "place_order"), (4, "add_item"), (1, "remove_item"), (2, "bill"), (1, "browse_menu"))
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.open_orders = {}  # order_id -> number of lines
+
+    def place_order(self):
+        placed = super().place_order()
+        if placed:
+            self.open_orders[placed[0]] = placed[1]
+
+    def add_item(self):
+        if not self.open_orders:
+            return self.place_order()
+        order_id = self.rng.choice(list(self.open_orders))
+        menu_item_id = self.rng.choice(self.shared.menu_item_ids)
+        status_code, _ = self.client.request("POST", f"/api/orders/{order_id}/add_item/", {"menu_item_id": menu_item_id})
+        if status_code == 200:
+            self.open_orders[order_id] += 1  # An upper bound: the item may already have been on the order
+        elif status_code == 400:
+            self.open_orders.pop(order_id)  # The kitchen has started on it
+
+    def remove_item(self):
+        candidates = [order_id for order_id, lines in self.open_orders.items() if lines > 1]
+        if not candidates:
+            return self.add_item()
+        order_id = self.rng.choice(candidates)
+        status_code, order = self.client.request("GET", f"/api/orders/{order_id}/")
+        if status_code != 200 or len(order["item_details"]) < 2:
+            return
+        line = self.rng.choice(order["item_details"])
+        status_code, _ = self.client.request("POST", f"/api/orders/{order_id}/remove_item/", {"menu_item_id": line["id"]})
+        self.open_orders[order_id] = len(order["item_details"]) - (status_code == 200)
+
+    def bill(self):
+        if not self.open_orders:
+            return self.place_order()
+        order_ids = list(self.open_orders)[: self.rng.randint(1, 3)]
+        status_code, payload = self.client.request("POST", "/api/receipts/", {"orders": order_ids})
+        for order_id in order_ids:
+            self.open_orders.pop(order_id, None)
+        if status_code == 201:
+            with self.shared.lock:
+                self.shared.unprinted.append(payload["id"])
+
+
+class KitchenScreen(Persona):
+    actions = ((3, "poll_queue"), (2, "advance"))
+
+    def poll_queue(self):
+        return self.client.request("GET", "/api/kitchen/queue/")
+
+    def advance(self):
+        status_code, payload = self.poll_queue()
+        if status_code != 200:
+            return
+        rows = [row for station in payload["stations"] for row in station["orders"]]
+        for current, target in (("preparing", "served"), ("pending", "preparing")):
+            order_ids = list(dict.fromkeys(row["order_id"] for row in rows if row["status"] == current))[:5]
+            if order_ids:
+                self.client.request("POST", "/api/orders/transition/", {"order_ids": order_ids, "status": target})
+
+
+class Cashier(Persona):
+    actions = ((3, "print_receipt"), (2, "settle"), (1, "sales_report"))
+
+    def print_receipt(self):
+        with self.shared.lock:
+            receipt_id = self.shared.unprinted.popleft() if self.shared.unprinted else None
+        if receipt_id is None:
+            return self.sales_report()
+        status_code, _ = self.client.request("PATCH", f"/api/receipts/{receipt_id}/", {"printed": True})
+        if status_code == 200:
+            with self.shared.lock:
+                self.shared.printed.append(receipt_id)
+
+    def settle(self):
+        with self.shared.lock:
+            receipt_ids = [self.shared.printed.popleft() for _ in range(min(5, len(self.shared.printed)))]
+        if receipt_ids:
+            self.client.request("POST", "/api/receipts/settle/", {"receipt_ids": receipt_ids})
+        elif self.shared.waiter_ids:  # End of shift for one waiter
+            waiter_id = self.rng.choice(self.shared.waiter_ids)
+            self.client.request("POST", "/api/receipts/settle/", {"waiter": waiter_id, "date": localdate().isoformat()})
+
+    def sales_report(self):
+        self.client.request("GET", "/api/sales-reports/")
+
+
+class Kiosk(Persona):
+    actions = ((3, "browse_menu"), (1, "place_order"))
+
+
+PERSONA_CLASSES = {"waiter": Waiter, "kitchen": KitchenScreen, "cashier": Cashier, "kiosk": Kiosk}
+
+
+def username(persona, number):
+    return f"loadtest-{persona}-{number}"
+
+
+def run(base_url, mix, shared, password, duration, think=0.5, branch=None, seed=None):
+    """Play `mix` ({persona: virtual users}) against `base_url` for `duration` seconds; returns (Recorder, seconds).
+
+    Every virtual user logs in as its loadtest-* account with `password`, the one set up for this run.
+    """
+    recorder = Recorder()
+    seeds = random.Random(seed)
+    start = monotonic()
+    deadline = start + duration
+
+    def virtual_user(persona, number, rng):
+        client = Client(base_url, recorder, branch)
+        if not client.login(username(persona, number), password, deadline):
+            return
+        player = PERSONA_CLASSES[persona](client, shared, rng)
+        while monotonic() < deadline:
+            player.step()
+            if think:
+                sleep(min(rng.expovariate(1 / think), max(0.0, deadline - monotonic())))
+
+    threads = [
+        threading.Thread(target=virtual_user, args=(persona, number, random.Random(seeds.random())), daemon=True)
+        for persona, count in mix.items() for number in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, monotonic() - start
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils.timezone import now
+
+from hotel_app.branches import DEFAULT_BRANCH, current_alias, use_branch
+from hotel_app.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = "Move completed orders on settled receipts out of the live tables into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, default=7,
+            help="Archive orders created more than this many days ago (default: 7).",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Number of orders moved per transaction (default: 500).",
+        )
+        parser.add_argument(
+            "--compact", action="store_true",
+            help="Run VACUUM once the orders have been archived to give the space back.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report how many orders would be archived.",
+        )
+        parser.add_argument(
+            "--branch", default=DEFAULT_BRANCH,
+            help="Branch whose database to work on (default: main).",
+        )
+
+    def handle(self, *args, **options):
+        with use_branch(options["branch"]):
+            self.archive(options)
+
+    def archive(self, options):
+        cutoff = now() - timedelta(days=options["older_than"])
+        # Only settled receipts: an open one recomputes its total from its orders on the next save.
+        candidates = (
+            Order.objects.filter(status="completed", created_at__lt=cutoff, receipt__settled=True)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{candidates.count()} orders created before {cutoff:%Y-%m-%d %H:%M} would be archived.")
+            return
+
+        archived = 0
+        while True:
+            # One short transaction per chunk keeps the SQLite write lock brief for live traffic.
+            with transaction.atomic(using=current_alias()):
+                order_ids = list(candidates[:options["chunk_size"]])
+                if not order_ids:
+                    break
+                archived += self.archive_chunk(order_ids)
+            self.stdout.write(f"Archived {archived} orders...")
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} orders created before {cutoff:%Y-%m-%d %H:%M}."))
+
+        if options["compact"]:
+            self.compact()
+
+    def archive_chunk(self, order_ids):
+        """Copy one chunk of orders and their items into the archive, then delete the live rows."""
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=order.id,
+                customer_id=order.customer_id,
+                total_price=order.total_price,
+                status=order.status,
+                receipt_id=order.receipt_id,
+                created_at=order.created_at,
+                updated_at=order.updated_at,
+            )
+            for order in Order.objects.filter(id__in=order_ids)
+        ])
+
+        items = OrderItem.objects.filter(order_id__in=order_ids).values_list(
+            "order_id", "menu_item_id", "menu_item__name", "quantity", "price_at_time_of_order"
+        )
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(
+                order_id=order_id,
+                menu_item_id=menu_item_id,
+                menu_item_name=menu_item_name,
+                quantity=quantity,
+                price_at_time_of_order=price,
+            )
+            for order_id, menu_item_id, menu_item_name, quantity, price in items
+        ])
+
+        # Cascades to the OrderItem rows and the Receipt.orders link table.
+        Order.objects.filter(id__in=order_ids).delete()
+        return len(order_ids)
+
+    def compact(self):
+        connection = connections[current_alias()]
+        if connection.vendor not in ("sqlite", "postgresql"):
+            self.stdout.write(f"Compaction is not supported on {connection.vendor}, skipping.")
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM")
+        self.stdout.write(self.style.SUCCESS("Database compacted."))
@@ -0,0 +1,80 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Count, Max, Q, Sum
+
+from hotel_app.branches import DEFAULT_BRANCH, current_alias, use_branch
+from hotel_app.models import ArchivedOrder, ArchivedOrderItem, CustomerStats, Order, OrderItem, Receipt
+
+
+class Command(BaseCommand):
+    help = "Rebuild every customer's order statistics from the live and archived order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--branch", default=DEFAULT_BRANCH,
+            help="Branch whose database to work on (default: main).",
+        )
+
+    def handle(self, *args, **options):
+        with use_branch(options["branch"]):
+            alias = current_alias()
+            # Aggregate and replace in one transaction. SQLite lets no other writer commit in
+            # between; on PostgreSQL it has to be SERIALIZABLE for that (READ COMMITTED would
+            # let a settle commit between the two and be wiped out), and a concurrent settle
+            # then fails this run with a serialization error instead - run it again.
+            with transaction.atomic(using=alias):
+                if connections[alias].vendor == "postgresql":
+                    with connections[alias].cursor() as cursor:
+                        cursor.execute("SET TRANSACTION ISOLATION LEVEL SERIALIZABLE")
+                stats = self.build()
+                CustomerStats.objects.all().delete()
+                CustomerStats.objects.bulk_create(stats.values(), batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f"Built stats for {len(stats)} customers."))
+
+    def build(self):
+        stats = {}
+
+        def row(customer_id):
+            if customer_id not in stats:
+                stats[customer_id] = CustomerStats(user_id=customer_id)
+            return stats[customer_id]
+
+        # One grouped query per order table for counts, spend and last visit...
+        settled = Q(receipt__settled=True)
+        archived_settled = Q(receipt_id__in=Receipt.objects.filter(settled=True).values("id"))
+        for model, spend_filter in ((Order, settled), (ArchivedOrder, archived_settled)):
+            totals = (
+                model.objects.filter(customer__isnull=False).values("customer_id")
+                .annotate(
+                    order_count=Count("id", filter=Q(status="completed")),
+                    last_visit=Max("created_at", filter=Q(status="completed")),
+                    lifetime_spend=Sum("total_price", filter=spend_filter),
+                )
+            )
+            for totals_row in totals:
+                stats_row = row(totals_row["customer_id"])
+                stats_row.order_count += totals_row["order_count"]
+                stats_row.lifetime_spend += totals_row["lifetime_spend"] or Decimal("0.00")
+                if totals_row["last_visit"] and (stats_row.last_visit is None or totals_row["last_visit"] > stats_row.last_visit):
+                    stats_row.last_visit = totals_row["last_visit"]
+
+        # ...and one per item table for the favorites.
+        items = defaultdict(dict)
+        for customer_id, menu_item_id, name, quantity in (
+            OrderItem.objects.filter(order__status="completed")
+            .values_list("order__customer_id", "menu_item_id", "menu_item__name").annotate(quantity=Sum("quantity"))
+        ):
+            items[customer_id][menu_item_id] = (name, quantity)
+        for customer_id, menu_item_id, name, quantity in (
+            ArchivedOrderItem.objects.filter(order__status="completed", order__customer__isnull=False, menu_item_id__isnull=False)
+            .values_list("order__customer_id", "menu_item_id", "menu_item_name").annotate(quantity=Sum("quantity"))
+        ):
+            current_name, current_quantity = items[customer_id].get(menu_item_id, (name, 0))
+            items[customer_id][menu_item_id] = (current_name, current_quantity + quantity)
+        for customer_id, counts in items.items():
+            row(customer_id).add_items(counts)
+
+        return {customer_id: stats_row for customer_id, stats_row in stats.items() if stats_row.order_count or stats_row.lifetime_spend}
@@ -0,0 +1,151 @@
+import gzip
+import os
+from decimal import Decimal
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import SimpleRateThrottle
+
+from hotel_app.branches import current_alias
+from hotel_app.fastjson import FastJSONRenderer, orjson
+from hotel_app.middleware import brotli
+from hotel_app.models import MenuItem, Order, OrderItem, Receipt
+from hotel_app.serializers import OrderSerializer, ReceiptSerializer
+from hotel_app.throttling import MenuReadThrottle
+
+
+class StockAnonThrottle(SimpleRateThrottle):
+    """DRF's own history-list throttle, for comparison."""
+    rate = "1000000/min"
+    scope = "benchmark"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class Command(BaseCommand):
+    help = "Time hot code paths in-process and print the cost per call."
+    subjects = ("homepage", "json", "throttle")
+
+    def add_arguments(self, parser):
+        parser.add_argument("subject", choices=self.subjects)
+        parser.add_argument(
+            "--iterations", type=int, default=10000,
+            help="Calls to time (default: 10000).",
+        )
+        parser.add_argument(
+            "--rows", type=int, default=100,
+            help="Orders (and half as many receipts) in the json payloads (default: 100).",
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        getattr(self, f"bench_{options['subject']}")(options["iterations"])
+
+    def report(self, label, seconds, iterations):
+        self.stdout.write(f"{label:<40} {seconds / iterations * 1e6:8.2f} us/call")
+
+    def timed(self, func, iterations):
+        start = perf_counter()
+        for _ in range(iterations):
+            func()
+        return perf_counter() - start
+
+    def bench_throttle(self, iterations):
+        request = Request(APIRequestFactory().get("/api/menu-items/"))
+        request.user  # Resolve the anonymous user up front, like a real request would
+
+        throttle = MenuReadThrottle()
+        throttle.num_requests = iterations + 1  # Never actually throttle
+        self.report("ScopedCounterThrottle.allow_request", self.timed(lambda: throttle.allow_request(request, None), iterations), iterations)
+        caches[throttle.cache_alias].clear()
+
+        stock = StockAnonThrottle()
+        self.report("DRF SimpleRateThrottle.allow_request", self.timed(lambda: stock.allow_request(request, None), iterations), iterations)
+        stock.cache.delete(stock.get_cache_key(request, None))
+
+    def bench_homepage(self, iterations):
+        with override_settings(ALLOWED_HOSTS=["*"], SECURE_SSL_REDIRECT=False):
+            client = Client()
+
+            def cold():
+                caches["default"].clear()  # Every fragment rendered from scratch, as before fragment caching
+                return client.get("/")
+
+            size = len(cold().content)
+            self.report("homepage, fragments rendered", self.timed(cold, iterations), iterations)
+            client.get("/")
+            self.report("homepage, fragments cached", self.timed(lambda: client.get("/"), iterations), iterations)
+        self.stdout.write(f"{'homepage HTML':<40} {size:8d} bytes")
+
+        # Bytes on the wire for the static assets, from what collectstatic wrote.
+        totals = {"": 0, ".gz": 0, ".br": 0}
+        for root, _, files in os.walk(settings.STATIC_ROOT):
+            for name in files:
+                if name.endswith((".css", ".js")):
+                    path = os.path.join(root, name)
+                    for suffix in totals:
+                        if os.path.exists(path + suffix):
+                            totals[suffix] += os.path.getsize(path + suffix)
+        if not totals[""]:
+            self.stdout.write("Run collectstatic first to measure the static assets.")
+            return
+        for suffix, label in (("", "identity"), (".gz", "gzip"), (".br", "brotli")):
+            self.stdout.write(f"{'static css/js, ' + label:<40} {totals[suffix]:8d} bytes")
+
+    def bench_json(self, iterations):
+        if orjson is None:
+            self.stdout.write("orjson is not installed: FastJSONRenderer falls back to the stdlib.")
+        with transaction.atomic(using=current_alias()):  # Sample data, rolled back afterwards
+            payloads = self.sample_payloads(self.options["rows"])
+            transaction.set_rollback(True, using=current_alias())
+
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        for name, data in payloads.items():
+            self.report(f"{name}, DRF JSONRenderer", self.timed(lambda: stock.render(data), iterations), iterations)
+            self.report(f"{name}, FastJSONRenderer", self.timed(lambda: fast.render(data), iterations), iterations)
+            body = fast.render(data)
+            sizes = [("identity", len(body)), ("gzip", len(gzip.compress(body, compresslevel=6, mtime=0)))]
+            if brotli is not None:
+                sizes.append(("brotli", len(brotli.compress(body, quality=5))))
+            for label, size in sizes:
+                self.stdout.write(f"{name + ', ' + label:<40} {size:8d} bytes")
+
+    def sample_payloads(self, rows):
+        """The /api/orders/ and /api/receipts/ list bodies for `rows` freshly created orders."""
+        waiter = get_user_model().objects.create_user(username="benchmark-waiter", password=None, first_name="Bench")
+        items = MenuItem.objects.bulk_create(
+            MenuItem(name=f"Benchmark dish {i}", price=Decimal("4.50") + i, category="Food", quantity=1000)
+            for i in range(10)
+        )
+        orders = []
+        for i in range(rows):
+            picked = [items[(i + offset) % len(items)] for offset in range(3)]
+            order = Order.objects.create(customer=waiter)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, menu_item=item, quantity=1 + offset, price_at_time_of_order=item.price)
+                for offset, item in enumerate(picked)
+            )
+            order.summarize([(item.id, item.name, 1 + offset, item.price) for offset, item in enumerate(picked)])
+            order.save(update_fields=Order.SUMMARY_FIELDS)
+            orders.append(order)
+        for pair in range(0, rows - 1, 2):
+            receipt = Receipt.objects.create(waiter=waiter)
+            receipt.orders.set(orders[pair:pair + 2])
+        order_rows = Order.objects.filter(customer=waiter).select_related("customer").order_by("id")
+        receipt_rows = (
+            Receipt.objects.filter(waiter=waiter).select_related("waiter")
+            .prefetch_related("orders__orderitem_set__menu_item").order_by("id")
+        )
+        return {
+            "/api/orders/": OrderSerializer(order_rows, many=True).data,
+            "/api/receipts/": ReceiptSerializer(receipt_rows, many=True).data,
+        }
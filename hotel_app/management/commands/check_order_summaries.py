@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from hotel_app.branches import DEFAULT_BRANCH, use_branch
+from hotel_app.models import Order, OrderItem
+
+SUMMARY_COLUMNS = ("total_price", "line_count", "item_quantity", "item_summary")
+
+
+class Command(BaseCommand):
+    help = "Compare each order's total and summary columns with its lines and report where they differ."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true",
+            help="Overwrite the stored columns with the values recomputed from the lines.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000,
+            help="Orders checked per round trip (default: 1000).",
+        )
+        parser.add_argument(
+            "--branch", default=DEFAULT_BRANCH,
+            help="Branch whose database to work on (default: main).",
+        )
+
+    def handle(self, *args, **options):
+        with use_branch(options["branch"]):
+            checked, differences = self.audit(options["chunk_size"], options["fix"])
+        action = "Fixed" if options["fix"] else "Found"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} orders. {action} {differences} inconsistent summaries."))
+
+    def audit(self, chunk_size, fix):
+        checked = differences = 0
+        last_id = 0
+        while True:
+            stored = list(
+                Order.objects.filter(id__gt=last_id).order_by("id").values("id", *SUMMARY_COLUMNS)[:chunk_size]
+            )
+            if not stored:
+                return checked, differences
+            last_id = stored[-1]["id"]
+            lines = defaultdict(list)
+            for order_id, *line in (
+                OrderItem.objects.filter(order_id__in=[row["id"] for row in stored]).order_by("id")
+                .values_list("order_id", "menu_item_id", "menu_item__name", "quantity", "price_at_time_of_order")
+            ):
+                lines[order_id].append(line)
+
+            stale = []
+            for row in stored:
+                expected = Order.summary_of(lines[row["id"]])
+                wrong = [column for column in SUMMARY_COLUMNS if row[column] != expected[column]]
+                if wrong:
+                    differences += 1
+                    self.stdout.write(f"Order {row['id']}: {', '.join(wrong)} out of date")
+                    stale.append(Order(id=row["id"], **expected))
+            if fix and stale:
+                Order.objects.bulk_update(stale, SUMMARY_COLUMNS)
+            checked += len(stored)
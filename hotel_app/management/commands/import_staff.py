@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.branches import DEFAULT_BRANCH, use_branch
+from hotel_app.staff_import import StaffImportError, import_staff
+
+
+class Command(BaseCommand):
+    help = "Create staff accounts from a CSV of username,email,role[,password], hashing passwords in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a username,email,role[,password] header.")
+        parser.add_argument(
+            "--workers", type=int,
+            help="Processes to hash passwords in (default: PASSWORD_HASH_WORKERS or half the CPU cores).",
+        )
+        parser.add_argument(
+            "--branch", default=DEFAULT_BRANCH,
+            help="Branch whose database to work on (default: main).",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["path"], encoding="utf-8-sig") as source:
+            text = source.read()
+        with use_branch(options["branch"]):
+            try:
+                results = import_staff(text, workers=options["workers"])
+            except StaffImportError as error:
+                raise CommandError(str(error))
+        created = 0
+        for result in results:
+            if result["status"] == "created":
+                created += 1
+                password = f"\ttemporary password: {result['password']}" if "password" in result else ""
+                self.stdout.write(f"Row {result['row']}: created {result['username']}{password}")
+            else:
+                problems = "; ".join(f"{field}: {message}" for field, message in result["errors"].items())
+                self.stdout.write(self.style.ERROR(f"Row {result['row']}: {result['username'] or '-'} not created ({problems})"))
+        self.stdout.write(self.style.SUCCESS(f"Created {created} of {len(results)} staff accounts."))
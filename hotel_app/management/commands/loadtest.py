@@ -0,0 +1,143 @@
+import secrets
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.test import override_settings
+
+from hotel_app import loadtest
+from hotel_app.branches import DEFAULT_BRANCH, use_branch
+from hotel_app.models import MenuItem
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass  # One line per request would drown the report
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a lunch rush: concurrent waiters, kitchen screens, cashiers and kiosks against a running "
+        "server, then report throughput, latency percentiles, errors and 'database is locked' answers per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000",
+            help="Server to load (default: http://127.0.0.1:8000, e.g. manage.py runserver).",
+        )
+        parser.add_argument(
+            "--serve", action="store_true",
+            help="Start a threaded server in this process on a free port and load it instead of --url.",
+        )
+        parser.add_argument(
+            "--mix", default=",".join(f"{persona}={count}" for persona, count in loadtest.DEFAULT_MIX.items()),
+            help="Virtual users per persona (default: %(default)s).",
+        )
+        parser.add_argument("--duration", type=float, default=30, help="Seconds to run (default: 30).")
+        parser.add_argument(
+            "--think", type=float, default=0.5,
+            help="Mean pause in seconds between a user's actions (default: 0.5; 0 for none).",
+        )
+        parser.add_argument("--seed", type=int, help="Random seed, to repeat a run's choices.")
+        parser.add_argument(
+            "--branch", default=DEFAULT_BRANCH,
+            help="Branch to set the load test users up in and send requests to (default: main).",
+        )
+        parser.add_argument(
+            "--allow-production", action="store_true",
+            help="Run even though DEBUG is off: the run creates real accounts and orders in this database.",
+        )
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options["mix"])
+        if not settings.DEBUG and not options["allow_production"]:
+            raise CommandError("DEBUG is off: this looks like a production database. Pass --allow-production to load it anyway.")
+        password = secrets.token_urlsafe(24)  # Fresh for every run, never printed
+        with use_branch(options["branch"]):
+            shared = self.set_up(mix, password)
+        try:
+            if not options["serve"]:
+                return self.load(options["url"], mix, shared, password, options)
+            # Plain HTTP on localhost, like the benchmark's test client.
+            with override_settings(ALLOWED_HOSTS=["127.0.0.1"], SECURE_SSL_REDIRECT=False):
+                server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+                server.set_app(get_internal_wsgi_application())
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                try:
+                    self.load(f"http://127.0.0.1:{server.server_address[1]}", mix, shared, password, options)
+                finally:
+                    server.shutdown()
+                    server.server_close()
+        finally:
+            with use_branch(options["branch"]):
+                self.tear_down(mix)
+
+    def load(self, url, mix, shared, password, options):
+        self.stdout.write(f"Loading {url} for {options['duration']:g}s with {sum(mix.values())} users ({options['mix']})...")
+        recorder, elapsed = loadtest.run(
+            url, mix, shared, password, options["duration"], options["think"], options["branch"], options["seed"],
+        )
+        self.report(recorder.rows(elapsed))
+
+    def parse_mix(self, text):
+        mix = {}
+        for part in filter(None, (part.strip() for part in text.split(","))):
+            persona, _, count = part.partition("=")
+            if persona not in loadtest.PERSONAS or not count.isdigit():
+                raise CommandError(f"Bad --mix entry {part!r}: use persona=count with personas {', '.join(loadtest.PERSONAS)}.")
+            mix[persona] = int(count)
+        if not sum(mix.values()):
+            raise CommandError("--mix has no users.")
+        return mix
+
+    def accounts(self, mix):
+        """The loadtest-* username of every virtual user in `mix`, with its role."""
+        roles = {"waiter": "waiter", "kitchen": "kitchen", "cashier": "cashier", "kiosk": "customer"}
+        return {
+            loadtest.username(persona, number): roles[persona]
+            for persona, count in mix.items() for number in range(count)
+        }
+
+    def set_up(self, mix, password):
+        """Create or reactivate the load test accounts with `password`, and a few menu items if missing; returns what the users share."""
+        User = get_user_model()
+        wanted = self.accounts(mix)
+        hashed = make_password(password)  # Hashed once for every account
+        existing = set(User.objects.filter(username__in=wanted).values_list("username", flat=True))
+        # Accounts left by earlier runs get their persona's role back, lose any staff flag and take this run's password.
+        for role in set(wanted.values()):
+            User.objects.filter(username__in=[name for name in existing if wanted[name] == role]).update(
+                password=hashed, role=role, is_active=True, is_staff=False, is_superuser=False,
+            )
+        User.objects.bulk_create([
+            User(username=name, password=hashed, role=role)
+            for name, role in wanted.items() if name not in existing
+        ])
+
+        menu_item_ids = list(MenuItem.objects.filter(availability=True).values_list("id", flat=True)[:20])
+        if len(menu_item_ids) < 5:
+            for number in range(5 - len(menu_item_ids)):
+                item, _ = MenuItem.objects.get_or_create(
+                    name=f"Load test dish {number}", defaults={"price": 5 + number, "category": "Food", "quantity": 100000},
+                )
+                menu_item_ids.append(item.id)
+        waiter_ids = list(User.objects.filter(username__startswith="loadtest-waiter-").values_list("id", flat=True))
+        return loadtest.Shared(menu_item_ids, waiter_ids)
+
+    def tear_down(self, mix):
+        """Deactivate the load test accounts: nobody can log in with them, or use a token they were issued, between runs."""
+        get_user_model().objects.filter(username__in=self.accounts(mix)).update(is_active=False)
+
+    def report(self, rows):
+        self.stdout.write(
+            f"{'endpoint':<42} {'reqs':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'locked':>6} {'429':>5}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['endpoint']:<42} {row['requests']:>6} {row['rps']:>7.1f} {row['p50_ms']:>8.1f} "
+                f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['error_rate']:>7.1%} {row['locked']:>6} {row['throttled']:>5}"
+            )
@@ -0,0 +1,96 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localdate
+
+from hotel_app.branches import DEFAULT_BRANCH, use_branch
+from hotel_app.models import Order, OrderEvent, SalesReport
+
+REPORT_FIELDS = ("printed_receipts_count", "settled_receipts_count", "total_printed_amount", "total_settled_amount")
+
+
+class Command(BaseCommand):
+    help = "Rebuild order totals and sales reports from the event journal and report where they differ."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true",
+            help="Overwrite the stored values with the ones rebuilt from the journal.",
+        )
+        parser.add_argument(
+            "--branch", default=DEFAULT_BRANCH,
+            help="Branch whose database to work on (default: main).",
+        )
+
+    def handle(self, *args, **options):
+        with use_branch(options["branch"]):
+            order_diffs = self.audit_order_totals(options["fix"])
+            report_diffs = self.audit_sales_reports(options["fix"])
+        action = "Fixed" if options["fix"] else "Found"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {order_diffs} order total and {report_diffs} sales report differences."
+        ))
+
+    def replay_order_totals(self):
+        totals = defaultdict(Decimal)
+        journal = (
+            OrderEvent.objects.filter(kind__in=("item_added", "item_removed"))
+            .order_by("id")
+            .values_list("order_id", "kind", "payload")
+        )
+        for order_id, kind, payload in journal.iterator(chunk_size=2000):
+            line = Decimal(str(payload.get("price") or 0)) * int(payload.get("quantity") or 0)
+            totals[order_id] += line if kind == "item_added" else -line
+        return totals
+
+    def audit_order_totals(self, fix):
+        totals = self.replay_order_totals()
+        differences = 0
+        stored = Order.objects.order_by("id").values_list("id", "total_price")
+        for order_id, total_price in stored.iterator(chunk_size=2000):
+            if order_id not in totals or totals[order_id] == total_price:
+                continue  # Orders placed before the journal existed are left alone
+            differences += 1
+            self.stdout.write(f"Order {order_id}: stored {total_price}, journal {totals[order_id]}")
+            if fix:
+                Order.objects.filter(id=order_id).update(total_price=totals[order_id])
+        return differences
+
+    def replay_sales_reports(self):
+        """Same bookkeeping as the receipt post_save receiver: settling moves a receipt out of the printed totals."""
+        reports = defaultdict(lambda: dict.fromkeys(REPORT_FIELDS, 0))
+        printed_receipts = set()
+        journal = (
+            OrderEvent.objects.filter(kind__in=("receipt_printed", "receipt_settled"))
+            .order_by("id")
+            .values_list("receipt_id", "kind", "payload", "created_at")
+        )
+        for receipt_id, kind, payload, created_at in journal.iterator(chunk_size=2000):
+            report = reports[(payload["waiter_id"], localdate(created_at))]
+            amount = Decimal(str(payload.get("amount") or 0))
+            if kind == "receipt_printed":
+                printed_receipts.add(receipt_id)
+                report["printed_receipts_count"] += 1
+                report["total_printed_amount"] += amount
+            else:
+                report["settled_receipts_count"] += 1
+                report["total_settled_amount"] += amount
+                if receipt_id in printed_receipts:
+                    report["printed_receipts_count"] = max(0, report["printed_receipts_count"] - 1)
+                    report["total_printed_amount"] = max(0, report["total_printed_amount"] - amount)
+        return reports
+
+    def audit_sales_reports(self, fix):
+        differences = 0
+        for (waiter_id, date), replayed in self.replay_sales_reports().items():
+            stored = SalesReport.objects.filter(waiter_id=waiter_id, date=date).values(*REPORT_FIELDS).first()
+            if stored is not None and all(stored[field] == replayed[field] for field in REPORT_FIELDS):
+                continue
+            differences += 1
+            self.stdout.write(f"Sales report waiter={waiter_id} date={date}: stored {stored}, journal {replayed}")
+            if fix:
+                SalesReport.objects.filter(waiter_id=waiter_id, date=date).delete()
+                report = SalesReport.objects.create(waiter_id=waiter_id, **replayed)
+                SalesReport.objects.filter(pk=report.pk).update(date=date)  # date is auto_now_add
+        return differences
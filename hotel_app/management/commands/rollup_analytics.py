@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from hotel_app.analytics import rebuild_hourly_rollups, refresh_hourly_rollups
+from hotel_app.branches import DEFAULT_BRANCH, use_branch
+
+
+class Command(BaseCommand):
+    help = "Fold newly completed orders into the hourly menu item rollup (run it from cron, e.g. every 15 minutes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Discard the rollup and rebuild it from the whole order history.",
+        )
+        parser.add_argument(
+            "--branch", default=DEFAULT_BRANCH,
+            help="Branch whose database to work on (default: main).",
+        )
+
+    def handle(self, *args, **options):
+        with use_branch(options["branch"]):
+            if options["rebuild"]:
+                buckets = rebuild_hourly_rollups()
+            else:
+                buckets = refresh_hourly_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Updated {buckets} hourly rollup buckets."))
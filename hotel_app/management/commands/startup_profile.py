@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter so nothing is imported yet; -X importtime reports every import on stderr.
+BOOT_SCRIPT = """
+import os, time
+start = time.perf_counter()
+from hotel_management_system.wsgi import application
+boot = time.perf_counter() - start
+from hotel_app.warmup import warm_up
+for step, seconds in warm_up().items():
+    print(f"step\\t{step}\\t{seconds}")
+print(f"boot\\t{boot}")
+"""
+
+
+class Command(BaseCommand):
+    help = "Boot a fresh worker and report import time per module, WSGI load time and each warm-up step."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=25,
+            help="Slowest modules to list (default: 25).",
+        )
+        parser.add_argument(
+            "--package", default="",
+            help="Only list modules under this package, e.g. hotel_app.",
+        )
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "hotel_management_system.settings"),
+            "HOTEL_WARM_START": "0",  # Warm-up is timed step by step below instead
+        }
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Worker failed to boot:\n{result.stderr[-2000:]}")
+
+        modules = self.parse_importtime(result.stderr)
+        shown = [(name, times) for name, times in modules.items() if name.startswith(options["package"])]
+        shown.sort(key=lambda item: item[1][1], reverse=True)
+        self.stdout.write(f"{'module':<60} {'self ms':>9} {'total ms':>9}")
+        for name, (own, cumulative) in shown[:options["limit"]]:
+            self.stdout.write(f"{name:<60} {own / 1000:9.1f} {cumulative / 1000:9.1f}")
+
+        self.stdout.write("")
+        for line in result.stdout.splitlines():
+            kind, *rest = line.split("\t")
+            if kind == "step":
+                self.stdout.write(f"warm-up {rest[0]:<30} {float(rest[1]) * 1000:9.1f} ms")
+            elif kind == "boot":
+                self.stdout.write(self.style.SUCCESS(f"WSGI application loaded in {float(rest[0]) * 1000:.1f} ms"))
+
+    def parse_importtime(self, stderr):
+        """{module: (self us, cumulative us)} from `-X importtime` output."""
+        modules = defaultdict(lambda: (0, 0))
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            own, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            modules[name] = (int(own), int(cumulative))
+        return modules
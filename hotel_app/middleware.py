@@ -0,0 +1,134 @@
+import gzip
+import re
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from hotel_app import events
+from hotel_app.branches import branches, use_branch
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install Brotli
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv")
+
+
+class OrderEventMiddleware:
+    """Buffer the order events recorded while handling a request and write them in one batch."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with events.buffered():
+            return self.get_response(request)
+
+
+class BranchMiddleware:
+    """
+    Route the request to its branch database. The `branch` claim of the JWT wins
+    over the X-Branch header, so a token issued by one branch can never be used
+    against another branch's users.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        code = self.branch_from_token(request) or request.headers.get("X-Branch")
+        if not code:
+            return self.get_response(request)
+        if code not in branches():
+            return JsonResponse({"error": f"Unknown branch: {code}"}, status=400)
+        with use_branch(code):
+            return self.get_response(request)
+
+    def branch_from_token(self, request):
+        auth_type, _, raw_token = request.headers.get("Authorization", "").partition(" ")
+        if auth_type != "Bearer" or not raw_token:
+            return None
+        try:
+            return AccessToken(raw_token).get("branch")
+        except TokenError:
+            return None  # Authentication will reject it
+
+
+class CompressionMiddleware:
+    """
+    Compress API payloads with brotli or gzip, whichever the client prefers in
+    Accept-Encoding, once they are at least COMPRESSION_MIN_BYTES. Only JSON and
+    CSV are compressed: HTML pages carry CSRF tokens (BREACH), and static files
+    are already served precompressed by WhiteNoise.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if content_type not in COMPRESSIBLE_TYPES or response.has_header("Content-Encoding"):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if not response.streaming and len(response.content) < getattr(settings, "COMPRESSION_MIN_BYTES", 1024):
+            return response
+        encoding = self.negotiate(request.headers.get("Accept-Encoding", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = (
+                self.brotli_stream(response.streaming_content) if encoding == "br"
+                else compress_sequence(response.streaming_content)
+            )
+            del response["Content-Length"]
+        else:
+            compressed = (
+                brotli.compress(response.content, quality=5) if encoding == "br"
+                else gzip.compress(response.content, compresslevel=6, mtime=0)
+            )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+        if response.has_header("ETag"):
+            response["ETag"] = re.sub(r'^(W/)?"?(.*?)"?$', r'W/"\2"', response["ETag"])
+        response["Content-Encoding"] = encoding
+        return response
+
+    @staticmethod
+    def negotiate(accept_encoding):
+        """"br", "gzip" or None: the supported coding with the highest q-value, brotli on a tie."""
+        weights = {}
+        for part in accept_encoding.split(","):
+            coding, _, params = part.strip().partition(";")
+            quality = 1.0
+            match = re.search(r"q=([0-9.]+)", params)
+            if match:
+                try:
+                    quality = float(match.group(1))
+                except ValueError:
+                    quality = 0.0
+            weights[coding.strip().lower()] = quality
+        star = weights.get("*", 0.0)
+        candidates = (("br", 2), ("gzip", 1)) if brotli is not None else (("gzip", 1),)
+        best = max(
+            ((weights.get(coding, star), rank, coding) for coding, rank in candidates),
+            default=(0.0, 0, None),
+        )
+        return best[2] if best[0] > 0 else None
+
+    @staticmethod
+    def brotli_stream(chunks):
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
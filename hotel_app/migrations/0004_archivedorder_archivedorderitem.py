@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0003_rename_item_inventory_item_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(max_length=20)),
+                ('receipt_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('menu_item_id', models.BigIntegerField(blank=True, null=True)),
+                ('menu_item_name', models.CharField(max_length=100)),
+                ('quantity', models.PositiveIntegerField()),
+                ('price_at_time_of_order', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='hotel_app.archivedorder')),
+            ],
+        ),
+    ]
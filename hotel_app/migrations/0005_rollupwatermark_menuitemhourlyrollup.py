@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0004_archivedorder_archivedorderitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MenuItemHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='hotel_app.menuitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour', 'menu_item'], name='rollup_hour_item_idx')],
+                'constraints': [models.UniqueConstraint(fields=('menu_item', 'hour'), name='unique_menu_item_hour')],
+            },
+        ),
+    ]
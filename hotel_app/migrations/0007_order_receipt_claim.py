@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:31
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_order_receipt(apps, schema_editor):
+    """Copy each order's receipt from the Receipt.orders link table into Order.receipt."""
+    Order = apps.get_model('hotel_app', 'Order')
+    Receipt = apps.get_model('hotel_app', 'Receipt')
+    links = Receipt.orders.through.objects.filter(order_id=OuterRef('pk')).order_by('receipt_id')
+    Order.objects.filter(receipt__isnull=True, receipts__isnull=False).update(
+        receipt_id=Subquery(links.values('receipt_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0006_orderstatushistory'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_receipt, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('receipt__isnull', True)), fields=['created_at'], name='order_unbilled_idx'),
+        ),
+    ]
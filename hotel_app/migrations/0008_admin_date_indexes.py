@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0007_order_receipt_claim'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='receipt',
+            name='printed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
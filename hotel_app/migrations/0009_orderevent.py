@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:34
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0008_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('order_created', 'Order created'), ('item_added', 'Item added'), ('item_removed', 'Item removed'), ('status_changed', 'Status changed'), ('receipt_printed', 'Receipt printed'), ('receipt_settled', 'Receipt settled'), ('stock_decremented', 'Stock decremented')], max_length=30)),
+                ('order_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('receipt_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
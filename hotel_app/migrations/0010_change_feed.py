@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0009_orderevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('menu_item', 'Menu item'), ('order', 'Order'), ('order_item', 'Order item'), ('receipt', 'Receipt')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('owner_id', models.BigIntegerField(blank=True, null=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner_id', 'id'], name='changelog_owner_idx'), models.Index(fields=['model', 'id'], name='changelog_model_idx')],
+            },
+        ),
+    ]
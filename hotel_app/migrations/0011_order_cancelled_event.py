@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0010_change_feed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderevent',
+            name='kind',
+            field=models.CharField(choices=[('order_created', 'Order created'), ('item_added', 'Item added'), ('item_removed', 'Item removed'), ('status_changed', 'Status changed'), ('order_cancelled', 'Order cancelled'), ('receipt_printed', 'Receipt printed'), ('receipt_settled', 'Receipt settled'), ('stock_decremented', 'Stock decremented')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0011_order_cancelled_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('category', models.CharField(blank=True, max_length=50)),
+                ('kind', models.CharField(choices=[('percent_off', 'Percent off'), ('amount_off', 'Amount off'), ('fixed_price', 'Fixed unit price')], max_length=20)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('min_quantity', models.PositiveIntegerField(default=1)),
+                ('weekdays', models.CharField(blank=True, help_text="Days it runs, 0=Monday ... 6=Sunday, e.g. '01234'. Blank: every day.", max_length=7)),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('menu_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pricing_rules', to='hotel_app.menuitem')),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-19 11:54
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def backfill_order_summary(apps, schema_editor):
+    """Fill the summary columns of existing orders from their lines, 1000 orders at a time."""
+    Order = apps.get_model('hotel_app', 'Order')
+    OrderItem = apps.get_model('hotel_app', 'OrderItem')
+    order_ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(order_ids), 1000):
+        chunk = order_ids[start:start + 1000]
+        lines = defaultdict(list)
+        for order_id, menu_item_id, name, quantity, price in (
+            OrderItem.objects.filter(order_id__in=chunk).order_by('id')
+            .values_list('order_id', 'menu_item_id', 'menu_item__name', 'quantity', 'price_at_time_of_order')
+        ):
+            lines[order_id].append({'id': menu_item_id, 'name': name, 'quantity': quantity, 'price': str(price)})
+        Order.objects.bulk_update([
+            Order(
+                id=order_id,
+                line_count=len(lines[order_id]),
+                item_quantity=sum(line['quantity'] for line in lines[order_id]),
+                item_summary=lines[order_id],
+            )
+            for order_id in chunk
+        ], ['line_count', 'item_quantity', 'item_summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0012_pricingrule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_summary',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_order_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0015_tables_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receipt',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:41
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0016_receipt_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pricingrule',
+            name='weekdays',
+            field=models.CharField(blank=True, help_text="Days it runs, 0=Monday ... 6=Sunday, e.g. '01234'. Blank: every day.", max_length=7, validators=[django.core.validators.RegexValidator('^[0-6]*$', "Use only the digits 0 (Monday) to 6 (Sunday), e.g. '01234'.")]),
+        ),
+    ]
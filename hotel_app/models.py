@@ -1,8 +1,12 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator
 from django.db import models
 from django.utils.timezone import now
 from django.db.models import Sum, F
 from django.db.models.functions import TruncDate
+from django.core.serializers.json import DjangoJSONEncoder
+from decimal import Decimal
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -23,6 +27,7 @@ class MenuItem(models.Model):
     availability = models.BooleanField(default=True)
     quantity = models.PositiveIntegerField(default=0)  # Track stock availability
     product_photo = models.ImageField(upload_to="menu_photos/", null=True, blank=True)  # Store menu item image
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     
 
@@ -36,8 +41,9 @@ class OrderItem(models.Model):
     price_at_time_of_order = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
     def save(self, *args, **kwargs):
-        if not self.price_at_time_of_order:
-            self.price_at_time_of_order = self.menu_item.price  # Save price when order is created
+        if self.price_at_time_of_order is None:  # 0.00 is a real (free) price
+            from hotel_app.pricing import unit_price  # pricing imports this module
+            self.price_at_time_of_order = unit_price(self.menu_item, self.quantity)  # Save price when order is created
         super().save(*args, **kwargs)
 
     def get_total_price(self):
@@ -52,13 +58,32 @@ class Order(models.Model):
         ('served', 'Served'),
         ('completed', 'Completed'),
     ]
+    # Allowed status changes: each status can only move one step forward.
+    STATUS_TRANSITIONS = {
+        'pending': 'preparing',
+        'preparing': 'served',
+        'served': 'completed',
+    }
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     items = models.ManyToManyField(MenuItem, through="OrderItem")
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # Admin date_hierarchy
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     receipt = models.ForeignKey("Receipt", on_delete=models.SET_NULL, null=True, blank=True, related_name="order_receipts")
+    table = models.ForeignKey("Table", on_delete=models.SET_NULL, null=True, blank=True, related_name="orders")
+    # Summary of the order's lines, kept in step by whatever writes them, so list views need no joins.
+    line_count = models.PositiveIntegerField(default=0)
+    item_quantity = models.PositiveIntegerField(default=0)
+    item_summary = models.JSONField(default=list, blank=True)  # [{"id", "name", "quantity", "price"}] per line
+
+    SUMMARY_FIELDS = ["total_price", "line_count", "item_quantity", "item_summary", "updated_at"]
+
+    class Meta:
+        indexes = [
+            # Small partial index over orders nobody has billed yet.
+            models.Index(fields=['created_at'], condition=models.Q(receipt__isnull=True), name='order_unbilled_idx'),
+        ]
 
     def calculate_total_price(self):
         total = self.orderitem_set.aggregate(total=Sum(F("price_at_time_of_order") * F("quantity")))["total"] or 0.00
@@ -68,19 +93,65 @@ class Order(models.Model):
         self.total_price = self.calculate_total_price()
         self.save(update_fields=['total_price'])  # Avoid recursion in save()
 
+    @staticmethod
+    def summary_of(lines):
+        """Total and summary columns for lines given as (menu_item_id, name, quantity, price) tuples."""
+        return {
+            "total_price": sum((quantity * (price or 0) for _, _, quantity, price in lines), Decimal("0.00")),
+            "line_count": len(lines),
+            "item_quantity": sum(quantity for _, _, quantity, _ in lines),
+            "item_summary": [
+                {"id": menu_item_id, "name": name, "quantity": quantity, "price": str(price)}
+                for menu_item_id, name, quantity, price in lines
+            ],
+        }
+
+    def summarize(self, lines=None):
+        """Refresh total_price and the summary columns, from `lines` or (one query) from the database."""
+        if lines is None:
+            lines = list(self.orderitem_set.order_by("id").values_list(
+                "menu_item_id", "menu_item__name", "quantity", "price_at_time_of_order",
+            ))
+        for field, value in self.summary_of(lines).items():
+            setattr(self, field, value)
+
+    @classmethod
+    def previous_status(cls, status):
+        """Return the only status an order may move to `status` from, or None."""
+        for source, target in cls.STATUS_TRANSITIONS.items():
+            if target == status:
+                return source
+        return None
+
     def save(self, *args, **kwargs):
         if self.pk:  # Only update total_price if Order already exists
             self.total_price = self.calculate_total_price()
         super().save(*args, **kwargs)
 
 
+class OrderStatusHistory(models.Model):
+    """Append-only log of order status changes, used for prep-time metrics."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_history')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    changed_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'changed_at'], name='status_history_order_idx'),
+            models.Index(fields=['to_status', 'changed_at'], name='status_history_status_idx'),
+        ]
+
+
 class Receipt(models.Model):
     waiter = models.ForeignKey(User, on_delete=models.CASCADE)
     orders = models.ManyToManyField(Order, related_name="receipts")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     printed = models.BooleanField(default=False)
     settled = models.BooleanField(default=False)
-    printed_at = models.DateTimeField(null=True, blank=True)
+    printed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Detail cache version
 
     def calculate_total_amount(self):
         """Calculate the total amount based on orders."""
@@ -96,7 +167,7 @@ class Receipt(models.Model):
         super().save(*args, **kwargs)  # Save first to get an ID
         
         self.total_amount = self.calculate_total_amount()  # Now update the amount
-        super().save(update_fields=["total_amount"])  # Save again to update amount
+        super().save(update_fields=["total_amount", "updated_at"])  # Save again to update amount
 
 """ class Receipt(models.Model):
     waiter = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -163,4 +234,240 @@ class Inventory(models.Model):
     threshold = models.PositiveIntegerField()
 
     def is_low_stock(self):
-        return self.quantity <= self.threshold
\ No newline at end of file
+        return self.quantity <= self.threshold
+
+# Archive Models (cold storage for completed, receipted orders)
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # Keep the original Order id
+    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='archived_orders')
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20)
+    receipt_id = models.BigIntegerField(null=True, blank=True, db_index=True)  # Plain id, receipts live on
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived order {self.id}"
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    menu_item_id = models.BigIntegerField(null=True, blank=True)
+    menu_item_name = models.CharField(max_length=100)  # Snapshot, menu items may be renamed or removed
+    quantity = models.PositiveIntegerField()
+    price_at_time_of_order = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    def get_total_price(self):
+        return (self.price_at_time_of_order or 0) * self.quantity
+
+
+# Analytics Rollups
+class MenuItemHourlyRollup(models.Model):
+    """Quantity and revenue sold per menu item per hour, built from completed orders."""
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='hourly_rollups')
+    hour = models.DateTimeField()  # Start of the hour the orders were placed in
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'hour'], name='unique_menu_item_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['hour', 'menu_item'], name='rollup_hour_item_idx'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """High-water mark of the last rollup run, so each run only folds in new data."""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+# Event Journal
+class OrderEvent(models.Model):
+    """Append-only journal of what happened to orders, receipts and stock."""
+    KIND_CHOICES = [
+        ('order_created', 'Order created'),
+        ('item_added', 'Item added'),
+        ('item_removed', 'Item removed'),
+        ('status_changed', 'Status changed'),
+        ('order_cancelled', 'Order cancelled'),
+        ('receipt_printed', 'Receipt printed'),
+        ('receipt_settled', 'Receipt settled'),
+        ('stock_decremented', 'Stock decremented'),
+    ]
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    # Plain ids rather than foreign keys, so the journal outlives archived or deleted rows.
+    order_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    receipt_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.id}"
+
+
+# Change Feed
+class ChangeLog(models.Model):
+    """
+    Monotonic change sequence behind /api/sync/. Each row says an object was
+    created/changed or, with `deleted`, removed (a tombstone); the row id is the
+    sync cursor.
+    """
+    MODEL_CHOICES = [
+        ('menu_item', 'Menu item'),
+        ('order', 'Order'),
+        ('order_item', 'Order item'),
+        ('receipt', 'Receipt'),
+    ]
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    owner_id = models.BigIntegerField(null=True, blank=True)  # Customer of the order, waiter of the receipt
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner_id', 'id'], name='changelog_owner_idx'),
+            models.Index(fields=['model', 'id'], name='changelog_model_idx'),
+        ]
+
+
+# Pricing Rules
+class PricingRule(models.Model):
+    """
+    Happy hours, category discounts and quantity breaks. A rule applies to one
+    menu item, to a whole category, or (neither set) to the entire menu; when
+    several apply, the customer gets the lowest price.
+    """
+    KIND_CHOICES = [
+        ('percent_off', 'Percent off'),
+        ('amount_off', 'Amount off'),
+        ('fixed_price', 'Fixed unit price'),
+    ]
+    name = models.CharField(max_length=100)
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, null=True, blank=True, related_name='pricing_rules')
+    category = models.CharField(max_length=50, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+    min_quantity = models.PositiveIntegerField(default=1)  # Quantity break: line quantity needed
+    weekdays = models.CharField(
+        max_length=7, blank=True,
+        validators=[RegexValidator(r"^[0-6]*$", "Use only the digits 0 (Monday) to 6 (Sunday), e.g. '01234'.")],
+        help_text="Days it runs, 0=Monday ... 6=Sunday, e.g. '01234'. Blank: every day.",
+    )
+    start_time = models.TimeField(null=True, blank=True)  # Blank: all day; may wrap past midnight
+    end_time = models.TimeField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    def covers(self, moment):
+        """Whether the rule's day and time window include the (local) datetime `moment`."""
+        if self.weekdays and str(moment.weekday()) not in self.weekdays:
+            return False
+        if self.start_time is None or self.end_time is None:
+            return True
+        clock = moment.time()
+        if self.start_time <= self.end_time:
+            return self.start_time <= clock < self.end_time
+        return clock >= self.start_time or clock < self.end_time  # e.g. 22:00 - 02:00
+
+    def apply(self, price):
+        if self.kind == 'percent_off':
+            price = price * (100 - self.value) / 100
+        elif self.kind == 'amount_off':
+            price = price - self.value
+        else:
+            price = self.value
+        return max(price, Decimal('0.00')).quantize(Decimal('0.01'))
+
+
+# Customer Statistics
+class CustomerStats(models.Model):
+    """
+    Per-customer loyalty numbers, updated by delta as orders complete and
+    receipts settle (see hotel_app.customer_stats); rebuild them with
+    `manage.py backfill_customer_stats`.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    order_count = models.PositiveIntegerField(default=0)  # Completed orders
+    lifetime_spend = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))  # Settled receipts
+    last_visit = models.DateTimeField(null=True, blank=True)
+    item_counts = models.JSONField(default=dict, blank=True)  # {menu_item_id: {"name", "quantity"}}
+    favorite_items = models.JSONField(default=list, blank=True)  # Top of item_counts, [{"id", "name", "quantity"}]
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for user {self.user_id}"
+
+    def add_items(self, counts):
+        """Merge {menu_item_id: (name, quantity)} into item_counts and refresh favorite_items."""
+        for menu_item_id, (name, quantity) in counts.items():
+            entry = self.item_counts.setdefault(str(menu_item_id), {"name": name, "quantity": 0})
+            entry["name"] = name
+            entry["quantity"] += quantity
+        top = sorted(self.item_counts.items(), key=lambda item: (-item[1]["quantity"], int(item[0])))[:5]
+        self.favorite_items = [
+            {"id": int(menu_item_id), "name": entry["name"], "quantity": entry["quantity"]}
+            for menu_item_id, entry in top
+        ]
+
+
+class Table(models.Model):
+    number = models.CharField(max_length=10, unique=True)  # As painted on the table, e.g. "12" or "T3"
+    seats = models.PositiveSmallIntegerField()
+    active = models.BooleanField(default=True)  # Out of service tables cannot be booked
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Table {self.number} ({self.seats} seats)"
+
+
+class Reservation(models.Model):
+    """A table booked for [start, end). Booked and seated reservations of one table never overlap."""
+    STATUS_CHOICES = [
+        ('booked', 'Booked'),
+        ('seated', 'Seated'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    HOLDING_STATUSES = ('booked', 'seated')  # Reservations that keep the table from being booked again
+
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='reservations')
+    customer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
+    name = models.CharField(max_length=100)  # Who the booking is under, also for phone bookings
+    party_size = models.PositiveSmallIntegerField()
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='booked')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table', 'start'], name='reservation_table_start_idx'),
+            models.Index(fields=['end'], name='reservation_end_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}, {self.table} at {self.start:%Y-%m-%d %H:%M}"
+
+    def clean(self):
+        """Admin edits get the same overlap check as bookings made through the API."""
+        if self.start and self.end and self.end <= self.start:
+            raise ValidationError({"end": "The reservation must end after it starts."})
+        if self.table_id and self.start and self.end and self.status in self.HOLDING_STATUSES:
+            overlapping = Reservation.objects.filter(
+                table_id=self.table_id, status__in=self.HOLDING_STATUSES, start__lt=self.end, end__gt=self.start,
+            ).exclude(pk=self.pk)
+            if overlapping.exists():
+                raise ValidationError("The table is already booked for part of that time.")
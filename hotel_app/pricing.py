@@ -0,0 +1,123 @@
+"""
+Pricing rules compiled into an in-memory index.
+
+Active PricingRules are compiled once per branch into a dict keyed by
+(time bucket, scope, key) - scope being a menu item, a category or the whole
+menu, and the time bucket a quarter hour of the week - so pricing an order line
+is a few dict lookups instead of a rules query. A rule that only covers part of
+a bucket is kept with `exact=False` and its window is checked at lookup.
+
+The index carries the version of the rules it was built from (their count and
+latest change). Saving or deleting a rule drops this worker's index at once;
+other workers notice the new version within PRICING_RULES_CHECK_SECONDS. A rule
+that cannot be compiled (say, weekdays saved around the validator) is logged and
+left out rather than failing every order line.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from time import monotonic
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.timezone import localtime, now
+
+from hotel_app.branches import current_alias
+from hotel_app.models import PricingRule
+
+BUCKET_MINUTES = 15
+MINUTES_PER_DAY = 24 * 60
+
+logger = logging.getLogger(__name__)
+
+_indexes = {}  # database alias -> PriceIndex
+
+
+def covered_minutes(rule):
+    """Minutes of the week (0 = Monday 00:00) the rule's day and time window cover."""
+    days = [int(day) for day in rule.weekdays] if rule.weekdays else range(7)
+    if any(not 0 <= day < 7 for day in days):
+        raise ValueError(f"weekdays must be digits 0-6, not {rule.weekdays!r}")
+    if rule.start_time is None or rule.end_time is None:
+        window = range(MINUTES_PER_DAY)
+    else:
+        start = rule.start_time.hour * 60 + rule.start_time.minute
+        end = rule.end_time.hour * 60 + rule.end_time.minute
+        window = range(start, end) if start <= end else [*range(start, MINUTES_PER_DAY), *range(end)]
+    return {day * MINUTES_PER_DAY + minute for day in days for minute in window}
+
+
+class PriceIndex:
+    def __init__(self, rules, version):
+        self.version = version
+        self.checked_at = monotonic()
+        self.rules = defaultdict(list)  # (bucket, scope, key) -> [(rule, exact)]
+        for rule in rules:
+            if rule.menu_item_id is not None:
+                scope = ("item", rule.menu_item_id)
+            elif rule.category:
+                scope = ("category", rule.category)
+            else:
+                scope = ("all", None)
+            try:
+                minutes_covered = covered_minutes(rule)
+            except (TypeError, ValueError):
+                logger.warning("Skipping pricing rule %s (%r): invalid weekdays %r", rule.pk, rule.name, rule.weekdays)
+                continue
+            per_bucket = defaultdict(int)
+            for minute in minutes_covered:
+                per_bucket[minute // BUCKET_MINUTES] += 1
+            for bucket, minutes in per_bucket.items():
+                self.rules[(bucket, *scope)].append((rule, minutes == BUCKET_MINUTES))
+
+    def price(self, menu_item, quantity, moment):
+        """Lowest unit price the rules in force at `moment` give `menu_item` on a line of `quantity`."""
+        base = menu_item.price
+        if not self.rules:
+            return base
+        bucket = (moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute) // BUCKET_MINUTES
+        best = None
+        for scope in (("item", menu_item.id), ("category", menu_item.category), ("all", None)):
+            for rule, exact in self.rules.get((bucket, *scope), ()):
+                if quantity >= rule.min_quantity and (exact or rule.covers(moment)):
+                    price = rule.apply(Decimal(str(base)))
+                    if best is None or price < best:
+                        best = price
+        return base if best is None else best
+
+
+def rules_version():
+    stats = PricingRule.objects.aggregate(count=Count("id"), changed=Max("updated_at"))
+    return stats["count"], stats["changed"]
+
+
+def get_index():
+    """The current branch's index, recompiled if the rules changed since it was built."""
+    alias = current_alias()
+    index = _indexes.get(alias)
+    clock = monotonic()
+    if index is not None and clock - index.checked_at < getattr(settings, "PRICING_RULES_CHECK_SECONDS", 5):
+        return index
+    version = rules_version()
+    if index is None or index.version != version:
+        index = PriceIndex(PricingRule.objects.filter(active=True), version)
+        _indexes[alias] = index
+    index.checked_at = clock
+    return index
+
+
+def unit_price(menu_item, quantity=1, at=None):
+    """Price of one `menu_item` on an order line of `quantity` under the rules in force `at` (default now)."""
+    return get_index().price(menu_item, quantity, localtime(at or now()))
+
+
+def reset():
+    """Forget every compiled index."""
+    _indexes.clear()
+
+
+@receiver([post_save, post_delete], sender=PricingRule)
+def invalidate_index(sender, **kwargs):
+    _indexes.pop(current_alias(), None)
@@ -0,0 +1,183 @@
+"""
+Table availability from an in-memory interval index.
+
+Per branch, each worker keeps every active table and, per table, the upcoming
+booked and seated reservations as parallel lists sorted by start. A table's
+reservations never overlap, so their ends are sorted too: whether [start, end)
+is free is one bisect - O(log n) - however many bookings the table has.
+
+The index is built from the database on first use (and at worker warm start),
+updated in place when this worker writes a reservation, and rebuilt when another
+worker's writes change the reservations' or tables' version (count, latest id and
+change - the count catches deletes of older rows),
+checked at most every RESERVATIONS_CHECK_SECONDS. The database stays the
+authority: `book()` checks for an overlap there, under a lock on the table row.
+"""
+import threading
+from bisect import bisect_left, insort
+from datetime import timedelta
+from time import monotonic
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from hotel_app.branches import current_alias
+from hotel_app.models import Reservation, Table
+
+
+class Conflict(Exception):
+    """The table is already booked for part of the requested time."""
+
+
+class TableSchedule:
+    __slots__ = ("starts", "ends", "ids")
+
+    def __init__(self):
+        self.starts, self.ends, self.ids = [], [], []
+
+    def is_free(self, start, end):
+        position = bisect_left(self.starts, end)  # Reservations from here on start at or after `end`
+        return position == 0 or self.ends[position - 1] <= start
+
+    def add(self, reservation_id, start, end):
+        position = bisect_left(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.ids.insert(position, reservation_id)
+
+    def remove(self, reservation_id):
+        if reservation_id in self.ids:
+            position = self.ids.index(reservation_id)
+            del self.starts[position], self.ends[position], self.ids[position]
+
+
+class AvailabilityIndex:
+    def __init__(self, version):
+        self.version = version
+        self.checked_at = monotonic()
+        self.lock = threading.Lock()
+        self.seats = []  # Sorted (seats, table_id) of the active tables
+        self.numbers = {}  # table_id -> number
+        self.schedules = {}  # table_id -> TableSchedule
+        self.placed = {}  # reservation_id -> table_id, for moves and cancellations
+        for table_id, number, seats in Table.objects.filter(active=True).values_list("id", "number", "seats"):
+            self.add_table(table_id, number, seats)
+        upcoming = Reservation.objects.filter(status__in=Reservation.HOLDING_STATUSES, end__gt=horizon())
+        for row in upcoming.order_by("start").values_list("id", "table_id", "start", "end"):
+            self.place(*row)
+
+    def add_table(self, table_id, number, seats):
+        insort(self.seats, (seats, table_id))
+        self.numbers[table_id] = number
+        self.schedules[table_id] = TableSchedule()
+
+    def place(self, reservation_id, table_id, start, end):
+        if table_id in self.schedules:
+            self.schedules[table_id].add(reservation_id, start, end)
+            self.placed[reservation_id] = table_id
+
+    def unplace(self, reservation_id):
+        table_id = self.placed.pop(reservation_id, None)
+        if table_id is not None:
+            self.schedules[table_id].remove(reservation_id)
+
+    def update(self, reservation):
+        """Apply a reservation this worker just saved."""
+        with self.lock:
+            self.unplace(reservation.id)
+            if reservation.status in Reservation.HOLDING_STATUSES:
+                self.place(reservation.id, reservation.table_id, reservation.start, reservation.end)
+
+    def available(self, start, end, party_size=1):
+        """The active tables seating `party_size` that are free for [start, end), smallest first."""
+        with self.lock:
+            first = bisect_left(self.seats, (party_size, 0))
+            return [
+                {"id": table_id, "number": self.numbers[table_id], "seats": seats}
+                for seats, table_id in self.seats[first:] if self.schedules[table_id].is_free(start, end)
+            ]
+
+
+def horizon():
+    """Reservations ending before this are history and never indexed."""
+    return now() - timedelta(hours=1)
+
+
+def reservations_version():
+    reservations = Reservation.objects.aggregate(count=Count("id"), last=Max("id"), changed=Max("updated_at"))
+    tables = Table.objects.aggregate(count=Count("id"), last=Max("id"), changed=Max("updated_at"))
+    return (
+        reservations["count"], reservations["last"], reservations["changed"],
+        tables["count"], tables["last"], tables["changed"],
+    )
+
+
+_indexes = {}  # database alias -> AvailabilityIndex
+_indexes_lock = threading.Lock()
+
+
+def get_index():
+    """The current branch's index, rebuilt if other workers changed the reservations since it was built."""
+    alias = current_alias()
+    index = _indexes.get(alias)
+    clock = monotonic()
+    if index is not None and clock - index.checked_at < getattr(settings, "RESERVATIONS_CHECK_SECONDS", 5):
+        return index
+    version = reservations_version()
+    if index is None or index.version != version:
+        index = AvailabilityIndex(version)
+        with _indexes_lock:
+            _indexes[alias] = index
+    index.checked_at = clock
+    return index
+
+
+def book(table, start, end, **fields):
+    """
+    Reserve `table` for [start, end), or raise Conflict. The check runs in the
+    database under a lock on the table row, so two concurrent bookings of the same
+    table cannot both succeed.
+    """
+    with transaction.atomic(using=current_alias()):
+        Table.objects.select_for_update().get(id=table.id)
+        # Holding reservations never overlap, so the latest one starting before `end`
+        # also ends last: one step down the (table, start) index answers the question.
+        latest = (
+            Reservation.objects.filter(table=table, status__in=Reservation.HOLDING_STATUSES, start__lt=end)
+            .order_by("-start").values_list("end", flat=True).first()
+        )
+        if latest is not None and latest > start:
+            raise Conflict
+        return Reservation.objects.create(table=table, start=start, end=end, **fields)
+
+
+def reset():
+    """Forget every index; each is rebuilt from the database on next use."""
+    with _indexes_lock:
+        _indexes.clear()
+
+
+@receiver(post_save, sender=Reservation)
+def reservation_saved(sender, instance, **kwargs):
+    alias = current_alias()
+    index = _indexes.get(alias)
+    if index is not None:
+        transaction.on_commit(lambda: index.update(instance), using=alias)
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    index = _indexes.get(current_alias())
+    if index is not None:
+        with index.lock:
+            index.unplace(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Table)
+def invalidate_index(sender, **kwargs):
+    with _indexes_lock:
+        _indexes.pop(current_alias(), None)
@@ -1,8 +1,14 @@
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
-from hotel_app.models import User, MenuItem, OrderItem, Order, Receipt, SalesReport, Inventory
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from hotel_app import batch, customer_stats, events, stock
+from hotel_app.branches import current_alias, current_branch
+from hotel_app.models import (
+    User, MenuItem, OrderItem, Order, Receipt, SalesReport, Inventory, ArchivedOrder, ArchivedOrderItem,
+    CustomerStats, Table, Reservation
+)
 from django.utils.timezone import now
-from django.db import models
+from django.db import models, transaction
 
 # Helper function to validate positive numbers
 def validate_positive(value):
@@ -10,9 +16,80 @@ def validate_positive(value):
         raise serializers.ValidationError("Value cannot be negative.")
     return value
 
+# Sparse fieldsets
+class DynamicFieldsMixin:
+    """
+    On read requests, `?fields=id,status` limits the response to those fields and
+    `?expand=item_details` adds expensive fields back on top of them. Without
+    `?fields=` the full representation is returned.
+    """
+    # How to load fields that are not plain columns of the model:
+    # {"field": {"only": [...], "select_related": [...], "prefetch_related": [...]}}
+    query_hints = {}
+
+    @staticmethod
+    def _names(request, param):
+        return {name.strip() for name in request.query_params.get(param, "").split(",") if name.strip()}
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Field names asked for with ?fields= and ?expand=, or None for the full representation."""
+        if request is None or request.method not in ("GET", "HEAD"):
+            return None
+        fields = cls._names(request, "fields")
+        if not fields:
+            return None
+        return fields | cls._names(request, "expand")
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        """Only join, prefetch and load the columns that the requested fields need."""
+        names = set(cls.Meta.fields)
+        requested = cls.requested_fields(request)
+        if requested is not None:
+            names &= requested
+
+        columns = {field.name for field in queryset.model._meta.concrete_fields}
+        only, select_related, prefetch_related = {"id"}, set(), set()
+        for name in names:
+            hint = cls.query_hints.get(name)
+            if hint is not None:
+                only.update(hint.get("only", ()))
+                select_related.update(hint.get("select_related", ()))
+                prefetch_related.update(hint.get("prefetch_related", ()))
+            elif name in columns:
+                only.add(name)
+            else:
+                only = None  # Unknown source, load every column
+                break
+
+        if only is None:
+            return queryset.select_related(*select_related).prefetch_related(*prefetch_related)
+        return queryset.select_related(*select_related).prefetch_related(*prefetch_related).only(*only)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields(self.context.get("request"))
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+# JWT Serializer
+class BranchTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issue tokens carrying the branch the user logged in to."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["branch"] = current_branch()
+        return token
+
+
 # User Serializer 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=8)
+    query_hints = {"password": {}}  # Write-only, never loaded for reads
 
     class Meta:
         model = User
@@ -47,7 +124,7 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 # MenuItem Serializer 
-class MenuItemSerializer(serializers.ModelSerializer):
+class MenuItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     price = serializers.DecimalField(max_digits=10, decimal_places=2, validators=[validate_positive])
     quantity = serializers.IntegerField(validators=[validate_positive])
 
@@ -57,26 +134,45 @@ class MenuItemSerializer(serializers.ModelSerializer):
 
 
 # OrderItem Serializer 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     menu_item = serializers.CharField(source='menu_item.name', read_only=True)
+    query_hints = {"menu_item": {"only": ["menu_item__name"], "select_related": ["menu_item"]}}
 
     class Meta:
         model = OrderItem
         fields = ['id', 'order', 'menu_item', 'quantity', 'price_at_time_of_order']
 
 
+# Menu items referenced by id; lookups are shared across the operations of a /api/batch/ request.
+class MenuItemRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        try:
+            return batch.get_menu_item(data)
+        except MenuItem.DoesNotExist:
+            self.fail("does_not_exist", pk_value=data)
+
+
 # Order Serializer 
-class OrderSerializer(serializers.ModelSerializer): 
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer): 
     customer = serializers.SerializerMethodField()  # Return full name or username
-    items = serializers.PrimaryKeyRelatedField(
+    items = MenuItemRelatedField(
         many=True, queryset=MenuItem.objects.all(), write_only=True
     ) 
     item_details = serializers.SerializerMethodField()  # Show full menu item details
+    table = serializers.PrimaryKeyRelatedField(queryset=Table.objects.filter(active=True), required=False, allow_null=True)
+    query_hints = {
+        "customer": {
+            "only": ["customer__username", "customer__first_name", "customer__last_name"],
+            "select_related": ["customer"],
+        },
+        "items": {},
+        "item_details": {"only": ["item_summary"]},
+    }
     
  
     class Meta:
         model = Order
-        fields = ["id", "customer", "items","item_details", "total_price", "status", "created_at"]
+        fields = ["id", "customer", "items","item_details", "table", "total_price", "status", "created_at"]
         read_only_fields = ["customer", "total_price", "status", "created_at"]  # Don't require them in input
 
     def create(self, validated_data):
@@ -91,45 +187,48 @@ class OrderSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"items": "Invalid data format. Expected a list of menu item IDs."})
 
         user = self.context["request"].user  # Get logged-in user
-        order = Order.objects.create(customer=user)
-
-        total_price = 0
-        for item_id in item_ids:
-            try:
-                menu_item = MenuItem.objects.get(id=item_id)  # Fetch menu item from DB
-                print("🚀 DEBUG: Processing menu_item:", menu_item.name)  # Debug output
-            except MenuItem.DoesNotExist:
-                raise serializers.ValidationError({"items": f"Menu item with ID {item_id} not found."})
-
-            # Create OrderItem
-            order_item = OrderItem.objects.create(order=order, menu_item=menu_item, quantity=1)
-            total_price += order_item.get_total_price()
-        
-        # Update total price and save order
-        order.total_price = total_price
-        order.save()
+        with transaction.atomic(using=current_alias()):  # Lines and summary columns commit together
+            order = Order.objects.create(customer=user, table=validated_data.get("table"))
+            events.record("order_created", order_id=order.id, actor=user, customer_id=user.id)
+
+            lines = []
+            for menu_item in menu_items:  # Already fetched (and shared within a batch) by the items field
+                # Create OrderItem
+                order_item = OrderItem.objects.create(order=order, menu_item=menu_item, quantity=1)
+                stock.reduce_stock(menu_item.id, 1, order_id=order.id, actor=user)
+                lines.append((menu_item.id, menu_item.name, 1, order_item.price_at_time_of_order))
+                events.record(
+                    "item_added", order_id=order.id, actor=user,
+                    menu_item_id=menu_item.id, quantity=1, price=order_item.price_at_time_of_order,
+                )
+
+            # Update total price and summary, then save order
+            order.summarize(lines)
+            order.save(update_fields=Order.SUMMARY_FIELDS)
 
         return order # return the order object
 
     def get_item_details(self, obj):
-        return [
-            {
-                "id": item.menu_item.id,
-                "name": item.menu_item.name,
-                "price": str(item.menu_item.price)
-            }
-            for item in obj.orderitem_set.all()
-        ]
+        return obj.item_summary  # Maintained on the order, no join needed
     
     def get_customer(self, obj):
         full_name = f"{obj.customer.first_name} {obj.customer.last_name}".strip()
         return full_name if full_name else obj.customer.username
 
 
+# Order Status Transition Serializer
+class OrderTransitionSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+    status = serializers.ChoiceField(choices=list(Order.STATUS_TRANSITIONS.values()))
+
+
 # Receipt Serializer 
 # Order Summary Serializer
-class OrderSummarySerializer(serializers.ModelSerializer):
+class OrderSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = serializers.SerializerMethodField()
+    query_hints = {"items": {"prefetch_related": ["orderitem_set__menu_item"]}}
 
     class Meta:
         model = Order
@@ -146,40 +245,90 @@ class OrderSummarySerializer(serializers.ModelSerializer):
         ]
 
 # Receipt Serializer
-class ReceiptSerializer(serializers.ModelSerializer):
-    orders = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Order.objects.exclude(receipts__isnull=False),  # Exclude orders linked to a receipt from selection
-        write_only=True,
-    )  # Allow selecting only unassigned orders
+class ReceiptSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Plain ids: availability is checked when the orders are claimed, not with an
+    # anti-join over the receipt/order link table on every request.
+    orders = serializers.ListField(child=serializers.IntegerField(), write_only=True)
     order_details = serializers.SerializerMethodField()  # Show order details in response
     waiter = serializers.CharField(source="waiter.username", read_only=True)
+    query_hints = {
+        "orders": {},
+        "order_details": {"prefetch_related": ["orders__orderitem_set__menu_item"]},
+        "waiter": {"only": ["waiter__username"], "select_related": ["waiter"]},
+    }
 
     class Meta:
         model = Receipt
         fields = ["id", "orders", "order_details", "waiter", "total_amount", "printed", "settled", "printed_at"]
         read_only_fields = ["order_details", "total_amount", "printed_at"]  # Auto-generated fields
 
+    def claim_orders(self, receipt, order_ids):
+        """
+        Attach unbilled orders to `receipt` with one conditional UPDATE on Order.receipt.
+        If another receipt got to any of the orders first, nothing is claimed.
+        """
+        order_ids = set(order_ids)
+        claimed = Order.objects.filter(id__in=order_ids, receipt__isnull=True).update(receipt=receipt)
+        if claimed != len(order_ids):
+            available = set(Order.objects.filter(id__in=order_ids, receipt=receipt).values_list("id", flat=True))
+            raise serializers.ValidationError(
+                {"orders": f"Orders already billed or not found: {sorted(order_ids - available)}"}
+            )
+        receipt.orders.add(*order_ids)  # Keep the link table in step for existing readers
+
     def create(self, validated_data):
         # Create a receipt with selected orders and auto-calculate total amount.
-        order_ids = validated_data.pop("orders", [])  # Get only IDs, not objects
+        order_ids = validated_data.pop("orders", [])
         user = self.context["request"].user  # Get the logged-in user
 
         if not order_ids:
             raise serializers.ValidationError({"orders": "At least one order is required to create a receipt."})
 
-        # Step 1: Create Receipt FIRST (without orders)
-        receipt = Receipt.objects.create(waiter=user)  
+        with transaction.atomic(using=current_alias()):  # A failed claim rolls the receipt back too
+            # Step 1: Create Receipt FIRST (without orders)
+            receipt = Receipt.objects.create(waiter=user)
 
-        # Step 2: Add orders using IDs
-        receipt.orders.set(order_ids)  # Ensure only order IDs are passed
+            # Step 2: Claim the orders
+            self.claim_orders(receipt, order_ids)
 
-        # Step 3: Recalculate total and update receipt
-        receipt.total_amount = receipt.calculate_total_amount()
-        receipt.save(update_fields=["total_amount"])
+            # Step 3: Recalculate total and update receipt
+            receipt.total_amount = receipt.calculate_total_amount()
+            receipt.save(update_fields=["total_amount"])
 
         return receipt
 
+    def update(self, instance, validated_data):
+        order_ids = validated_data.pop("orders", None)
+        was_printed, was_settled = instance.printed, instance.settled
+        with transaction.atomic(using=current_alias()):
+            if order_ids is not None:
+                released = list(Order.objects.filter(receipt=instance).exclude(id__in=order_ids).values_list("id", flat=True))
+                added = set(order_ids) - set(Order.objects.filter(receipt=instance).values_list("id", flat=True))
+                if was_settled:  # Orders leaving a settled receipt no longer count as spent
+                    customer_stats.orders_unsettled(released)
+                instance.orders.remove(*released)
+                Order.objects.filter(id__in=released).update(receipt=None)
+                self.claim_orders(instance, added)
+                if was_settled:
+                    customer_stats.orders_settled(added)
+            receipt = super().update(instance, validated_data)
+
+            user = self.context["request"].user
+            for kind, was_set, is_set in (
+                ("receipt_printed", was_printed, receipt.printed),
+                ("receipt_settled", was_settled, receipt.settled),
+            ):
+                if is_set and not was_set:
+                    events.record(
+                        kind, receipt_id=receipt.id, actor=user,
+                        waiter_id=receipt.waiter_id, amount=receipt.total_amount,
+                    )
+            if receipt.settled and not was_settled:
+                customer_stats.receipts_settled([receipt.id])
+            elif was_settled and not receipt.settled:
+                customer_stats.receipts_unsettled([receipt.id])
+            return receipt
+
     def get_order_details(self, obj):
         # Return detailed info of orders in the receipt.
         return [
@@ -197,9 +346,22 @@ class ReceiptSerializer(serializers.ModelSerializer):
             }
             for order in obj.orders.all()
         ]
+
+
+# Receipt Settlement Serializer
+class ReceiptSettleSerializer(serializers.Serializer):
+    receipt_ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    waiter = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False)
+    date = serializers.DateField(required=False)  # With `waiter`: the day the receipts were printed
+
+    def validate(self, attrs):
+        if bool(attrs.get("receipt_ids")) == bool(attrs.get("waiter")):
+            raise serializers.ValidationError("Provide either a list of receipt_ids or a waiter.")
+        return attrs
+
     
 # SalesReport Serializer 
-class SalesReportSerializer(serializers.ModelSerializer):
+class SalesReportSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     waiter = serializers.CharField(source="waiter.username", read_only=True)  # Display waiter’s username
     date = serializers.DateField(format="%Y-%m-%d", read_only=True)  # Ensure date is formatted properly
     printed_receipts_count = serializers.SerializerMethodField()
@@ -241,8 +403,9 @@ class SalesReportSerializer(serializers.ModelSerializer):
 
 
 # Inventory Serializer 
-class InventorySerializer(serializers.ModelSerializer):
+class InventorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     is_low_stock = serializers.SerializerMethodField()
+    query_hints = {"is_low_stock": {"only": ["quantity", "threshold"]}}
 
     class Meta:
         model = Inventory
@@ -252,3 +415,109 @@ class InventorySerializer(serializers.ModelSerializer):
     def get_is_low_stock(self, obj):
         return obj.quantity <= obj.threshold
 
+
+# Customer Stats Serializer
+class CustomerStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomerStats
+        fields = ['user', 'order_count', 'lifetime_spend', 'last_visit', 'favorite_items']
+
+
+# Table & Reservation Serializers
+class TableSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Table
+        fields = ['id', 'number', 'seats', 'active']
+
+
+class ReservationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    table = serializers.PrimaryKeyRelatedField(queryset=Table.objects.filter(active=True))
+    name = serializers.CharField(max_length=100, required=False)  # Default: the customer's name
+    party_size = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = Reservation
+        fields = ['id', 'table', 'customer', 'name', 'party_size', 'start', 'end', 'status', 'created_at']
+        read_only_fields = ['customer', 'status', 'created_at']
+
+    def validate(self, data):
+        if data['end'] <= data['start']:
+            raise serializers.ValidationError({"end": "The reservation must end after it starts."})
+        if data['party_size'] > data['table'].seats:
+            raise serializers.ValidationError({"party_size": f"Table {data['table'].number} seats {data['table'].seats}."})
+        return data
+
+
+class AvailabilitySerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    party_size = serializers.IntegerField(min_value=1, default=1)
+
+    def validate(self, data):
+        if data['end'] <= data['start']:
+            raise serializers.ValidationError({"end": "Must be after start."})
+        return data
+
+
+# Stock Take Serializers
+class StockCountSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    quantity = serializers.IntegerField(validators=[validate_positive])
+
+
+class StockTakeSerializer(serializers.Serializer):
+    counts = StockCountSerializer(many=True, allow_empty=False)
+
+    def validate_counts(self, value):
+        ids = [count["id"] for count in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each inventory item can only be counted once.")
+        return value
+
+
+# Archived Order Serializers (read-only)
+class ArchivedOrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    menu_item = serializers.CharField(source='menu_item_name', read_only=True)
+
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['menu_item_id', 'menu_item', 'quantity', 'price_at_time_of_order']
+
+
+class ArchivedOrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    customer = serializers.CharField(source='customer.username', read_only=True, default=None)
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    query_hints = {
+        "customer": {"only": ["customer__username"], "select_related": ["customer"]},
+        "items": {"prefetch_related": ["items"]},
+    }
+
+    class Meta:
+        model = ArchivedOrder
+        fields = ['id', 'customer', 'items', 'total_price', 'status', 'receipt_id', 'created_at', 'archived_at']
+
+
+# Analytics Serializers (read from MenuItemHourlyRollup only)
+class TopItemSerializer(serializers.Serializer):
+    menu_item_id = serializers.IntegerField()
+    name = serializers.CharField(source='menu_item__name')
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class HourlyDemandSerializer(serializers.Serializer):
+    hour = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+# Batch Serializers
+class BatchOperationSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False, allow_null=True, default=None)
+    group = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+class BatchSerializer(serializers.Serializer):
+    operations = BatchOperationSerializer(many=True, allow_empty=False, max_length=100)
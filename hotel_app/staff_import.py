@@ -0,0 +1,103 @@
+"""
+Bulk staff onboarding from CSV (username, email, role[, password]).
+
+Every row is validated first - with the User model's own field validators
+(bulk_create skips them), against the other rows and with one query for
+usernames already taken - then the passwords of the valid rows are hashed in a
+process pool (hotel_app.hashing) and the users inserted with one bulk_create.
+Rows without a password get a random temporary one, returned once in the results.
+"""
+import csv
+import secrets
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from hotel_app.branches import current_alias
+from hotel_app.hashing import hash_passwords
+from hotel_app.models import User
+
+STAFF_ROLES = ("waiter", "kitchen", "manager", "cashier")
+MAX_ROWS = 2000
+
+
+class StaffImportError(ValueError):
+    """The file as a whole cannot be imported (not the fault of a single row)."""
+
+
+def read_rows(text):
+    """Rows of the CSV `text` as dicts with lower-cased, stripped headers."""
+    reader = csv.DictReader(text.splitlines())
+    if not reader.fieldnames or not {"username", "email", "role"} <= {name.strip().lower() for name in reader.fieldnames}:
+        raise StaffImportError("The CSV needs a header row with username, email and role columns.")
+    rows = [
+        {key.strip().lower(): (value or "").strip() for key, value in row.items() if key is not None}
+        for row in reader
+    ]
+    if len(rows) > MAX_ROWS:
+        raise StaffImportError(f"At most {MAX_ROWS} rows per import.")
+    return rows
+
+
+def validate(row, seen):
+    errors = {}
+    if not row["username"]:
+        errors["username"] = "This field is required."
+    elif row["username"].lower() in seen:
+        errors["username"] = "Duplicate username in this file."
+    try:
+        validate_email(row["email"])
+    except ValidationError:
+        errors["email"] = "Enter a valid email address."
+    if row["role"] not in STAFF_ROLES:
+        errors["role"] = f"Must be one of: {', '.join(STAFF_ROLES)}."
+    if row.get("password") and len(row["password"]) < 8:
+        errors["password"] = "Ensure this field has at least 8 characters."
+    try:  # Username characters and length, field lengths; uniqueness is checked for all rows at once
+        User(username=row["username"], email=row["email"], role=row["role"]).full_clean(
+            exclude=["password"], validate_unique=False, validate_constraints=False,
+        )
+    except ValidationError as error:
+        for field, messages in error.message_dict.items():
+            errors.setdefault(field, messages[0])
+    return errors
+
+
+def import_staff(text, workers=None):
+    """Create the staff users described by the CSV `text`; one result per row, in file order."""
+    rows = read_rows(text)
+    results, valid, seen = [], [], set()
+    for number, row in enumerate(rows, start=1):
+        errors = validate(row, seen)
+        seen.add(row["username"].lower())
+        results.append({"row": number, "username": row["username"], "status": "error" if errors else "created"})
+        if errors:
+            results[-1]["errors"] = errors
+        else:
+            valid.append((results[-1], row))
+
+    taken = set(
+        User.objects.filter(username__in=[row["username"] for _, row in valid]).values_list("username", flat=True)
+    )
+    for result, row in valid:
+        if row["username"] in taken:
+            result.update(status="error", errors={"username": "A user with that username already exists."})
+    valid = [(result, row) for result, row in valid if row["username"] not in taken]
+
+    passwords = [row.get("password") or secrets.token_urlsafe(9) for _, row in valid]
+    hashes = hash_passwords(passwords, workers)  # Outside the transaction: no locks held while hashing
+    users = [
+        User(username=row["username"], email=row["email"], role=row["role"], password=hashed)
+        for (_, row), hashed in zip(valid, hashes)
+    ]
+    try:
+        with transaction.atomic(using=current_alias()):
+            User.objects.bulk_create(users, batch_size=500)
+    except IntegrityError:
+        raise StaffImportError("Some of these usernames were taken while the import ran; nothing was imported. Try again.")
+    for (result, row), user, password in zip(valid, users, passwords):
+        result["id"] = user.id
+        if not row.get("password"):
+            result["password"] = password  # Temporary; shown only in this response
+    return results
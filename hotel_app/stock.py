@@ -0,0 +1,29 @@
+"""
+Menu item stock taken by order lines.
+
+Called inside the transaction that writes the order line. The decrement is one
+UPDATE (never below zero), so concurrent orders for the same item do not
+overwrite each other's counts; it is journaled as `stock_decremented` and
+appended to the change feed like any other menu item write.
+"""
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from hotel_app import events
+from hotel_app.changes import record_changes
+from hotel_app.models import MenuItem
+
+
+def reduce_stock(menu_item_id, quantity, order_id=None, actor=None):
+    """Take `quantity` of the menu item out of stock; returns what remains."""
+    if quantity <= 0:
+        return None
+    items = MenuItem.objects.filter(id=menu_item_id)
+    items.update(quantity=Greatest(F("quantity") - quantity, 0))
+    remaining = items.values_list("quantity", flat=True).first()
+    record_changes("menu_item", [(menu_item_id, None)])
+    events.record(
+        "stock_decremented", order_id=order_id, actor=actor,
+        menu_item_id=menu_item_id, quantity=quantity, remaining=remaining,
+    )
+    return remaining
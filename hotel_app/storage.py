@@ -0,0 +1,18 @@
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Content-hashed, precompressed (gzip and, with Brotli installed, br) static
+    files, written by collectstatic. WhiteNoise serves hashed names with an
+    immutable, far-future Cache-Control header. Until collectstatic has run (a
+    fresh checkout, the test suite) {% static %} falls back to the plain name
+    instead of raising.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:  # Not collected yet
+            return name
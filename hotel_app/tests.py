@@ -1,8 +1,40 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
 from django.test import TestCase
-from rest_framework.test import APIClient
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import make_aware, now
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework import status
-from hotel_app.models import MenuItem, Order, Receipt, Inventory, SalesReport
+from rest_framework_simplejwt.tokens import AccessToken
+from hotel_app.models import (
+    MenuItem, Order, OrderItem, Receipt, Inventory, SalesReport, ArchivedOrder, ArchivedOrderItem, MenuItemHourlyRollup,
+    OrderStatusHistory, OrderEvent, ChangeLog, PricingRule, CustomerStats, Table, Reservation
+)
+from hotel_app.analytics import refresh_hourly_rollups
+from hotel_app import detail_cache, events, export, kitchen, loadtest, pricing, reservations, warmup
+from hotel_app.exceptions import exception_handler
+from hotel_app.branches import current_alias, use_branch, UnknownBranch
+from hotel_app.changes import menu_version
+from hotel_app.fastjson import FastJSONRenderer
+from hotel_app.middleware import brotli
+from hotel_app.throttling import MenuReadThrottle
+from hotel_app.warmup import warm_up
 
 # Create your tests here.
 class HotelAppTestCase(TestCase):
@@ -98,4 +130,1278 @@ class HotelAppTestCase(TestCase):
         # Ensure customers cannot delete inventory items.
         self.client.force_authenticate(user=self.customer)
         response = self.client.delete(f"/api/inventory/{self.inventory.id}/")
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class StockTakeTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="adminpass"
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.lettuce = Inventory.objects.create(item_name="Lettuce", quantity=100, threshold=50)
+        self.tomatoes = Inventory.objects.create(item_name="Tomatoes", quantity=80, threshold=20)
+        self.client.force_authenticate(user=self.admin)
+
+    def test_stock_take_updates_quantities_and_reports_variance(self):
+        data = {"counts": [
+            {"id": self.lettuce.id, "quantity": 40},
+            {"id": self.tomatoes.id, "quantity": 85},
+        ]}
+        response = self.client.post("/api/inventory/stock-take/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        variance = {row["item_name"]: row["variance"] for row in response.data["variance"]}
+        self.assertEqual(variance, {"Lettuce": -60, "Tomatoes": 5})
+        self.assertEqual([item["item_name"] for item in response.data["low_stock"]], ["Lettuce"])
+
+        self.lettuce.refresh_from_db()
+        self.assertEqual(self.lettuce.quantity, 40)
+
+    def test_stock_take_with_unknown_item_changes_nothing(self):
+        data = {"counts": [{"id": self.lettuce.id, "quantity": 10}, {"id": 9999, "quantity": 1}]}
+        response = self.client.post("/api/inventory/stock-take/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.lettuce.refresh_from_db()
+        self.assertEqual(self.lettuce.quantity, 100)
+
+    def test_customer_cannot_submit_stock_take(self):
+        self.client.force_authenticate(user=self.customer)
+        data = {"counts": [{"id": self.lettuce.id, "quantity": 10}]}
+        response = self.client.post("/api/inventory/stock-take/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+
+class ArchiveOrdersTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            username="staff", email="staff@example.com", password="staffpass", is_staff=True
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.menu_item = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+
+        self.old_order = Order.objects.create(customer=self.customer, status="completed")
+        OrderItem.objects.create(order=self.old_order, menu_item=self.menu_item, quantity=2)
+        self.receipt = Receipt.objects.create(waiter=self.staff)
+        self.receipt.orders.set([self.old_order])
+        Receipt.objects.filter(pk=self.receipt.pk).update(settled=True)
+        Order.objects.filter(pk=self.old_order.pk).update(
+            receipt=self.receipt, created_at=now() - timedelta(days=30)
+        )
+
+        self.recent_order = Order.objects.create(customer=self.customer, status="completed", receipt=self.receipt)
+        self.receipt.orders.add(self.recent_order)
+
+    def test_archive_moves_old_receipted_orders(self):
+        call_command("archive_orders", "--older-than", "7", stdout=StringIO())
+
+        self.assertFalse(Order.objects.filter(pk=self.old_order.pk).exists())
+        self.assertTrue(Order.objects.filter(pk=self.recent_order.pk).exists())
+
+        archived = ArchivedOrder.objects.get(pk=self.old_order.pk)
+        self.assertEqual(archived.receipt_id, self.receipt.pk)
+        self.assertEqual(archived.items.get().menu_item_name, "Burger")
+
+    def test_orders_on_unsettled_receipts_stay_live(self):
+        open_order = Order.objects.create(customer=self.customer, status="completed")
+        OrderItem.objects.create(order=open_order, menu_item=self.menu_item, quantity=1)
+        open_receipt = Receipt.objects.create(waiter=self.staff)
+        open_receipt.orders.set([open_order])
+        Order.objects.filter(pk=open_order.pk).update(receipt=open_receipt, created_at=now() - timedelta(days=30))
+
+        call_command("archive_orders", "--older-than", "7", stdout=StringIO())
+
+        self.assertTrue(Order.objects.filter(pk=open_order.pk).exists())
+        self.assertFalse(ArchivedOrder.objects.filter(pk=open_order.pk).exists())
+        self.assertEqual(list(open_receipt.orders.all()), [open_order])
+
+    def test_customer_reads_own_archived_orders(self):
+        call_command("archive_orders", "--older-than", "7", stdout=StringIO())
+
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get("/api/archived-orders/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order["id"] for order in response.data], [self.old_order.pk])
+        self.assertEqual(response.data[0]["items"][0]["quantity"], 2)
+
+
+
+class AnalyticsRollupTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manager = get_user_model().objects.create_user(
+            username="manager", email="manager@example.com", password="managerpass", role="manager"
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.burger = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+        self.soda = MenuItem.objects.create(name="Soda", price=2.00, category="Drinks", quantity=100)
+
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.create(order=order, menu_item=self.burger, quantity=3)
+        OrderItem.objects.create(order=order, menu_item=self.soda, quantity=1)
+        order.status = "completed"
+        order.save()
+
+        Order.objects.create(customer=self.customer)  # Still pending, must not be counted
+        self.client.force_authenticate(user=self.manager)
+
+    def test_rollup_is_incremental(self):
+        refresh_hourly_rollups(until=now())
+        refresh_hourly_rollups(until=now())  # Nothing new, must not double count
+
+        rollup = MenuItemHourlyRollup.objects.get(menu_item=self.burger)
+        self.assertEqual(rollup.quantity, 3)
+        self.assertEqual(rollup.revenue, 15)
+
+    def test_orders_count_once_at_completion(self):
+        refresh_hourly_rollups(until=now())
+        Order.objects.get(status="completed").save()  # A later edit bumps updated_at
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.create(order=order, menu_item=self.burger, quantity=2)
+        Order.objects.filter(id=order.id).update(status="completed")
+        OrderStatusHistory.objects.create(order=order, from_status="served", to_status="completed")
+        refresh_hourly_rollups(until=now())
+
+        self.assertEqual(MenuItemHourlyRollup.objects.get(menu_item=self.burger).quantity, 5)
+
+    def test_rebuild_includes_archived_orders(self):
+        archived = ArchivedOrder.objects.create(
+            id=9999, customer=self.customer, total_price=20, status="completed", updated_at=now(),
+            created_at=Order.objects.get(status="completed").created_at,  # Same hour bucket
+        )
+        ArchivedOrderItem.objects.create(
+            order=archived, menu_item_id=self.burger.id, menu_item_name="Burger", quantity=4, price_at_time_of_order=5,
+        )
+        call_command("rollup_analytics", "--rebuild", stdout=StringIO())
+
+        rollup = MenuItemHourlyRollup.objects.get(menu_item=self.burger)
+        self.assertEqual((rollup.quantity, rollup.revenue), (7, 35))
+
+    def test_top_items_and_hourly_read_the_rollup(self):
+        refresh_hourly_rollups(until=now())
+
+        response = self.client.get("/api/analytics/top-items/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["name"] for row in response.data], ["Burger", "Soda"])
+
+        response = self.client.get("/api/analytics/hourly/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(row["quantity"] for row in response.data), 4)
+
+    def test_customer_cannot_read_analytics(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get("/api/analytics/top-items/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+
+class OrderTransitionTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.kitchen = get_user_model().objects.create_user(
+            username="kitchen", email="kitchen@example.com", password="kitchenpass", role="kitchen"
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.pending = [Order.objects.create(customer=self.customer) for _ in range(3)]
+        self.served = Order.objects.create(customer=self.customer, status="served")
+        self.client.force_authenticate(user=self.kitchen)
+
+    def test_transition_moves_only_eligible_orders(self):
+        ids = [order.id for order in self.pending] + [self.served.id]
+        response = self.client.post("/api/orders/transition/", {"order_ids": ids, "status": "preparing"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(response.data["transitioned"]), sorted(order.id for order in self.pending))
+        self.assertEqual(response.data["skipped"], [self.served.id])
+
+        self.assertEqual(Order.objects.filter(status="preparing").count(), 3)
+        history = OrderStatusHistory.objects.filter(to_status="preparing")
+        self.assertEqual(history.count(), 3)
+        self.assertEqual({entry.changed_by_id for entry in history}, {self.kitchen.id})
+
+    def test_transition_cannot_skip_a_step(self):
+        ids = [order.id for order in self.pending]
+        response = self.client.post("/api/orders/transition/", {"order_ids": ids, "status": "served"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["transitioned"], [])
+        self.assertFalse(OrderStatusHistory.objects.exists())
+
+    def test_customer_cannot_transition_orders(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(
+            "/api/orders/transition/", {"order_ids": [self.pending[0].id], "status": "preparing"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+
+class ReceiptSettlementTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.cashier = get_user_model().objects.create_user(
+            username="cashier", email="cashier@example.com", password="cashierpass", role="cashier"
+        )
+        self.waiter = get_user_model().objects.create_user(
+            username="waiter", email="waiter@example.com", password="waiterpass", role="waiter"
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.receipts = []
+        for amount in (10, 20, 30):
+            receipt = Receipt.objects.create(waiter=self.waiter)
+            Receipt.objects.filter(pk=receipt.pk).update(total_amount=amount, printed=True, printed_at=now())
+            self.receipts.append(receipt)
+        SalesReport.objects.filter(waiter=self.waiter).update(printed_receipts_count=3, total_printed_amount=60)
+        self.client.force_authenticate(user=self.cashier)
+
+    def test_settle_waiter_receipts_for_the_day(self):
+        response = self.client.post("/api/receipts/settle/", {"waiter": self.waiter.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(response.data["total_settled_amount"], "60.00")
+        self.assertEqual(Receipt.objects.filter(settled=True).count(), 3)
+
+        report = SalesReport.objects.get(waiter=self.waiter)
+        self.assertEqual(report.settled_receipts_count, 3)
+        self.assertEqual(report.total_settled_amount, 60)
+        self.assertEqual(report.printed_receipts_count, 0)
+
+    def test_settle_list_skips_already_settled(self):
+        Receipt.objects.filter(pk=self.receipts[0].pk).update(settled=True)
+        ids = [receipt.id for receipt in self.receipts]
+        response = self.client.post("/api/receipts/settle/", {"receipt_ids": ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(response.data["settled"]), ids[1:])
+
+    def test_settle_requires_receipts_or_waiter(self):
+        response = self.client.post("/api/receipts/settle/", {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_cannot_settle(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post("/api/receipts/settle/", {"waiter": self.waiter.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+
+class ReceiptClaimTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.waiter = get_user_model().objects.create_user(
+            username="waiter", email="waiter@example.com", password="waiterpass", is_staff=True
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.order = Order.objects.create(customer=self.customer)
+        self.other_order = Order.objects.create(customer=self.customer)
+        self.client.force_authenticate(user=self.waiter)
+
+    def test_receipt_claims_orders(self):
+        response = self.client.post("/api/receipts/", {"orders": [self.order.id]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.receipt_id, response.data["id"])
+        self.assertEqual(list(self.order.receipts.values_list("id", flat=True)), [response.data["id"]])
+
+    def test_already_billed_order_is_rejected_atomically(self):
+        self.client.post("/api/receipts/", {"orders": [self.order.id]}, format="json")
+        response = self.client.post("/api/receipts/", {"orders": [self.other_order.id, self.order.id]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Receipt.objects.count(), 1)
+        self.other_order.refresh_from_db()
+        self.assertIsNone(self.other_order.receipt_id)
+
+    def test_unbilled_lists_only_unclaimed_orders(self):
+        self.client.post("/api/receipts/", {"orders": [self.order.id]}, format="json")
+        response = self.client.get("/api/orders/unbilled/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order["id"] for order in response.data], [self.other_order.id])
+
+
+class AdminChangelistTestCase(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="adminpass"
+        )
+        menu_item = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+        order = Order.objects.create(customer=self.admin)
+        OrderItem.objects.create(order=order, menu_item=menu_item, quantity=1)
+        self.client.force_login(self.admin)
+
+    def test_changelists_render(self):
+        for model in ("user", "menuitem", "order", "orderitem", "receipt", "salesreport", "inventory"):
+            response = self.client.get(f"/admin/hotel_app/{model}/")
+            self.assertEqual(response.status_code, 200, model)
+
+    def test_order_item_changelist_query_count_does_not_grow_per_row(self):
+        self.client.get("/admin/hotel_app/orderitem/")  # Settle the session writes first
+        with CaptureQueriesContext(connection) as one_row:
+            self.client.get("/admin/hotel_app/orderitem/")
+
+        menu_item = MenuItem.objects.create(name="Soda", price=2.00, category="Drinks", quantity=100)
+        for _ in range(5):
+            OrderItem.objects.create(order=Order.objects.create(customer=self.admin), menu_item=menu_item)
+        with CaptureQueriesContext(connection) as six_rows:
+            self.client.get("/admin/hotel_app/orderitem/")
+
+        self.assertEqual(len(one_row), len(six_rows))
+
+
+
+class OrderEventJournalTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", email="admin@example.com", password="adminpass"
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.menu_item = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+
+    def test_order_placement_is_journaled(self):
+        self.client.force_authenticate(user=self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/orders/", {"items": [self.menu_item.id]}, format="json")
+        order_id = response.data["id"]
+        kinds = list(OrderEvent.objects.filter(order_id=order_id).order_by("id").values_list("kind", flat=True))
+        self.assertEqual(kinds, ["order_created", "stock_decremented", "item_added"])
+        stock_event = OrderEvent.objects.get(order_id=order_id, kind="stock_decremented")
+        self.assertEqual(stock_event.payload, {"menu_item_id": self.menu_item.id, "quantity": 1, "remaining": 99})
+        self.menu_item.refresh_from_db()
+        self.assertEqual(self.menu_item.quantity, 99)
+
+    def test_buffered_events_are_written_in_one_batch(self):
+        with self.assertNumQueries(1):
+            with events.buffered():
+                with self.captureOnCommitCallbacks(execute=True):
+                    for quantity in (1, 2, 3):
+                        events.record("item_added", order_id=1, menu_item_id=self.menu_item.id, quantity=quantity, price="5.00")
+        self.assertEqual(OrderEvent.objects.count(), 3)
+
+    def test_replay_fixes_order_total(self):
+        order = Order.objects.create(customer=self.customer)
+        OrderEvent.objects.create(kind="item_added", order_id=order.id, payload={"quantity": 3, "price": "5.00"})
+        OrderEvent.objects.create(kind="item_removed", order_id=order.id, payload={"quantity": 1, "price": "5.00"})
+
+        call_command("replay_events", "--fix", stdout=StringIO())
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, 10)
+
+    def test_export_streams_json_lines(self):
+        OrderEvent.objects.create(kind="order_created", order_id=1, payload={})
+        OrderEvent.objects.create(kind="order_created", order_id=2, payload={})
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get("/api/events/export/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["order_id"] for line in lines], [1, 2])
+
+        resumed = self.client.get(f"/api/events/export/?since_id={json.loads(lines[0])['id']}")
+        lines = b"".join(resumed.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["order_id"] for line in lines], [2])
+
+
+
+class BranchRoutingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manager = get_user_model().objects.create_user(
+            username="manager", email="manager@example.com", password="managerpass", role="manager"
+        )
+
+    def test_main_branch_uses_default_database(self):
+        with use_branch("main"):
+            self.assertEqual(current_alias(), "default")
+            self.assertEqual(MenuItem.objects.db, "default")
+
+    def test_unknown_branch_is_rejected(self):
+        with self.assertRaises(UnknownBranch):
+            with use_branch("nowhere"):
+                pass
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get("/api/menu-items/", HTTP_X_BRANCH="nowhere")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_carries_branch_claim(self):
+        response = self.client.post(
+            "/api/token/", {"username": "manager", "password": "managerpass"}, format="json", HTTP_X_BRANCH="main"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data["access"])["branch"], "main")
+
+    def test_head_office_sales_merges_branches(self):
+        receipt = Receipt.objects.create(waiter=self.manager)
+        Receipt.objects.filter(pk=receipt.pk).update(total_amount=12, printed=True, printed_at=now())
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.get("/api/head-office/sales/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["branches"]["main"]["printed_receipts_count"], 1)
+        self.assertEqual(response.data["total"]["total_printed_amount"], "12.00")
+
+
+class SparseFieldsetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            username="staff", email="staff@example.com", password="staffpass", is_staff=True
+        )
+        menu_item = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+        for _ in range(3):
+            order = Order.objects.create(customer=self.staff)
+            OrderItem.objects.create(order=order, menu_item=menu_item, quantity=2)
+            order.summarize()
+            order.save()
+        self.client.force_authenticate(user=self.staff)
+
+    def test_fields_limits_the_representation(self):
+        response = self.client.get("/api/orders/?fields=id,status")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({tuple(sorted(order)) for order in response.data}, {("id", "status")})
+
+    def test_expand_adds_fields_on_top(self):
+        response = self.client.get("/api/orders/?fields=id&expand=item_details")
+        self.assertEqual(set(response.data[0]), {"id", "item_details"})
+        self.assertEqual(response.data[0]["item_details"][0]["name"], "Burger")
+
+    def test_full_representation_is_unchanged(self):
+        response = self.client.get(f"/api/orders/{Order.objects.first().id}/")
+        self.assertEqual(
+            set(response.data), {"id", "customer", "item_details", "table", "total_price", "status", "created_at"}
+        )
+
+    def test_sparse_list_skips_joins_and_prefetches(self):
+        with CaptureQueriesContext(connection) as sparse:
+            self.client.get("/api/orders/?fields=id,status")
+        with CaptureQueriesContext(connection) as full:
+            self.client.get("/api/orders/")
+        # item_details comes from the order's summary columns, so neither list touches the lines.
+        self.assertEqual(len(sparse), len(full))
+        self.assertNotIn("hotel_app_orderitem", " ".join(query["sql"] for query in [*sparse, *full]))
+
+
+
+class DeltaSyncTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.waiter = get_user_model().objects.create_user(
+            username="waiter", email="waiter@example.com", password="waiterpass", role="waiter"
+        )
+        self.other = get_user_model().objects.create_user(
+            username="other", email="other@example.com", password="otherpass"
+        )
+        self.burger = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+        self.order = Order.objects.create(customer=self.waiter)
+        OrderItem.objects.create(order=self.order, menu_item=self.burger)
+        self.others_order = Order.objects.create(customer=self.other)
+        self.client.force_authenticate(user=self.waiter)
+
+    def test_snapshot_then_delta(self):
+        snapshot = self.client.get("/api/sync/").data
+        self.assertEqual([item["name"] for item in snapshot["menu_items"]], ["Burger"])
+        self.assertEqual([order["id"] for order in snapshot["orders"]], [self.order.id])
+
+        self.burger.price = 6
+        self.burger.save()
+        soda = MenuItem.objects.create(name="Soda", price=2.00, category="Drinks", quantity=10)
+        self.others_order.delete()  # Not the waiter's, must not show up
+        order_id = self.order.id
+        self.order.delete()
+
+        delta = self.client.get(f"/api/sync/?since={snapshot['cursor']}").data
+        self.assertEqual(sorted(item["id"] for item in delta["menu_items"]), [self.burger.id, soda.id])
+        self.assertEqual(delta["deleted"]["orders"], [order_id])
+        self.assertGreater(delta["cursor"], snapshot["cursor"])
+
+        empty = self.client.get(f"/api/sync/?since={delta['cursor']}").data
+        self.assertEqual(empty["menu_items"], [])
+        self.assertEqual(empty["cursor"], delta["cursor"])
+
+    def test_bulk_status_change_is_in_the_feed(self):
+        cursor = ChangeLog.objects.latest("id").id
+        staff = get_user_model().objects.create_user(
+            username="kitchen", email="kitchen@example.com", password="kitchenpass", role="kitchen"
+        )
+        self.client.force_authenticate(user=staff)
+        self.client.post("/api/orders/transition/", {"order_ids": [self.order.id], "status": "preparing"}, format="json")
+
+        self.client.force_authenticate(user=self.waiter)
+        delta = self.client.get(f"/api/sync/?since={cursor}").data
+        self.assertEqual([(order["id"], order["status"]) for order in delta["orders"]], [(self.order.id, "preparing")])
+
+
+class BatchOperationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username="tablet", email="tablet@example.com", password="tabletpass"
+        )
+        self.burger = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+        self.soda = MenuItem.objects.create(name="Soda", price=2.00, category="Drinks", quantity=100)
+        self.client.force_authenticate(user=self.user)
+
+    def test_operations_can_use_earlier_results(self):
+        response = self.client.post("/api/batch/", {"operations": [
+            {"method": "POST", "path": "/api/orders/", "body": {"items": [self.burger.id]}},
+            {"method": "POST", "path": "/api/orders/$0.id/add_item/", "body": {"menu_item_id": self.soda.id}},
+            {"method": "GET", "path": "/api/orders/$0.id/?fields=id,total_price"},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], [201, 200, 200])
+        order = Order.objects.get(id=results[0]["body"]["id"])
+        self.assertEqual(order.customer, self.user)
+        self.assertEqual(order.orderitem_set.count(), 2)
+        self.assertEqual(Decimal(results[2]["body"]["total_price"]), Decimal("7.00"))
+
+    def test_menu_writes_refresh_the_shared_lookups(self):
+        response = self.client.post("/api/batch/", {"operations": [
+            {"method": "POST", "path": "/api/orders/", "body": {"items": [self.burger.id]}},
+            {"method": "PATCH", "path": f"/api/menu-items/{self.burger.id}/", "body": {"price": "8.00"}},
+            {"method": "POST", "path": "/api/orders/", "body": {"items": [self.burger.id]}},
+        ]}, format="json")
+
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], [201, 200, 201])
+        self.assertEqual(Order.objects.get(id=results[2]["body"]["id"]).total_price, Decimal("8.00"))
+
+    def test_failure_rolls_back_only_its_group(self):
+        response = self.client.post("/api/batch/", {"operations": [
+            {"method": "POST", "path": "/api/orders/", "body": {"items": [self.burger.id]}, "group": "a"},
+            {"method": "POST", "path": "/api/orders/$0.id/add_item/", "body": {"menu_item_id": 999}, "group": "a"},
+            {"method": "POST", "path": "/api/orders/$0.id/add_item/", "body": {"menu_item_id": self.soda.id}, "group": "a"},
+            {"method": "POST", "path": "/api/orders/", "body": {"items": [self.soda.id]}, "group": "b"},
+        ]}, format="json")
+
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], [201, 404, 424, 201])
+        self.assertTrue(results[0]["rolled_back"])
+        self.assertEqual(list(Order.objects.values_list("id", flat=True)), [results[3]["body"]["id"]])
+
+    def test_rejects_non_api_paths_and_requires_login(self):
+        response = self.client.post("/api/batch/", {"operations": [
+            {"method": "POST", "path": "/api/batch/", "body": {"operations": []}},
+        ]}, format="json")
+        self.assertEqual(response.data["results"][0]["status"], 400)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.post("/api/batch/", {"operations": [{"method": "GET", "path": "/api/orders/"}]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+
+class KitchenQueueTestCase(TestCase):
+    def setUp(self):
+        kitchen.reset()
+        self.client = APIClient()
+        self.cook = get_user_model().objects.create_user(
+            username="cook", email="cook@example.com", password="cookpass", role="kitchen"
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.burger = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+        self.soda = MenuItem.objects.create(name="Soda", price=2.00, category="Drinks", quantity=100)
+
+    def place_order(self, *items):
+        self.client.force_authenticate(user=self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/orders/", {"items": list(items)}, format="json").data["id"]
+
+    def get_queue(self):
+        self.client.force_authenticate(user=self.cook)
+        response = self.client.get("/api/kitchen/queue/")
+        self.assertEqual(response.status_code, 200)
+        return {station["station"]: station["orders"] for station in response.data["stations"]}
+
+    def test_queue_follows_order_events(self):
+        first = self.place_order(self.burger.id)
+        second = self.place_order(self.burger.id, self.soda.id)
+        queue = self.get_queue()
+        self.assertEqual([row["order_id"] for row in queue["Food"]], [first, second])
+        self.assertEqual([row["order_id"] for row in queue["Drinks"]], [second])
+        self.assertEqual([row["eta_seconds"] for row in queue["Food"]], [600, 1200])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/orders/transition/", {"order_ids": [second], "status": "preparing"}, format="json")
+        with CaptureQueriesContext(connection) as queries:
+            queue = self.get_queue()
+        self.assertEqual([row["order_id"] for row in queue["Food"]], [second, first])
+        self.assertFalse([query for query in queries if 'FROM "hotel_app_order"' in query["sql"]])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/orders/transition/", {"order_ids": [second], "status": "served"}, format="json")
+        queue = self.get_queue()
+        self.assertEqual([row["order_id"] for row in queue["Food"]], [first])
+        self.assertNotIn("Drinks", queue)
+
+    def test_rebuilds_from_database_and_reports_eta(self):
+        order = Order.objects.create(customer=self.customer)  # No journal entries
+        OrderItem.objects.create(order=order, menu_item=self.burger, quantity=2)
+        self.assertEqual([row["order_id"] for row in self.get_queue()["Food"]], [order.id])
+
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get(f"/api/orders/{order.id}/eta/")
+        self.assertEqual(response.data["eta_seconds"], 1200)
+
+        Order.objects.filter(id=order.id).update(status="completed")
+        kitchen.reset()
+        self.assertEqual(self.client.get(f"/api/orders/{order.id}/eta/").data["eta_seconds"], 0)
+
+    def test_rebuild_does_not_count_lines_whose_events_arrive_later(self):
+        self.place_order(self.soda.id)
+        kitchen.reset()
+        order = Order.objects.create(customer=self.customer)  # Committed; its events are not flushed yet
+        OrderItem.objects.create(order=order, menu_item=self.burger, quantity=2)
+        self.get_queue()
+        OrderEvent.objects.bulk_create([
+            OrderEvent(kind="order_created", order_id=order.id, payload={}),
+            OrderEvent(kind="item_added", order_id=order.id, payload={"menu_item_id": self.burger.id, "quantity": 2}),
+        ])
+        row = self.get_queue()["Food"][0]
+        self.assertEqual(row["items"], [{"menu_item_id": self.burger.id, "quantity": 2}])
+
+    def test_order_item_endpoint_writes_reach_the_queue(self):
+        order_id = self.place_order(self.burger.id)
+        self.assertEqual(self.get_queue()["Food"][0]["eta_seconds"], 600)
+        line = OrderItem.objects.get(order_id=order_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/order-items/{line.id}/", {"quantity": 3}, format="json")
+        self.assertEqual(self.get_queue()["Food"][0]["eta_seconds"], 1800)
+
+    def test_learns_prep_times_from_served_orders(self):
+        queue = kitchen.KitchenQueue()
+        queue.stations = {self.burger.id: "Food"}
+        queue.learn({self.burger.id: 1}, 300)
+        self.assertEqual(queue.prep_seconds[self.burger.id], 600 + 0.2 * (300 - 600))
+
+    def test_customers_cannot_see_the_queue(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.client.get("/api/kitchen/queue/").status_code, 403)
+
+
+class PricingRuleTestCase(TestCase):
+    def setUp(self):
+        pricing.reset()
+        self.addCleanup(pricing.reset)
+        self.client = APIClient()
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.burger = MenuItem.objects.create(name="Burger", price=Decimal("5.00"), category="Food", quantity=100)
+        self.beer = MenuItem.objects.create(name="Beer", price=Decimal("4.00"), category="Drinks", quantity=100)
+        self.friday_evening = make_aware(datetime(2025, 3, 7, 18, 10))  # A Friday
+
+    def test_time_window_and_category(self):
+        PricingRule.objects.create(
+            name="Happy hour", category="Drinks", kind="percent_off", value=25,
+            weekdays="4", start_time=time(17, 5), end_time=time(19, 0),
+        )
+        self.assertEqual(pricing.unit_price(self.beer, at=self.friday_evening), Decimal("3.00"))
+        self.assertEqual(pricing.unit_price(self.burger, at=self.friday_evening), Decimal("5.00"))
+        self.assertEqual(pricing.unit_price(self.beer, at=self.friday_evening.replace(hour=17, minute=1)), Decimal("4.00"))
+        self.assertEqual(pricing.unit_price(self.beer, at=self.friday_evening + timedelta(days=1)), Decimal("4.00"))
+
+    def test_lowest_price_wins_and_quantity_breaks(self):
+        PricingRule.objects.create(name="Menu-wide", kind="amount_off", value=1)
+        PricingRule.objects.create(name="Three burgers", menu_item=self.burger, kind="fixed_price", value=3, min_quantity=3)
+        self.assertEqual(pricing.unit_price(self.burger, quantity=2, at=self.friday_evening), Decimal("4.00"))
+        self.assertEqual(pricing.unit_price(self.burger, quantity=3, at=self.friday_evening), Decimal("3.00"))
+
+    def test_index_is_compiled_once_and_rebuilt_on_change(self):
+        rule = PricingRule.objects.create(name="Burger deal", menu_item=self.burger, kind="fixed_price", value=4)
+        pricing.unit_price(self.burger)
+        with self.assertNumQueries(0):
+            for _ in range(50):
+                pricing.unit_price(self.burger)
+        rule.value = 2
+        rule.save()
+        self.assertEqual(pricing.unit_price(self.burger), Decimal("2.00"))
+
+    def test_free_lines_keep_their_price(self):
+        rule = PricingRule.objects.create(name="Free burger", menu_item=self.burger, kind="fixed_price", value=0)
+        order = Order.objects.create(customer=self.customer)
+        line = OrderItem.objects.create(order=order, menu_item=self.burger)
+        self.assertEqual(line.price_at_time_of_order, Decimal("0.00"))
+        rule.delete()
+        line.quantity = 2
+        line.save()
+        line.refresh_from_db()
+        self.assertEqual(line.price_at_time_of_order, Decimal("0.00"))
+
+    def test_malformed_weekdays_are_rejected_and_skipped(self):
+        rule = PricingRule(name="Weekdays", kind="amount_off", value=1, weekdays="0,1,2")
+        with self.assertRaises(ValidationError):
+            rule.full_clean()
+        rule.save()  # As if saved around the validator
+        PricingRule.objects.create(name="Burger deal", menu_item=self.burger, kind="fixed_price", value=4)
+        with self.assertLogs("hotel_app.pricing", "WARNING"):
+            self.assertEqual(pricing.unit_price(self.burger), Decimal("4.00"))
+
+    def test_order_lines_snapshot_the_rule_price(self):
+        PricingRule.objects.create(name="Burger deal", menu_item=self.burger, kind="fixed_price", value=4)
+        PricingRule.objects.create(name="Burger pair", menu_item=self.burger, kind="fixed_price", value=3, min_quantity=2)
+        self.client.force_authenticate(user=self.customer)
+        order_id = self.client.post("/api/orders/", {"items": [self.burger.id]}, format="json").data["id"]
+        line = OrderItem.objects.get(order_id=order_id)
+        self.assertEqual(line.price_at_time_of_order, Decimal("4.00"))
+
+        self.client.post(f"/api/orders/{order_id}/add_item/", {"menu_item_id": self.burger.id}, format="json")
+        line.refresh_from_db()
+        self.assertEqual((line.quantity, line.price_at_time_of_order), (2, Decimal("3.00")))
+        self.assertEqual(Order.objects.get(id=order_id).total_price, Decimal("6.00"))
+
+
+class OrderSummaryTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.burger = MenuItem.objects.create(name="Burger", price=Decimal("5.00"), category="Food", quantity=100)
+        self.soda = MenuItem.objects.create(name="Soda", price=Decimal("2.00"), category="Drinks", quantity=100)
+        self.client.force_authenticate(user=self.customer)
+
+    def test_item_writes_keep_the_summary_current(self):
+        order_id = self.client.post("/api/orders/", {"items": [self.burger.id, self.soda.id]}, format="json").data["id"]
+        self.client.post(f"/api/orders/{order_id}/add_item/", {"menu_item_id": self.burger.id, "quantity": 2}, format="json")
+        self.client.post(f"/api/orders/{order_id}/remove_item/", {"menu_item_id": self.soda.id}, format="json")
+
+        order = Order.objects.get(id=order_id)
+        self.assertEqual((order.line_count, order.item_quantity, order.total_price), (1, 3, Decimal("15.00")))
+        self.assertEqual(order.item_summary, [{"id": self.burger.id, "name": "Burger", "quantity": 3, "price": "5.00"}])
+        self.assertEqual(self.client.get(f"/api/orders/{order_id}/").data["item_details"], order.item_summary)
+
+    def test_order_item_endpoint_keeps_the_summary_current(self):
+        order_id = self.client.post("/api/orders/", {"items": [self.burger.id, self.soda.id]}, format="json").data["id"]
+        self.client.get(f"/api/orders/{order_id}/")  # Cached at this version
+        burger_line = OrderItem.objects.get(order_id=order_id, menu_item=self.burger)
+        self.client.patch(f"/api/order-items/{burger_line.id}/", {"quantity": 3}, format="json")
+        self.client.delete(f"/api/order-items/{OrderItem.objects.get(order_id=order_id, menu_item=self.soda).id}/")
+
+        order = Order.objects.get(id=order_id)
+        self.assertEqual((order.line_count, order.item_quantity, order.total_price), (1, 3, Decimal("15.00")))
+        self.assertEqual(self.client.get(f"/api/orders/{order_id}/").data["item_details"], order.item_summary)
+
+    def test_checker_reports_and_fixes_drift(self):
+        order_id = self.client.post("/api/orders/", {"items": [self.burger.id]}, format="json").data["id"]
+        OrderItem.objects.filter(order_id=order_id).update(quantity=4)  # Bypasses the summary
+
+        output = StringIO()
+        call_command("check_order_summaries", stdout=output)
+        self.assertIn(f"Order {order_id}: total_price, item_quantity, item_summary out of date", output.getvalue())
+
+        call_command("check_order_summaries", "--fix", stdout=StringIO())
+        order = Order.objects.get(id=order_id)
+        self.assertEqual((order.item_quantity, order.total_price), (4, Decimal("20.00")))
+        output = StringIO()
+        call_command("check_order_summaries", stdout=output)
+        self.assertIn("Found 0 inconsistent summaries", output.getvalue())
+
+
+class CustomerStatsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = get_user_model().objects.create_user(
+            username="staff", email="staff@example.com", password="staffpass", is_staff=True
+        )
+        self.customer = get_user_model().objects.create_user(
+            username="customer", email="customer@example.com", password="custpass"
+        )
+        self.burger = MenuItem.objects.create(name="Burger", price=Decimal("5.00"), category="Food", quantity=100)
+        self.soda = MenuItem.objects.create(name="Soda", price=Decimal("2.00"), category="Drinks", quantity=100)
+        self.client.force_authenticate(user=self.customer)
+        self.order_ids = [
+            self.client.post("/api/orders/", {"items": items}, format="json").data["id"]
+            for items in ([self.burger.id, self.soda.id], [self.burger.id])
+        ]
+        self.client.force_authenticate(user=self.staff)
+        for target in ("preparing", "served", "completed"):
+            self.client.post("/api/orders/transition/", {"order_ids": self.order_ids, "status": target}, format="json")
+        receipt = Receipt.objects.create(waiter=self.staff)
+        Order.objects.filter(id__in=self.order_ids).update(receipt=receipt)
+        self.client.post("/api/receipts/settle/", {"receipt_ids": [receipt.id]}, format="json")
+
+    def test_stats_follow_completion_and_settlement(self):
+        self.client.force_authenticate(user=self.customer)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/users/{self.customer.id}/stats/")
+        self.assertEqual(response.data["order_count"], 2)
+        self.assertEqual(response.data["lifetime_spend"], "12.00")
+        self.assertEqual(response.data["favorite_items"][0], {"id": self.burger.id, "name": "Burger", "quantity": 2})
+        self.assertIsNotNone(response.data["last_visit"])
+
+        self.assertEqual(self.client.get(f"/api/users/{self.staff.id}/stats/").status_code, 403)
+
+    def test_unsettling_takes_the_spend_back(self):
+        receipt = Receipt.objects.get()
+        self.client.patch(f"/api/receipts/{receipt.id}/", {"settled": False}, format="json")
+        self.assertEqual(CustomerStats.objects.get(pk=self.customer.id).lifetime_spend, Decimal("0.00"))
+        self.client.patch(f"/api/receipts/{receipt.id}/", {"settled": True}, format="json")
+        self.assertEqual(CustomerStats.objects.get(pk=self.customer.id).lifetime_spend, Decimal("12.00"))
+
+    def test_editing_a_settled_receipts_orders_moves_the_spend(self):
+        receipt = Receipt.objects.get()
+        self.client.force_authenticate(user=self.customer)
+        extra = self.client.post("/api/orders/", {"items": [self.burger.id]}, format="json").data["id"]
+        self.client.force_authenticate(user=self.staff)
+
+        response = self.client.patch(f"/api/receipts/{receipt.id}/", {"orders": [*self.order_ids, extra]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(CustomerStats.objects.get(pk=self.customer.id).lifetime_spend, Decimal("17.00"))
+        self.client.patch(f"/api/receipts/{receipt.id}/", {"orders": [extra]}, format="json")
+        self.assertEqual(CustomerStats.objects.get(pk=self.customer.id).lifetime_spend, Decimal("5.00"))
+        self.client.patch(f"/api/receipts/{receipt.id}/", {"settled": False}, format="json")
+        self.assertEqual(CustomerStats.objects.get(pk=self.customer.id).lifetime_spend, Decimal("0.00"))
+
+    def test_backfill_matches_incremental_stats(self):
+        incremental = CustomerStats.objects.get(pk=self.customer.id)
+        CustomerStats.objects.all().delete()
+        call_command("backfill_customer_stats", stdout=StringIO())
+        rebuilt = CustomerStats.objects.get(pk=self.customer.id)
+        for field in ("order_count", "lifetime_spend", "last_visit", "favorite_items"):
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field))
+
+
+class ThrottleTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        caches["throttle"].clear()
+        self.addCleanup(caches["throttle"].clear)
+
+    def test_registration_is_throttled_with_retry_after(self):
+        for _ in range(10):  # registration: 10/hour
+            self.assertEqual(self.client.post("/api/users/", {}, format="json").status_code, 400)
+        response = self.client.post("/api/users/", {}, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response["Retry-After"]) <= 3600)
+
+    def test_counts_per_client_and_method(self):
+        throttle = MenuReadThrottle()
+        throttle.num_requests = 2
+        factory = APIRequestFactory()
+        first, second = (Request(factory.get("/api/menu-items/", REMOTE_ADDR=ip)) for ip in ("10.0.0.1", "10.0.0.2"))
+        self.assertEqual([throttle.allow_request(first, None) for _ in range(3)], [True, True, False])
+        self.assertTrue(0 < throttle.wait() <= 60)
+        self.assertTrue(throttle.allow_request(second, None))
+        self.assertTrue(throttle.allow_request(Request(factory.post("/api/menu-items/", REMOTE_ADDR="10.0.0.1")), None))
+
+    def test_anonymous_clients_cannot_rotate_their_way_past(self):
+        throttle = MenuReadThrottle()
+        throttle.num_requests = 2
+        factory = APIRequestFactory()
+        requests = [
+            Request(factory.get("/api/menu-items/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR=f"192.0.2.{n}"))
+            for n in range(3)
+        ]
+        self.assertEqual([throttle.allow_request(request, None) for request in requests], [True, True, False])
+        with use_branch("main"):
+            self.assertEqual(throttle.get_cache_key(requests[0], None), "throttle:menu_read:ip-10.0.0.1")
+
+    def test_checks_do_not_touch_the_database(self):
+        throttle = MenuReadThrottle()
+        request = Request(APIRequestFactory().get("/api/menu-items/"))
+        request.user
+        with self.assertNumQueries(0):
+            throttle.allow_request(request, None)
+
+
+class WarmStartTestCase(TestCase):
+    def test_warm_up_runs_every_step(self):
+        self.addCleanup(kitchen.reset)
+        self.addCleanup(pricing.reset)
+        MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+        self.assertEqual(list(warm_up()), ["compile routes", "build serializers", "prime branches"])
+
+    def test_failing_step_is_logged_not_raised(self):
+        def broken():
+            raise ValueError("bad row")
+
+        self.addCleanup(setattr, warmup, "STEPS", warmup.STEPS)
+        warmup.STEPS = (("broken", broken), *warmup.STEPS[:1])
+        with self.assertLogs("hotel_app.warmup", "ERROR"):
+            self.assertEqual(list(warm_up()), ["broken", "compile routes"])
+
+    def test_startup_profile_parses_importtime(self):
+        from hotel_app.management.commands.startup_profile import Command
+        modules = Command().parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     hotel_app.models\n"
+            "import time:       300 |        420 |   hotel_app.views\n"
+        )
+        self.assertEqual(modules["hotel_app.views"], (300, 420))
+
+
+class HomepageCacheTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        self.burger = MenuItem.objects.create(name="Burger", price=5.00, category="Food", quantity=100)
+
+    def test_menu_fragment_is_cached_until_the_menu_changes(self):
+        self.assertContains(self.client.get("/"), "Burger")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/")
+        self.assertNotIn("hotel_app_menuitem", " ".join(query["sql"] for query in queries))
+
+        self.burger.name = "Cheeseburger"
+        self.burger.save()
+        self.assertContains(self.client.get("/"), "Cheeseburger")
+
+    def test_menu_fragment_is_kept_per_branch(self):
+        self.client.get("/")
+        version = menu_version()
+        self.assertIsNotNone(caches["default"].get(make_template_fragment_key("homepage_menu", ["main", version])))
+        self.assertIsNone(caches["default"].get(make_template_fragment_key("homepage_menu", ["westlands", version])))
+
+    def test_navbar_varies_by_role(self):
+        self.assertNotContains(self.client.get("/"), "Sales Report")
+        manager = get_user_model().objects.create_user(
+            username="manager", email="manager@example.com", password="managerpass", role="manager"
+        )
+        self.client.force_login(manager)
+        response = self.client.get("/")
+        self.assertContains(response, "Sales Report")
+        self.assertContains(response, "Logout")
+
+
+class JSONCompressionTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        MenuItem.objects.bulk_create(
+            MenuItem(name=f"Dish {i}", price=Decimal("4.50"), category="Food", quantity=10) for i in range(40)
+        )
+
+    def test_fast_renderer_matches_drf(self):
+        data = {"total": Decimal("12.50"), "at": make_aware(datetime(2025, 3, 1, 12, 30)), 7: ["a", None]}
+        self.assertEqual(json.loads(FastJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+        precise = {
+            "at": make_aware(datetime(2025, 3, 1, 12, 30, 5, 123456)),
+            "utc": datetime(2025, 3, 1, 9, 30, 5, 654321, tzinfo=dt_timezone.utc),
+            "lmt": datetime(1880, 3, 1, 12, 0, tzinfo=dt_timezone(timedelta(minutes=-1, seconds=-15))),
+            "time": time(18, 5, 7, 250999),
+        }
+        self.assertEqual(FastJSONRenderer().render(precise), JSONRenderer().render(precise))
+        with self.assertRaises(ValueError):  # DRF refuses aware times; so must the fast path
+            FastJSONRenderer().render({"at": time(18, 5, tzinfo=dt_timezone.utc)})
+
+    def test_malformed_json_is_a_bad_request(self):
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username="guest", password="pass"))
+        response = self.client.post("/api/orders/", b'{"items": [', content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_large_json_is_compressed_as_negotiated(self):
+        plain = self.client.get("/api/menu-items/")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        zipped = self.client.get("/api/menu-items/", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(zipped["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertLess(len(zipped.content), len(plain.content))
+
+        preferred = self.client.get("/api/menu-items/", HTTP_ACCEPT_ENCODING="gzip;q=0.5, br")
+        self.assertEqual(preferred["Content-Encoding"], "br" if brotli else "gzip")
+
+    def test_small_and_html_responses_are_left_alone(self):
+        small = self.client.get("/api/menu-items/?search=Dish 39", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(small.has_header("Content-Encoding"))
+        page = self.client.get("/", HTTP_ACCEPT_ENCODING="gzip", secure=True)
+        self.assertFalse(page.has_header("Content-Encoding"))
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manager = get_user_model().objects.create_user(username="manager", password="pass", role="manager")
+        self.burger = MenuItem.objects.create(name="Burger", price=Decimal("5.00"), category="Food", quantity=100)
+        self.orders = []
+        for day in (1, 2, 3):
+            order = Order.objects.create(customer=self.manager)
+            OrderItem.objects.create(order=order, menu_item=self.burger, quantity=day)
+            order.summarize()
+            order.created_at = make_aware(datetime(2025, 3, day, 12))
+            order.save()
+            self.orders.append(order)
+        self.receipt = Receipt.objects.create(waiter=self.manager)
+        self.receipt.orders.set(self.orders[:2])
+        Receipt.objects.filter(id=self.receipt.id).update(printed=True, printed_at=make_aware(datetime(2025, 3, 2, 13)))
+        self.client.force_authenticate(user=self.manager)
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_orders_csv_by_date_range_and_cursor(self):
+        response = self.client.get("/api/export/orders/?start=2025-03-02&end=2025-03-03")
+        rows = list(csv.DictReader(StringIO(self.read(response))))
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual([int(row["id"]) for row in rows], [order.id for order in self.orders[1:]])
+        self.assertEqual((rows[0]["items"], rows[0]["total_price"]), ("2x Burger", "10.00"))
+
+        resumed = self.client.get(f"/api/export/orders/?since_id={self.orders[1].id}")
+        self.assertEqual([row[0] for row in csv.reader(StringIO(self.read(resumed)))], [str(self.orders[2].id)])
+
+    def test_rows_are_read_in_short_keyset_queries(self):
+        rows = export.order_rows(chunk_size=2)
+        with self.assertNumQueries(1):
+            first = next(rows)
+        # The first page's query has finished: a write can go through mid-export.
+        Order.objects.filter(id=first["id"]).update(status="completed")
+        with self.assertNumQueries(2):  # The last page, then the empty one that ends the export
+            self.assertEqual([row["id"] for row in rows], [order.id for order in self.orders[1:]])
+
+    def test_receipts_json_lines(self):
+        lines = self.read(self.client.get("/api/export/receipts/?output=jsonl&start=2025-03-02")).splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual([order["id"] for order in row["orders"]], [order.id for order in self.orders[:2]])
+        self.assertEqual(row["waiter"], "manager")
+
+    def test_customers_cannot_export(self):
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username="guest", password="pass"))
+        self.assertEqual(self.client.get("/api/export/orders/").status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command_resumes_without_repeating_the_header(self):
+        output, messages = StringIO(), StringIO()
+        call_command("export", "orders", "--since-id", str(self.orders[0].id), stdout=output, stderr=messages)
+        self.assertEqual(len(output.getvalue().splitlines()), 2)
+        self.assertIn(f"resume with --since-id {self.orders[2].id}", messages.getvalue())
+
+
+class StaffImportTestCase(TestCase):
+    CSV = (
+        "username,email,role,password\n"
+        "wanjiku,wanjiku@example.com,waiter,\n"
+        "otieno,otieno@example.com,kitchen,kitchenpass\n"
+        "achieng,achieng@example.com,cashier,\n"
+        "kamau,kamau@example.com,waiter,\n"
+        "otieno,other@example.com,waiter,\n"
+        "taken,taken@example.com,waiter,\n"
+        "boss,not-an-email,owner,\n"
+        "bad name!,bad@example.com,waiter,\n"
+        f"{'x' * 151},long@example.com,waiter,\n"
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(username="admin", email="admin@example.com", password="adminpass")
+        get_user_model().objects.create_user(username="taken", password="pass")
+
+    def upload(self, text):
+        return self.client.post("/api/users/bulk_import/", {"file": SimpleUploadedFile("staff.csv", text.encode())}, format="multipart")
+
+    def test_import_reports_every_row(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.upload(self.CSV)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["created"], response.data["failed"]), (4, 5))
+
+        results = response.data["results"]
+        self.assertEqual([result["status"] for result in results], ["created"] * 4 + ["error"] * 5)
+        self.assertEqual(set(results[6]["errors"]), {"email", "role"})
+        self.assertEqual([set(result["errors"]) for result in results[7:]], [{"username"}, {"username"}])
+        self.assertNotIn("password", results[1])  # Chosen in the file, not echoed back
+
+        wanjiku = get_user_model().objects.get(username="wanjiku")
+        self.assertEqual(wanjiku.role, "waiter")
+        self.assertTrue(wanjiku.check_password(results[0]["password"]))
+        self.assertTrue(get_user_model().objects.get(username="otieno").check_password("kitchenpass"))
+
+    def test_only_admins_can_import(self):
+        self.client.force_authenticate(user=get_user_model().objects.get(username="taken"))
+        self.assertEqual(self.upload(self.CSV).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command_rejects_a_file_without_the_columns(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as source:
+            source.write("name,mail\nx,y\n")
+        self.addCleanup(os.remove, source.name)
+        with self.assertRaisesMessage(CommandError, "username, email and role"):
+            call_command("import_staff", source.name, stdout=StringIO())
+
+
+class ReservationTestCase(TestCase):
+    def setUp(self):
+        reservations.reset()
+        self.addCleanup(reservations.reset)
+        self.client = APIClient()
+        self.customer = get_user_model().objects.create_user(username="customer", password="pass", first_name="Amina")
+        self.waiter = get_user_model().objects.create_user(username="waiter", password="pass", role="waiter")
+        self.small, self.medium, self.large = (
+            Table.objects.create(number=str(seats), seats=seats) for seats in (2, 4, 6)
+        )
+        self.evening = make_aware(datetime(2030, 6, 1, 19))
+
+    def book(self, table, start_hour, end_hour, party_size=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/reservations/", {
+                "table": table.id, "party_size": party_size,
+                "start": self.evening.replace(hour=start_hour).isoformat(),
+                "end": self.evening.replace(hour=end_hour).isoformat(),
+            }, format="json")
+
+    def available(self, start_hour, end_hour, party_size):
+        response = self.client.get("/api/tables/availability/", {
+            "start": self.evening.replace(hour=start_hour).isoformat(),
+            "end": self.evening.replace(hour=end_hour).isoformat(),
+            "party_size": party_size,
+        })
+        return [table["number"] for table in response.data["tables"]]
+
+    def test_availability_follows_bookings(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.available(20, 22, 3), ["4", "6"])
+
+        response = self.book(self.medium, 19, 21, party_size=3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["name"], "Amina")
+        with self.assertNumQueries(0):  # Answered from the index
+            self.assertEqual(self.available(20, 22, 3), ["6"])
+        self.assertEqual(self.available(21, 23, 3), ["4", "6"])  # Back to back is fine
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/reservations/{response.data['id']}/cancel/")
+        self.assertEqual(self.available(20, 22, 3), ["4", "6"])
+
+    def test_overlapping_booking_is_rejected(self):
+        self.client.force_authenticate(user=self.customer)
+        self.assertEqual(self.book(self.small, 19, 21).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book(self.small, 20, 22).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.book(self.small, 18, 20).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.book(self.small, 21, 22).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book(self.small, 22, 23, party_size=5).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_picks_up_other_workers_bookings(self):
+        self.client.force_authenticate(user=self.waiter)
+        self.assertEqual(self.available(19, 20, 1), ["2", "4", "6"])
+        Reservation.objects.bulk_create([  # No signals, like a write made by another worker
+            Reservation(table=self.small, name="Phone", party_size=2, start=self.evening, end=self.evening.replace(hour=21)),
+        ])
+        with self.settings(RESERVATIONS_CHECK_SECONDS=0):
+            self.assertEqual(self.available(19, 20, 1), ["4", "6"])
+
+    def test_index_picks_up_other_workers_deletes(self):
+        self.client.force_authenticate(user=self.waiter)
+        Reservation.objects.bulk_create([
+            Reservation(table=self.small, name="Phone", party_size=2, start=self.evening, end=self.evening.replace(hour=21)),
+            Reservation(table=self.large, name="Later", party_size=4, start=self.evening.replace(hour=22), end=self.evening.replace(hour=23)),
+        ])
+        self.assertEqual(self.available(19, 20, 1), ["4", "6"])
+        # Another worker deletes the older booking: neither the latest id nor the latest change moves.
+        Reservation.objects.filter(table=self.small)._raw_delete(Reservation.objects.db)
+        with self.settings(RESERVATIONS_CHECK_SECONDS=0):
+            self.assertEqual(self.available(19, 20, 1), ["2", "4", "6"])
+
+    def test_orders_can_be_placed_at_a_table(self):
+        self.client.force_authenticate(user=self.customer)
+        burger = MenuItem.objects.create(name="Burger", price=Decimal("5.00"), category="Food", quantity=10)
+        response = self.client.post("/api/orders/", {"items": [burger.id], "table": self.large.id}, format="json")
+        self.assertEqual(response.data["table"], self.large.id)
+        self.assertEqual(self.large.orders.count(), 1)
+
+
+class DetailCacheTestCase(TestCase):
+    def setUp(self):
+        detail_cache.reset()
+        self.addCleanup(detail_cache.reset)
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(username="admin", email="admin@example.com", password="adminpass")
+        self.customer = get_user_model().objects.create_user(username="customer", password="pass")
+        self.burger = MenuItem.objects.create(name="Burger", price=Decimal("5.00"), category="Food", quantity=100)
+        self.soda = MenuItem.objects.create(name="Soda", price=Decimal("2.00"), category="Drinks", quantity=100)
+        self.client.force_authenticate(user=self.customer)
+        self.order_id = self.client.post("/api/orders/", {"items": [self.burger.id]}, format="json").data["id"]
+
+    def test_repeat_reads_are_served_from_the_cache(self):
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(f"/api/orders/{self.order_id}/")
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(f"/api/orders/{self.order_id}/")
+        self.assertEqual(response.data["item_details"][0]["name"], "Burger")
+        self.assertLess(len(second), len(first))
+        self.assertEqual(
+            {key: detail_cache.cache.stats()["order"][key] for key in ("hits", "misses")}, {"hits": 1, "misses": 1}
+        )
+
+    def test_writes_invalidate_entries(self):
+        self.client.get(f"/api/orders/{self.order_id}/")
+        self.client.post(f"/api/orders/{self.order_id}/add_item/", {"menu_item_id": self.soda.id}, format="json")
+        self.assertEqual(len(self.client.get(f"/api/orders/{self.order_id}/").data["item_details"]), 2)
+
+        Order.objects.filter(id=self.order_id).update(status="preparing", updated_at=now())  # As another worker would
+        self.assertEqual(self.client.get(f"/api/orders/{self.order_id}/").data["status"], "preparing")
+
+    def test_permissions_still_apply(self):
+        self.client.get(f"/api/orders/{self.order_id}/")
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username="other", password="pass"))
+        self.assertEqual(self.client.get(f"/api/orders/{self.order_id}/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_receipt_settle_and_eviction(self):
+        self.client.force_authenticate(user=self.admin)
+        receipt_id = self.client.post("/api/receipts/", {"orders": [self.order_id]}, format="json").data["id"]
+        self.assertFalse(self.client.get(f"/api/receipts/{receipt_id}/").data["settled"])
+        self.client.post("/api/receipts/settle/", {"receipt_ids": [receipt_id]}, format="json")
+        self.assertTrue(self.client.get(f"/api/receipts/{receipt_id}/").data["settled"])
+
+        with self.settings(DETAIL_CACHE_SIZE=1):
+            self.client.get(f"/api/orders/{self.order_id}/")
+            stats = self.client.get("/api/detail-cache/").data
+        self.assertEqual((stats["entries"], stats["receipt"]["evictions"]), (1, 1))
+
+
+class LoadTestToolTestCase(TestCase):
+    def test_recorder_summarises_per_endpoint(self):
+        recorder = loadtest.Recorder()
+        for millis in range(1, 101):
+            recorder.record("GET /api/menu-items/", millis / 1000, 200)
+        recorder.record("POST /api/orders/", 0.5, 503, locked=True)
+        recorder.record("POST /api/orders/", 0.1, 429)
+        menu, orders, total = recorder.rows(elapsed=10)
+
+        self.assertEqual((menu["requests"], menu["rps"], menu["p50_ms"], menu["p99_ms"]), (100, 10.0, 50.0, 99.0))
+        self.assertEqual((orders["error_rate"], orders["locked"], orders["throttled"]), (1.0, 1, 1))
+        self.assertEqual((total["endpoint"], total["requests"]), ("TOTAL", 102))
+        self.assertEqual(loadtest.IDS_IN_PATH.sub("/{id}", "/api/orders/42/add_item/"), "/api/orders/{id}/add_item/")
+
+    def test_locked_database_is_a_retryable_503(self):
+        response = exception_handler(OperationalError("database is locked"), {})
+        self.assertEqual((response.status_code, response["Retry-After"]), (503, "1"))
+        self.assertEqual(response.data, {"error": "database is locked"})
+        self.assertIsNone(exception_handler(OperationalError("no such table"), {}))  # Still a 500
+
+    def test_command_rejects_an_unknown_persona(self):
+        with self.assertRaisesMessage(CommandError, "Bad --mix entry 'chef=2'"):
+            call_command("loadtest", "--mix", "waiter=1,chef=2", stdout=StringIO())
+
+    def test_command_accounts_are_unprivileged_and_disabled_after_the_run(self):
+        with self.assertRaisesMessage(CommandError, "Pass --allow-production"):
+            call_command("loadtest", "--mix", "cashier=1", stdout=StringIO())
+        User = get_user_model()
+        User.objects.create_user(username="loadtest-cashier-0", password="loadtest-pass", role="manager", is_staff=True)
+
+        call_command("loadtest", "--mix", "cashier=1", "--duration", "0", "--allow-production", stdout=StringIO())
+        cashier = User.objects.get(username="loadtest-cashier-0")
+        self.assertEqual((cashier.role, cashier.is_staff, cashier.is_active), ("cashier", False, False))
+        self.assertFalse(cashier.check_password("loadtest-pass"))
+
+        # Without is_staff, the cashier role alone may still print receipts.
+        cashier.is_active = True
+        cashier.save()
+        receipt = Receipt.objects.create(waiter=cashier)
+        client = APIClient()
+        client.force_authenticate(user=cashier)
+        response = client.patch(f"/api/receipts/{receipt.id}/", {"printed": True}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertTrue(Receipt.objects.get(id=receipt.id).printed)
@@ -0,0 +1,80 @@
+"""
+Scoped request throttles backed by a shared cache.
+
+Each scope (registration, token, menu_read, order_write, report_read) gets its
+own rate from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]. Requests are counted
+per user and branch - or per client IP alone when anonymous, since anonymous
+callers pick their branch with X-Branch - in one cache counter per rate window,
+bumped with the cache's atomic `incr`; a check is one or two
+cache calls and no database query. Point the "throttle" cache at Redis
+(REDIS_URL) so every worker shares the same counters.
+"""
+from time import time
+
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+from hotel_app.branches import current_branch
+
+
+class ScopedCounterThrottle(SimpleRateThrottle):
+    """Fixed-window counter per scope and client; `methods` limits which requests it counts."""
+    cache_alias = "throttle"
+    methods = None  # e.g. ("GET", "HEAD"); None counts every method
+
+    def get_cache_key(self, request, view):
+        if self.methods is not None and request.method not in self.methods:
+            return None
+        if request.user and request.user.is_authenticated:
+            return f"throttle:{self.scope}:{current_branch()}:user-{request.user.pk}"
+        # The IP as REST_FRAMEWORK["NUM_PROXIES"] says to read it; never the caller's own X-Forwarded-For.
+        return f"throttle:{self.scope}:ip-{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        now = time()
+        window = int(now // self.duration)
+        key = f"{key}:{window}"
+        cache = caches[self.cache_alias]
+        if cache.add(key, 1, timeout=self.duration + 1):
+            count = 1
+        else:
+            try:
+                count = cache.incr(key)
+            except ValueError:  # Expired between add() and incr()
+                cache.set(key, 1, timeout=self.duration + 1)
+                count = 1
+        if count <= self.num_requests:
+            return True
+        self.wait_seconds = (window + 1) * self.duration - now  # Until the window resets
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class RegistrationThrottle(ScopedCounterThrottle):
+    scope = "registration"
+
+
+class TokenThrottle(ScopedCounterThrottle):
+    scope = "token"
+
+
+class MenuReadThrottle(ScopedCounterThrottle):
+    scope = "menu_read"
+    methods = ("GET", "HEAD")
+
+
+class OrderWriteThrottle(ScopedCounterThrottle):
+    scope = "order_write"
+    methods = ("POST", "PUT", "PATCH", "DELETE")
+
+
+class ReportReadThrottle(ScopedCounterThrottle):
+    scope = "report_read"
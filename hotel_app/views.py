@@ -4,19 +4,42 @@ from django.contrib.auth import login
 from django.urls import reverse_lazy
 from django.views.generic import TemplateView
 from django.contrib.auth.views import LoginView, LogoutView
-from django.utils.timezone import now
+from django.utils.timezone import now, make_aware
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
 
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 
-from hotel_app.models import User, MenuItem, Order, OrderItem, Receipt, SalesReport, Inventory
+from hotel_app.models import (
+    User, MenuItem, Order, OrderItem, Receipt, SalesReport, Inventory, ArchivedOrder, MenuItemHourlyRollup,
+    OrderStatusHistory, OrderEvent, ChangeLog, CustomerStats, Table, Reservation
+)
 from hotel_app.serializers import (
     UserSerializer, MenuItemSerializer, OrderSerializer, OrderItemSerializer,
-    ReceiptSerializer, SalesReportSerializer, InventorySerializer
+    ReceiptSerializer, SalesReportSerializer, InventorySerializer, StockTakeSerializer,
+    ArchivedOrderSerializer, TopItemSerializer, HourlyDemandSerializer, OrderTransitionSerializer,
+    ReceiptSettleSerializer, BatchSerializer, CustomerStatsSerializer, TableSerializer, ReservationSerializer,
+    AvailabilitySerializer
 )
 from hotel_app.forms import UserRegistrationForm
+from hotel_app import batch, customer_stats, detail_cache, events, export, reservations, staff_import, stock
+from hotel_app.branches import current_alias, current_branch, for_each_branch
+from hotel_app.changes import menu_version, record_changes
+from hotel_app.kitchen import QUEUE_STATUSES, kitchen_queue
+from hotel_app.pricing import unit_price
+from hotel_app.throttling import (
+    RegistrationThrottle, MenuReadThrottle, OrderWriteThrottle, ReportReadThrottle
+)
 from rest_framework import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+import json
+from django.db import transaction
+from django.db.models import F, Q, Count, Max
+from django.db.models.functions import ExtractHour, Greatest
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
@@ -29,6 +52,15 @@ from decimal import Decimal
 class HomeView(TemplateView):
     template_name = "hotel_app/homepage.html"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # The menu section is a cached fragment keyed by branch and menu_version (a ChangeLog id from the
+        # branch's own database, so only unique within it); the queryset only runs on a cache miss.
+        context["branch"] = current_branch()
+        context["menu_version"] = menu_version()
+        context["menu_items"] = MenuItem.objects.filter(availability=True).only("name", "price", "category").order_by("category", "name")
+        return context
+
 class RegisterView(CreateView):
     model = User
     form_class = UserRegistrationForm
@@ -41,8 +73,52 @@ class UserLoginView(LoginView):
 class UserLogoutView(LogoutView):
     next_page = "login"  # Redirect to login page after logout
 
+# SPARSE FIELDSETS
+class SparseFieldsetMixin:
+    """
+    Narrow read querysets to the relations and columns needed by the fields the
+    client asked for with ?fields= / ?expand= (see DynamicFieldsMixin).
+    """
+    sparse_actions = ("list", "retrieve", "unbilled")
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.sparse_actions and self.request.method in permissions.SAFE_METHODS:
+            queryset = self.get_serializer_class().optimize_queryset(queryset, self.request)
+        return queryset
+
+
+class CachedDetailMixin:
+    """
+    Serve retrieve() from hotel_app.detail_cache: the object's version is read
+    through get_queryset() (so it is 404 for users who may not see it), and the
+    full representation is only built when that version is not cached yet.
+    """
+    detail_kind = None
+
+    def versioned(self, queryset):
+        """`queryset` narrowed to what `version_of` needs."""
+        return queryset.only("id", "updated_at")
+
+    def version_of(self, obj):
+        return obj.updated_at
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.get_serializer_class().requested_fields(request) is not None:
+            return super().retrieve(request, *args, **kwargs)  # Sparse fieldsets are not cached
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        obj = get_object_or_404(self.versioned(self.get_queryset()), **lookup)
+        self.check_object_permissions(request, obj)
+        version = self.version_of(obj)
+        data = detail_cache.cache.get(self.detail_kind, obj.pk, version)
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            detail_cache.cache.put(self.detail_kind, obj.pk, version, data)
+        return Response(data)
+
+
 # USER VIEWSET
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
@@ -51,18 +127,56 @@ class UserViewSet(viewsets.ModelViewSet):
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]  # Only authenticated users can update/view
 
+    def get_throttles(self):
+        if self.action == 'create':  # Open registration, keep bots from flooding the database
+            return [RegistrationThrottle()]
+        return super().get_throttles()
+
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """ Loyalty numbers for one customer, read with a single primary-key lookup. """
+        if not (str(request.user.pk) == pk or request.user.is_staff or request.user.role in ("manager", "waiter", "cashier")):
+            return Response({"detail": "You can only view your own stats."}, status=status.HTTP_403_FORBIDDEN)
+        if not pk.isdigit():
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        stats = CustomerStats.objects.filter(pk=pk).first() or CustomerStats(user_id=int(pk))  # No orders yet
+        return Response(CustomerStatsSerializer(stats).data)
+
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        """ Create staff accounts from an uploaded CSV (username,email,role[,password]); admins only. """
+        if not request.user.is_staff:
+            return Response({"error": "Only admins can create staff accounts."}, status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "Upload the CSV as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = staff_import.import_staff(upload.read().decode("utf-8-sig"))
+        except UnicodeDecodeError:
+            return Response({"error": "The CSV must be UTF-8 encoded."}, status=status.HTTP_400_BAD_REQUEST)
+        except staff_import.StaffImportError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        created = sum(result["status"] == "created" for result in results)
+        return Response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
 # MENU ITEM VIEWSET
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]  # Anyone can view, only staff can modify
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'category', 'availability']  # Allows search by ?search=pizza
+    throttle_classes = [MenuReadThrottle]
 
 # ORDER VIEWSET
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(CachedDetailMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [OrderWriteThrottle]
+    detail_kind = "order"
 
     def perform_create(self, serializer):
         serializer.save(customer=self.request.user)
@@ -70,8 +184,8 @@ class OrderViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Order.objects.all().prefetch_related('items')  # Admins see all orders
-        return Order.objects.filter(customer=user).prefetch_related('items')  # Customers see only their own
+            return Order.objects.all()  # Admins see all orders
+        return Order.objects.filter(customer=user)  # Customers see only their own
     def destroy(self, request, *args, **kwargs):
         # Ensure only admins (superusers) can delete orders.
         if not request.user.is_superuser:
@@ -91,6 +205,10 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response({"detail": "You can only cancel your own orders."}, status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        events.record("order_cancelled", order_id=instance.id, actor=self.request.user, status=instance.status)
+        instance.delete()
+
     @action(detail=True, methods=['post'])
     def add_item(self, request, pk=None):
         """ Allow users to add items to an existing order. """
@@ -102,17 +220,32 @@ class OrderViewSet(viewsets.ModelViewSet):
         quantity = request.data.get("quantity", 1)
 
         try:
-            menu_item = MenuItem.objects.get(id=menu_item_id)
+            menu_item = batch.get_menu_item(menu_item_id)
         except MenuItem.DoesNotExist:
             return Response({"error": "Menu item not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        order_item, created = OrderItem.objects.get_or_create(order=order, menu_item=menu_item)
-        if not created:
-            order_item.quantity += int(quantity)
-            order_item.save()
+        with transaction.atomic(using=current_alias()):  # Line and order summary change together
+            order_item, created = OrderItem.objects.get_or_create(order=order, menu_item=menu_item)
+            stock.reduce_stock(menu_item.id, 1 if created else int(quantity), order_id=order.id, actor=request.user)
+            if not created:
+                old_quantity, old_price = order_item.quantity, order_item.price_at_time_of_order
+                order_item.quantity += int(quantity)
+                # A bigger line may reach a quantity break; the price snapshot never goes up.
+                order_item.price_at_time_of_order = min(old_price, unit_price(menu_item, order_item.quantity))
+                order_item.save()
+                if order_item.price_at_time_of_order != old_price:  # Journal the repricing as a new line
+                    events.record(
+                        "item_removed", order_id=order.id, actor=request.user, menu_item_id=menu_item.id,
+                        quantity=old_quantity, price=old_price,
+                    )
+                    quantity = order_item.quantity
+            events.record(
+                "item_added", order_id=order.id, actor=request.user, menu_item_id=menu_item.id,
+                quantity=1 if created else int(quantity), price=order_item.price_at_time_of_order,
+            )
 
-        order.total_price = order.calculate_total_price()
-        order.save()
+            order.summarize()
+            order.save(update_fields=Order.SUMMARY_FIELDS)  # Never write back a stale receipt
 
         return Response({"message": "Item added successfully!"}, status=status.HTTP_200_OK)
 
@@ -133,29 +266,143 @@ class OrderViewSet(viewsets.ModelViewSet):
         if order.orderitem_set.count() == 1:
             return Response({"error": "An order must have at least one item."}, status=status.HTTP_400_BAD_REQUEST)
 
-        order_item.delete()
-        order.total_price = order.calculate_total_price()
-        order.save()
+        with transaction.atomic(using=current_alias()):
+            order_item.delete()
+            events.record(
+                "item_removed", order_id=order.id, actor=request.user, menu_item_id=order_item.menu_item_id,
+                quantity=order_item.quantity, price=order_item.price_at_time_of_order,
+            )
+            order.summarize()
+            order.save(update_fields=Order.SUMMARY_FIELDS)
 
         return Response({"message": "Item removed successfully!"}, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def eta(self, request, pk=None):
+        """ Estimated seconds until the kitchen has the order ready (0 once it left the kitchen). """
+        order = self.get_object()
+        with kitchen_queue() as queue:
+            seconds = queue.eta(order.id)
+        if seconds is None and order.status not in QUEUE_STATUSES:
+            seconds = 0
+        return Response({
+            "order_id": order.id,
+            "status": order.status,
+            "eta_seconds": None if seconds is None else round(seconds),
+            "ready_at": None if seconds is None else now() + timedelta(seconds=seconds),
+        })
+
+    @action(detail=False, methods=['get'])
+    def unbilled(self, request):
+        """ Orders that no receipt has claimed yet, oldest first. """
+        orders = self.filter_queryset(self.get_queryset()).filter(receipt__isnull=True).order_by("created_at")
+        return Response(self.get_serializer(orders, many=True).data)
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """ Move many orders one step along pending -> preparing -> served -> completed. """
+        if not (request.user.is_staff or request.user.role in ("kitchen", "waiter", "manager")):
+            return Response({"error": "Only staff can change order status."}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = OrderTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        target = serializer.validated_data["status"]
+        source = Order.previous_status(target)
+        order_ids = list(dict.fromkeys(serializer.validated_data["order_ids"]))
+
+        with transaction.atomic(using=current_alias()):
+            eligible = Order.objects.select_for_update().filter(id__in=order_ids, status=source)
+            owners = dict(eligible.values_list("id", "customer_id"))
+            moved = list(owners)
+            changed_at = now()
+            # One conditional UPDATE; skips Order.save() and its total recomputation.
+            Order.objects.filter(id__in=moved, status=source).update(status=target, updated_at=changed_at)
+            OrderStatusHistory.objects.bulk_create([
+                OrderStatusHistory(
+                    order_id=order_id, from_status=source, to_status=target,
+                    changed_by=request.user, changed_at=changed_at,
+                )
+                for order_id in moved
+            ])
+            for order_id in moved:
+                events.record("status_changed", order_id=order_id, actor=request.user, **{"from": source, "to": target})
+            record_changes("order", owners.items())
+            if target == "completed":
+                customer_stats.orders_completed(moved)
+
+        moved_set = set(moved)
+        return Response({
+            "status": target,
+            "transitioned": moved,
+            "skipped": [order_id for order_id in order_ids if order_id not in moved_set],
+        }, status=status.HTTP_200_OK)
+
 # ORDER ITEM VIEWSET
-class OrderItemViewSet(viewsets.ModelViewSet):
+class OrderItemViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = OrderItem.objects.all()
     serializer_class = OrderItemSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [OrderWriteThrottle]
+
+    @staticmethod
+    def resummarize(*order_ids):
+        """ Refresh the summary columns (and updated_at) of the orders whose lines just changed. """
+        for order in Order.objects.filter(id__in={order_id for order_id in order_ids if order_id}):
+            order.summarize()
+            order.save(update_fields=Order.SUMMARY_FIELDS)
+
+    def journal(self, kind, line):
+        """ Journal a line's (order, item, quantity, price) being added or taken off, as add_item/remove_item do. """
+        order_id, menu_item_id, quantity, price = line
+        events.record(kind, order_id=order_id, actor=self.request.user, menu_item_id=menu_item_id, quantity=quantity, price=price)
+
+    @staticmethod
+    def line_of(item):
+        return (item.order_id, item.menu_item_id, item.quantity, item.price_at_time_of_order)
+
+    def perform_create(self, serializer):
+        with transaction.atomic(using=current_alias()):
+            line = serializer.save()
+            stock.reduce_stock(line.menu_item_id, line.quantity, order_id=line.order_id, actor=self.request.user)
+            self.journal("item_added", self.line_of(line))
+            self.resummarize(line.order_id)
+
+    def perform_update(self, serializer):
+        with transaction.atomic(using=current_alias()):
+            previous = self.line_of(serializer.instance)
+            line = serializer.save()
+            if self.line_of(line) != previous:  # Journaled as the old line taken off and the new one added
+                self.journal("item_removed", previous)
+                self.journal("item_added", self.line_of(line))
+            self.resummarize(previous[0], line.order_id)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=current_alias()):
+            instance.delete()
+            self.journal("item_removed", self.line_of(instance))
+            self.resummarize(instance.order_id)
 
 # RECEIPT VIEWSET
-class ReceiptViewSet(viewsets.ModelViewSet):
+class ReceiptViewSet(CachedDetailMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Receipt.objects.all()
     serializer_class = ReceiptSerializer
     permission_classes = [permissions.IsAuthenticated]
+    detail_kind = "receipt"
+
+    def versioned(self, queryset):
+        # The details also show the receipt's orders and their menu items.
+        return queryset.only("id", "updated_at").annotate(
+            orders_changed=Max("orders__updated_at"), menu_changed=Max("orders__orderitem__menu_item__updated_at"),
+        )
+
+    def version_of(self, obj):
+        return (obj.updated_at, obj.orders_changed, obj.menu_changed)
 
     def update(self, request, *args, **kwargs):
         receipt = self.get_object()
         
         # Customers should not be able to update 'printed' or 'settled'
-        if not request.user.is_staff:
+        if not (request.user.is_staff or request.user.role in ("cashier", "manager")):
             if 'printed' in request.data or 'settled' in request.data:
                 return Response({"detail": "Only staff can change receipt status."}, status=status.HTTP_403_FORBIDDEN)
 
@@ -165,6 +412,72 @@ class ReceiptViewSet(viewsets.ModelViewSet):
         if not request.user.is_superuser:
             return Response({"error": "Only admins can delete receipts. Please contact mugambiDaktari @https://www.linkedin.com/in/dr-mugambi-wycliff-77319511b/"}, status=403)
         return super().destroy(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'])
+    def settle(self, request):
+        """ Settle a list of receipts, or all of a waiter's printed receipts for a day, in one go. """
+        if not (request.user.is_staff or request.user.role in ("cashier", "manager")):
+            return Response({"detail": "Only staff can change receipt status."}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = ReceiptSettleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        receipts = Receipt.objects.filter(settled=False)
+        if data.get("receipt_ids"):
+            receipts = receipts.filter(id__in=data["receipt_ids"])
+        else:
+            day = data.get("date") or now().date()
+            receipts = receipts.filter(
+                waiter=data["waiter"],
+                printed=True,
+                printed_at__gte=make_aware(datetime.combine(day, time.min)),
+                printed_at__lt=make_aware(datetime.combine(day + timedelta(days=1), time.min)),
+            )
+
+        with transaction.atomic(using=current_alias()):
+            settled = list(receipts.select_for_update().values_list("id", "waiter_id", "total_amount"))
+            settled_ids = [receipt_id for receipt_id, _, _ in settled]
+            totals = list(
+                Receipt.objects.filter(id__in=settled_ids)
+                .values("waiter_id")
+                .annotate(
+                    count=Count("id"),
+                    amount=Sum("total_amount"),
+                    printed_count=Count("id", filter=Q(printed=True)),
+                    printed_amount=Sum("total_amount", filter=Q(printed=True)),
+                )
+            )
+            # A single UPDATE; bypasses Receipt.save() and the per-receipt post_save work.
+            Receipt.objects.filter(id__in=settled_ids, settled=False).update(settled=True, updated_at=now())
+            for receipt_id, waiter_id, amount in settled:
+                events.record("receipt_settled", receipt_id=receipt_id, actor=request.user, waiter_id=waiter_id, amount=amount)
+            record_changes("receipt", [(receipt_id, waiter_id) for receipt_id, waiter_id, _ in settled])
+            customer_stats.receipts_settled(settled_ids)
+
+            today = now().date()
+            waiter_ids = [row["waiter_id"] for row in totals]
+            existing = set(
+                SalesReport.objects.filter(date=today, waiter_id__in=waiter_ids).values_list("waiter_id", flat=True)
+            )
+            SalesReport.objects.bulk_create(
+                [SalesReport(waiter_id=waiter_id) for waiter_id in waiter_ids if waiter_id not in existing]
+            )
+            for row in totals:
+                # Same bookkeeping as the receipt post_save receiver: a settled receipt
+                # moves out of the printed totals and into the settled totals.
+                SalesReport.objects.filter(date=today, waiter_id=row["waiter_id"]).update(
+                    settled_receipts_count=F("settled_receipts_count") + row["count"],
+                    total_settled_amount=F("total_settled_amount") + row["amount"],
+                    printed_receipts_count=Greatest(F("printed_receipts_count") - row["printed_count"], 0),
+                    total_printed_amount=Greatest(F("total_printed_amount") - (row["printed_amount"] or 0), Decimal("0.00")),
+                )
+
+        return Response({
+            "settled": settled_ids,
+            "count": len(settled_ids),
+            "total_settled_amount": str(sum((row["amount"] for row in totals), Decimal("0.00"))),
+        }, status=status.HTTP_200_OK)
 # SALES REPORT VIEWSET
 class IsAdminOrManager(permissions.BasePermission):
     """
@@ -177,6 +490,7 @@ class IsAdminOrManager(permissions.BasePermission):
 class SalesReportViewSet(viewsets.ReadOnlyModelViewSet):  # ReadOnly prevents creation
     serializer_class = SalesReportSerializer
     permission_classes = [IsAdminOrManager]
+    throttle_classes = [ReportReadThrottle]
 
     def get_queryset(self):
         """
@@ -200,6 +514,311 @@ class SalesReportViewSet(viewsets.ReadOnlyModelViewSet):  # ReadOnly prevents cr
         ]
 
 
+# ANALYTICS VIEWSET
+class AnalyticsViewSet(viewsets.ViewSet):
+    """
+    Menu popularity and hourly demand, served from the hourly rollup table only.
+    Run `manage.py rollup_analytics` periodically to keep it current.
+    """
+    permission_classes = [IsAdminOrManager]
+    throttle_classes = [ReportReadThrottle]
+
+    def get_rollups(self, request):
+        """ Rollup rows for ?start=&end= (inclusive dates, default: the last 30 days). """
+        end = parse_date(request.query_params.get("end", "")) or now().date()
+        start = parse_date(request.query_params.get("start", "")) or end - timedelta(days=29)
+        rollups = MenuItemHourlyRollup.objects.filter(
+            hour__gte=make_aware(datetime.combine(start, time.min)),
+            hour__lt=make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+        )
+        menu_item_id = request.query_params.get("menu_item", "")
+        if menu_item_id.isdigit():
+            rollups = rollups.filter(menu_item_id=menu_item_id)
+        return rollups
+
+    @action(detail=False, methods=['get'], url_path='top-items')
+    def top_items(self, request):
+        """ Best selling menu items, by quantity or ?by=revenue. """
+        ordering = "-revenue" if request.query_params.get("by") == "revenue" else "-quantity"
+        limit = request.query_params.get("limit", "")
+        limit = min(int(limit), 100) if limit.isdigit() else 10
+
+        rows = (
+            self.get_rollups(request)
+            .values("menu_item_id", "menu_item__name")
+            .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+            .order_by(ordering, "menu_item_id")[:limit]
+        )
+        return Response(TopItemSerializer(rows, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def hourly(self, request):
+        """ Demand by hour of day (0-23) over the requested range. """
+        rows = (
+            self.get_rollups(request)
+            .annotate(hour_of_day=ExtractHour("hour"))
+            .values("hour_of_day")
+            .annotate(quantity=Sum("quantity"), revenue=Sum("revenue"))
+            .order_by("hour_of_day")
+        )
+        data = [{"hour": row["hour_of_day"], "quantity": row["quantity"], "revenue": row["revenue"]} for row in rows]
+        return Response(HourlyDemandSerializer(data, many=True).data)
+
+
+# EVENT JOURNAL VIEWSET
+class OrderEventViewSet(viewsets.ViewSet):
+    permission_classes = [IsAdminOrManager]
+    throttle_classes = [ReportReadThrottle]
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """ Stream the journal as JSON Lines, oldest first (?since_id=, ?kind=, ?order_id=). """
+        journal = OrderEvent.objects.using(current_alias()).order_by("id")
+        since_id = request.query_params.get("since_id", "")
+        order_id = request.query_params.get("order_id", "")
+        if order_id.isdigit():
+            journal = journal.filter(order_id=order_id)
+        if request.query_params.get("kind"):
+            journal = journal.filter(kind=request.query_params["kind"])
+        rows = journal.values("id", "kind", "order_id", "receipt_id", "actor_id", "payload", "created_at")
+
+        def lines(last_id, chunk_size=2000):
+            # One short query per page, finished before anything is sent: an open cursor would hold
+            # SQLite's read lock for the whole download and lock every writer out meanwhile.
+            while True:
+                page = list(rows.filter(id__gt=last_id)[:chunk_size])
+                if not page:
+                    return
+                for row in page:
+                    yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+                last_id = page[-1]["id"]
+
+        return StreamingHttpResponse(
+            lines(int(since_id) if since_id.isdigit() else 0), content_type="application/x-ndjson"
+        )
+
+
+# HEAD OFFICE VIEWSET
+class HeadOfficeViewSet(viewsets.ViewSet):
+    """ Reports that fan out across every branch database concurrently and merge the results. """
+    permission_classes = [IsAdminOrManager]
+    throttle_classes = [ReportReadThrottle]
+
+    @staticmethod
+    def branch_sales(code, day):
+        """ One branch's printed/settled receipt totals for `day` (runs in a worker thread). """
+        totals = Receipt.objects.filter(
+            printed=True,
+            printed_at__gte=make_aware(datetime.combine(day, time.min)),
+            printed_at__lt=make_aware(datetime.combine(day + timedelta(days=1), time.min)),
+        ).aggregate(
+            printed_receipts_count=Count("id"),
+            settled_receipts_count=Count("id", filter=Q(settled=True)),
+            total_printed_amount=Sum("total_amount"),
+            total_settled_amount=Sum("total_amount", filter=Q(settled=True)),
+        )
+        return {field: value or 0 for field, value in totals.items()}
+
+    @action(detail=False, methods=['get'])
+    def sales(self, request):
+        """ Sales for ?date= (default today) per branch and across all branches. """
+        day = parse_date(request.query_params.get("date", "")) or now().date()
+        per_branch = for_each_branch(self.branch_sales, day)
+
+        overall = {}
+        for totals in per_branch.values():
+            for field, value in totals.items():
+                overall[field] = overall.get(field, 0) + value
+
+        def as_json(totals):
+            return {field: f"{Decimal(value):.2f}" if "amount" in field else value for field, value in totals.items()}
+
+        return Response({
+            "date": day,
+            "branches": {code: as_json(totals) for code, totals in per_branch.items()},
+            "total": as_json(overall),
+        })
+
+
+# KITCHEN VIEWSET
+class KitchenViewSet(viewsets.ViewSet):
+    """ What each kitchen station should cook next, with wait-time estimates. """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=False, methods=['get'])
+    def queue(self, request):
+        if not (request.user.is_staff or request.user.role in ("kitchen", "waiter", "manager")):
+            return Response({"error": "Only staff can view the kitchen queue."}, status=status.HTTP_403_FORBIDDEN)
+
+        with kitchen_queue() as queue:
+            stations = queue.snapshot()
+        station = request.query_params.get("station")  # One station's screen
+        return Response({"stations": [
+            {"station": name, "orders": rows}
+            for name, rows in sorted(stations.items()) if station in (None, name)
+        ]})
+
+
+# TABLE VIEWSET
+class TableViewSet(viewsets.ModelViewSet):
+    """ Tables: anyone signed in can list them and check availability; admins and managers edit them. """
+    queryset = Table.objects.order_by("number")
+    serializer_class = TableSerializer
+
+    def get_permissions(self):
+        if self.action in ("list", "retrieve", "availability"):
+            return [permissions.IsAuthenticated()]
+        return [IsAdminOrManager()]
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """ Tables free for the whole of ?start=&end= that seat ?party_size=, smallest first. """
+        serializer = AvailabilitySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        start, end, party_size = (serializer.validated_data[key] for key in ("start", "end", "party_size"))
+        tables = reservations.get_index().available(start, end, party_size)
+        return Response({"start": start, "end": end, "party_size": party_size, "tables": tables})
+
+
+# RESERVATION VIEWSET
+class ReservationViewSet(viewsets.ReadOnlyModelViewSet):
+    """ Customers book tables for themselves; front-of-house staff book for anyone (e.g. by phone). """
+    serializer_class = ReservationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def is_front_of_house(self):
+        return self.request.user.is_staff or self.request.user.role in ("manager", "waiter", "cashier")
+
+    def get_queryset(self):
+        bookings = Reservation.objects.order_by("start")
+        day = parse_date(self.request.query_params.get("date", ""))
+        if day:
+            bookings = bookings.filter(
+                start__lt=make_aware(datetime.combine(day + timedelta(days=1), time.min)),
+                end__gt=make_aware(datetime.combine(day, time.min)),
+            )
+        if self.is_front_of_house():
+            return bookings
+        return bookings.filter(customer=self.request.user)  # Customers see only their own
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        user = request.user
+        if not self.is_front_of_house():
+            data["customer"] = user
+            data.setdefault("name", f"{user.first_name} {user.last_name}".strip() or user.username)
+        elif not data.get("name"):
+            return Response({"error": "Give the name the booking is under."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            reservation = reservations.book(data.pop("table"), data.pop("start"), data.pop("end"), **data)
+        except reservations.Conflict:
+            return Response({"error": "The table is already booked for part of that time."}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(reservation).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        reservation = self.get_object()
+        if reservation.status not in Reservation.HOLDING_STATUSES:
+            return Response({"error": f"Reservation is already {reservation.status}."}, status=status.HTTP_400_BAD_REQUEST)
+        reservation.status = "cancelled"
+        reservation.save(update_fields=["status", "updated_at"])
+        return Response(self.get_serializer(reservation).data)
+
+
+# DETAIL CACHE VIEWSET
+class DetailCacheViewSet(viewsets.ViewSet):
+    """ This worker's order/receipt detail cache: size and hit/miss counters. """
+    permission_classes = [IsAdminOrManager]
+
+    def list(self, request):
+        return Response(detail_cache.cache.stats())
+
+
+# EXPORT VIEWSET
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Stream orders or receipts as CSV or JSON Lines (?output=csv|jsonl), oldest first,
+    in constant memory. ?start=&end= (inclusive dates) limit the range; ?since_id=
+    resumes after the last row received.
+    """
+    permission_classes = [IsAdminOrManager]
+    throttle_classes = [ReportReadThrottle]
+
+    @action(detail=False, methods=['get'])
+    def orders(self, request):
+        return self.stream(request, "orders")
+
+    @action(detail=False, methods=['get'])
+    def receipts(self, request):
+        return self.stream(request, "receipts")
+
+    def stream(self, request, kind):
+        output = request.query_params.get("output", "csv")
+        if output not in export.FORMATS:
+            return Response({"error": f"output must be one of: {', '.join(export.FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        since_id = request.query_params.get("since_id", "")
+        blocks = export.stream(
+            kind, output,
+            start=parse_date(request.query_params.get("start", "")),
+            end=parse_date(request.query_params.get("end", "")),
+            since_id=int(since_id) if since_id.isdigit() else 0,
+        )
+        response = StreamingHttpResponse(blocks, content_type=export.FORMATS[output])
+        response["Content-Disposition"] = f'attachment; filename="{kind}.{output}"'
+        return response
+
+
+# BATCH VIEWSET
+class BatchViewSet(viewsets.ViewSet):
+    """ Run queued tablet writes in one request: POST /api/batch/ {"operations": [...]}. """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data["operations"]
+
+        # Operations run in order within their group; groups run in order of first appearance.
+        groups = {}
+        for index, operation in enumerate(operations):
+            groups.setdefault(operation["group"], []).append(index)
+
+        results = [None] * len(operations)
+        with batch.shared_lookups():
+            for indices in groups.values():
+                self.run_group(request, operations, indices, results)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+    def run_group(self, request, operations, indices, results):
+        """ One transaction per group: the first failing operation rolls the whole group back. """
+        try:
+            with transaction.atomic(using=current_alias()):
+                for index in indices:
+                    operation = operations[index]
+                    try:
+                        path = batch.resolve_references(operation["path"], results)
+                        body = batch.resolve_references(operation["body"], results)
+                    except batch.UnresolvedReference as error:
+                        results[index] = {"status": status.HTTP_400_BAD_REQUEST, "body": {"error": str(error)}}
+                        raise batch.GroupFailed
+                    status_code, data = batch.run_operation(request, operation["method"], path, body)
+                    results[index] = {"status": status_code, "body": data}
+                    if status_code >= 400:
+                        raise batch.GroupFailed
+        except batch.GroupFailed:
+            batch.forget_menu_items()  # They may have been read from the rolled-back writes
+            for index in indices:
+                if results[index] is None:
+                    results[index] = {
+                        "status": status.HTTP_424_FAILED_DEPENDENCY,
+                        "body": {"error": "Not run: an earlier operation in its group failed."},
+                    }
+                elif results[index]["status"] < 400:
+                    results[index]["rolled_back"] = True
+
+
 @receiver(post_save, sender=Receipt)
 def update_sales_report(sender, instance, **kwargs):
     """Automatically update sales report when receipt status changes"""
@@ -226,7 +845,7 @@ def update_sales_report(sender, instance, **kwargs):
     sales_report.save()
 
 # INVENTORY VIEWSET
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Inventory.objects.all()
     serializer_class = InventorySerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -242,3 +861,134 @@ class InventoryViewSet(viewsets.ModelViewSet):
         if not request.user.is_superuser:
             return Response({"error": "Only admins can delete inventory items. Please contact mugambiDaktari @https://www.linkedin.com/in/dr-mugambi-wycliff-77319511b/"}, status=403)
         return super().destroy(request, *args, **kwargs)
+
+
+    @action(detail=False, methods=['post'], url_path='stock-take')
+    def stock_take(self, request):
+        """ Apply a full stock count in one transaction and report variance and low stock. """
+        if not (request.user.is_staff or request.user.role == "manager"):
+            return Response({"error": "Only staff and managers can submit a stock take."}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = StockTakeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        counts = {count["id"]: count["quantity"] for count in serializer.validated_data["counts"]}
+
+        with transaction.atomic(using=current_alias()):
+            items = list(Inventory.objects.select_for_update().filter(id__in=counts))
+            missing = sorted(set(counts) - {item.id for item in items})
+            if missing:
+                return Response({"error": f"Inventory items not found: {missing}"}, status=status.HTTP_404_NOT_FOUND)
+
+            variance = []
+            for item in items:
+                counted = counts[item.id]
+                variance.append({
+                    "id": item.id,
+                    "item_name": item.item_name,
+                    "expected": item.quantity,
+                    "counted": counted,
+                    "variance": counted - item.quantity,
+                })
+                item.quantity = counted
+
+            Inventory.objects.bulk_update(items, ["quantity"], batch_size=500)
+
+        low_stock = Inventory.objects.filter(quantity__lte=F("threshold")).order_by("item_name")
+        return Response({
+            "updated": len(items),
+            "variance": variance,
+            "low_stock": InventorySerializer(low_stock, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+# ARCHIVED ORDER VIEWSET
+class ArchivedOrderViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
+    """ Read-only access to orders moved out of the live tables by `manage.py archive_orders`. """
+    serializer_class = ArchivedOrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = ArchivedOrder.objects.order_by('-created_at')
+        if not user.is_staff:
+            queryset = queryset.filter(customer=user)  # Customers see only their own
+        receipt_id = self.request.query_params.get('receipt', '')
+        if receipt_id.isdigit():
+            queryset = queryset.filter(receipt_id=receipt_id)
+        return queryset
+
+# SYNC VIEWSET
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Delta sync for offline tablets. GET /api/sync/ returns a snapshot and a cursor;
+    GET /api/sync/?since=<cursor> returns only what was created, changed or
+    deleted after that cursor, plus the next cursor.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    page_size = 500  # Changes per response; follow `has_more` for the rest
+
+    # ChangeLog model name -> (response key, model, serializer)
+    feeds = {
+        "menu_item": ("menu_items", MenuItem, MenuItemSerializer),
+        "order": ("orders", Order, OrderSerializer),
+        "order_item": ("order_items", OrderItem, OrderItemSerializer),
+        "receipt": ("receipts", Receipt, ReceiptSerializer),
+    }
+
+    def visible(self, model, queryset):
+        """ Staff sync everything; everyone else the menu plus their own orders and receipts. """
+        user = self.request.user
+        if user.is_staff or model == "menu_item":
+            return queryset
+        if model == "order":
+            return queryset.filter(customer=user)
+        if model == "order_item":
+            return queryset.filter(order__customer=user)
+        return queryset.filter(waiter=user)
+
+    def serialize(self, model, queryset):
+        serializer_class = self.feeds[model][2]
+        queryset = serializer_class.optimize_queryset(queryset, self.request)
+        return serializer_class(queryset, many=True, context={"request": self.request}).data
+
+    def list(self, request):
+        since = request.query_params.get("since", "")
+        if since.isdigit():
+            return Response(self.changes_since(int(since)))
+        return Response(self.snapshot())
+
+    def snapshot(self):
+        """ The whole menu plus open orders and unsettled receipts. """
+        # Read the cursor first: anything changed while the snapshot is built comes again next sync.
+        cursor = ChangeLog.objects.aggregate(cursor=Max("id"))["cursor"] or 0
+        open_orders = self.visible("order", Order.objects.exclude(status="completed"))
+        querysets = {
+            "menu_item": MenuItem.objects.all(),
+            "order": open_orders,
+            "order_item": OrderItem.objects.filter(order__in=open_orders),
+            "receipt": self.visible("receipt", Receipt.objects.filter(settled=False)),
+        }
+        data = {"cursor": cursor, "has_more": False, "deleted": {}}
+        for model, queryset in querysets.items():
+            key = self.feeds[model][0]
+            data[key] = self.serialize(model, queryset)
+            data["deleted"][key] = []
+        return data
+
+    def changes_since(self, since):
+        changes = ChangeLog.objects.filter(id__gt=since).order_by("id")
+        if not self.request.user.is_staff:
+            changes = changes.filter(Q(model="menu_item") | Q(owner_id=self.request.user.id))
+        rows = list(changes.values_list("id", "model", "object_id", "deleted")[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        latest = {}  # Only the last change of each object matters
+        for _, model, object_id, deleted in rows:
+            latest[(model, object_id)] = deleted
+
+        data = {"cursor": rows[-1][0] if rows else since, "has_more": has_more, "deleted": {}}
+        for model, (key, model_class, _) in self.feeds.items():
+            changed = [object_id for (name, object_id), deleted in latest.items() if name == model and not deleted]
+            data["deleted"][key] = [object_id for (name, object_id), deleted in latest.items() if name == model and deleted]
+            data[key] = self.serialize(model, self.visible(model, model_class.objects.filter(id__in=changed))) if changed else []
+        return data
@@ -0,0 +1,80 @@
+"""
+Worker warm start.
+
+`warm_up()` runs once when a WSGI/ASGI worker loads (see
+hotel_management_system/wsgi.py and asgi.py) so the first requests after a
+restart do not pay for lazy imports, URL resolver construction, serializer field
+building or cold per-branch caches. Set HOTEL_WARM_START=0 to skip it.
+"""
+import inspect
+import logging
+from time import perf_counter
+
+from django.db import connections
+from django.urls import URLResolver, get_resolver
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+
+def compile_routes():
+    """Build the URL resolver, reverse lookup table and every route's regex."""
+    resolver = get_resolver()
+    resolver.reverse_dict  # Populates the reverse lookup table
+
+    def walk(patterns):
+        for pattern in patterns:
+            pattern.pattern.regex  # Compiled lazily on first use
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+
+    walk(resolver.url_patterns)
+
+
+def build_serializers():
+    """Instantiate every serializer in hotel_app.serializers once and build its fields."""
+    from hotel_app import serializers as app_serializers
+
+    for _, serializer_class in inspect.getmembers(app_serializers, inspect.isclass):
+        if issubclass(serializer_class, serializers.BaseSerializer) and serializer_class.__module__ == app_serializers.__name__:
+            serializer_class(context={}).fields
+
+
+def prime_branches():
+    """Per branch: connect to the database, load the menu and build the price, kitchen and table indexes."""
+    from hotel_app import kitchen, pricing, reservations
+    from hotel_app.branches import branches, use_branch
+    from hotel_app.models import MenuItem
+
+    for code in branches():
+        with use_branch(code) as alias:
+            try:
+                list(MenuItem.objects.all())  # Menu pages into the database's cache
+                pricing.get_index()
+                reservations.get_index()
+                with kitchen.kitchen_queue():
+                    pass
+            finally:
+                # Request threads open their own connections; never hand this one to a forked worker.
+                if not connections[alias].in_atomic_block:
+                    connections[alias].close()
+
+
+STEPS = (
+    ("compile routes", compile_routes),
+    ("build serializers", build_serializers),
+    ("prime branches", prime_branches),
+)
+
+
+def warm_up():
+    """Run every warm-up step; returns {step: seconds}. A failing step is logged, not raised."""
+    timings = {}
+    for name, step in STEPS:
+        start = perf_counter()
+        try:
+            step()
+        except Exception:  # e.g. migrations not applied yet; a cold cache only slows the first requests
+            logger.exception("Warm-up step %r failed and was skipped", name)
+        timings[name] = perf_counter() - start
+    return timings
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hotel_management_system.settings')
 
 application = get_asgi_application()
+
+if os.environ.get('HOTEL_WARM_START', '1') != '0':
+    from hotel_app.warmup import warm_up
+
+    warm_up()  # Pay for imports, routes, serializers and caches before the first request
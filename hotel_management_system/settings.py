@@ -32,6 +32,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'hotel_app.middleware.CompressionMiddleware',
+    'hotel_app.middleware.BranchMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,6 +41,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'hotel_app.middleware.OrderEventMiddleware',
 ]
 
 ROOT_URLCONF = 'hotel_management_system.urls'
@@ -72,6 +75,19 @@ DATABASES = {
     }
 }
 
+# Multi-branch deployment: each outlet keeps its data in its own database so one
+# branch's writes never lock another branch's tables.
+# HOTEL_BRANCHES="westlands,cbd" adds db_westlands.sqlite3 and db_cbd.sqlite3.
+HOTEL_BRANCHES = {'main': 'default'}
+for branch_code in filter(None, (code.strip() for code in os.environ.get('HOTEL_BRANCHES', '').split(','))):
+    DATABASES[f'branch_{branch_code}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db_{branch_code}.sqlite3',
+    }
+    HOTEL_BRANCHES[branch_code] = f'branch_{branch_code}'
+
+DATABASE_ROUTERS = ['hotel_app.branches.BranchRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -107,6 +123,39 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson when installed, stdlib json otherwise; see hotel_app.fastjson
+    'DEFAULT_RENDERER_CLASSES': (
+        'hotel_app.fastjson.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'hotel_app.fastjson.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    # "database is locked" becomes a retryable 503; see hotel_app.exceptions
+    'EXCEPTION_HANDLER': 'hotel_app.exceptions.exception_handler',
+    # Proxies in front of the app that append to X-Forwarded-For. 0 (direct): the client IP is
+    # REMOTE_ADDR and a client-supplied X-Forwarded-For is ignored, so it cannot dodge throttles.
+    'NUM_PROXIES': int(os.environ.get('HOTEL_NUM_PROXIES', '0')),
+    # Per user (or IP when anonymous); see hotel_app.throttling
+    'DEFAULT_THROTTLE_RATES': {
+        'registration': '10/hour',
+        'token': '30/min',
+        'menu_read': '300/min',
+        'order_write': '120/min',
+        'report_read': '60/min',
+    },
+}
+
+# Caches: throttle counters must be shared by every worker, so use Redis in production (REDIS_URL=redis://...).
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'throttle': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': os.environ['REDIS_URL']}
+        if os.environ.get('REDIS_URL') else
+        {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle'}
+    ),
 }
 
 # JWT Settings (Optional)
@@ -118,6 +167,7 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,  #  each time the user refreshes their token, they receive a new refresh token along with a new access token.
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),  # Authorization: Bearer <token>
+    "TOKEN_OBTAIN_SERIALIZER": "hotel_app.serializers.BranchTokenObtainPairSerializer",  # Adds the branch claim
 }
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
@@ -136,7 +186,16 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 if DEBUG:
     STATICFILES_DIRS = [os.path.join(BASE_DIR, "hotel_app", "static")]
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# collectstatic writes content-hashed copies of every asset plus .gz and .br (with Brotli installed)
+# versions; WhiteNoise serves the precompressed file the client accepts and marks hashed names immutable.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "hotel_app.storage.StaticFilesStorage"},
+}
+WHITENOISE_MAX_AGE = 3600  # Non-hashed files; hashed ones are cached forever
+
+# API responses (JSON, CSV) at least this big are sent gzip- or brotli-compressed when the client accepts it
+COMPRESSION_MIN_BYTES = 1024
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -147,6 +206,21 @@ AUTH_USER_MODEL = 'hotel_app.User'
 LOGIN_REDIRECT_URL = 'homepage'  # Redirects user to homepage after login
 LOGOUT_REDIRECT_URL = 'login'  # Redirect login page after logout
 
+# Kitchen queue: prep time assumed for a menu item until enough orders were served to learn it
+KITCHEN_DEFAULT_PREP_SECONDS = 600
+
+# Reservations: how often each worker checks whether other workers changed bookings or tables
+RESERVATIONS_CHECK_SECONDS = 5
+
+# Order and receipt detail representations each worker keeps (least recently used are evicted first)
+DETAIL_CACHE_SIZE = 2000
+
+# Bulk staff imports hash passwords in this many processes (None: half the CPU cores)
+PASSWORD_HASH_WORKERS = None
+
+# Pricing: how often each worker checks whether the pricing rules changed elsewhere
+PRICING_RULES_CHECK_SECONDS = 5
+
 #  security against XSS, clickjacking, and MIME attacks
 SECURE_BROWSER_XSS_FILTER = True  # Protects against XSS attacks
 X_FRAME_OPTIONS = "DENY"  # Prevents clickjacking attacks
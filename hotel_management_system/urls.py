@@ -6,9 +6,12 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 from rest_framework.routers import DefaultRouter
+from hotel_app.throttling import TokenThrottle
 from hotel_app.views import (
     UserViewSet, MenuItemViewSet, OrderViewSet, OrderItemViewSet,
-    ReceiptViewSet, SalesReportViewSet, InventoryViewSet,
+    ReceiptViewSet, SalesReportViewSet, InventoryViewSet, ArchivedOrderViewSet,
+    AnalyticsViewSet, OrderEventViewSet, HeadOfficeViewSet, SyncViewSet, BatchViewSet, KitchenViewSet, ExportViewSet,
+    TableViewSet, ReservationViewSet, DetailCacheViewSet,
     HomeView, RegisterView, UserLoginView, UserLogoutView
 )
 
@@ -21,14 +24,25 @@ router.register(r'order-items', OrderItemViewSet, basename='orderitem')
 router.register(r'receipts', ReceiptViewSet, basename='receipt')
 router.register(r'sales-reports', SalesReportViewSet, basename='salesreport')
 router.register(r'inventory', InventoryViewSet, basename='inventory')
+router.register(r'archived-orders', ArchivedOrderViewSet, basename='archivedorder')
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
+router.register(r'events', OrderEventViewSet, basename='orderevent')
+router.register(r'head-office', HeadOfficeViewSet, basename='headoffice')
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'batch', BatchViewSet, basename='batch')
+router.register(r'kitchen', KitchenViewSet, basename='kitchen')
+router.register(r'export', ExportViewSet, basename='export')
+router.register(r'tables', TableViewSet, basename='table')
+router.register(r'reservations', ReservationViewSet, basename='reservation')
+router.register(r'detail-cache', DetailCacheViewSet, basename='detail-cache')
 
 
 
 urlpatterns = [
     # JWT Authentication Endpoints
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # Login & Get Token
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),  # Refresh Token
-    path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),  # Verify Token
+    path('api/token/', TokenObtainPairView.as_view(throttle_classes=[TokenThrottle]), name='token_obtain_pair'),  # Login & Get Token
+    path('api/token/refresh/', TokenRefreshView.as_view(throttle_classes=[TokenThrottle]), name='token_refresh'),  # Refresh Token
+    path('api/token/verify/', TokenVerifyView.as_view(throttle_classes=[TokenThrottle]), name='token_verify'),  # Verify Token
    
     # Admin Site
     path('admin/', admin.site.urls),